@@ -1,7 +1,6 @@
 import csv
 import tkinter as tk
 from tkinter import filedialog
-from openpyxl import load_workbook
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
@@ -10,6 +9,8 @@ import numpy as np
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import os
+from dessmonitor_cache import ParseCache
+from dessmonitor_reader import read_columns
 
 
 # 日本語フォント設定
@@ -42,19 +43,17 @@ def extract_data_csv(filepath, col, is_string=False):
                 print("指定された列番号が範囲外です")
     return data
 
-# データ取得関数
+# データ取得関数（sheet: {列番号: 空でないセルの値のリスト}）
 def extract_data(sheet, col, is_string=False):
     data = []
-    for row in sheet.iter_rows(min_row=1, min_col=col, max_col=col):
-        for cell in row:
-            if cell.value is not None:  # 空セルの処理を防ぐ
-                if is_string:  # 文字列として処理
-                    data.append(str(cell.value))
-                else:  # 数値として処理
-                    try:
-                        data.append(int(float(cell.value)))  # 数値に変換
-                    except ValueError:
-                        print(f"数値に変換できないデータをスキップしました: {cell.value}")
+    for value in sheet[col]:
+        if is_string:  # 文字列として処理
+            data.append(str(value))
+        else:  # 数値として処理
+            try:
+                data.append(int(float(value)))  # 数値に変換
+            except ValueError:
+                print(f"数値に変換できないデータをスキップしました: {value}")
     return data
 
 # ファイル検索関数（後半10文字一致かつ異なるファイルを探す）
@@ -102,9 +101,11 @@ else:
         print(f"2つ目のファイルが見つかりました: {file2_path}")
     else:
         print("2つ目のファイルが見つかりませんでした")   
-    # Excel処理
-    sheet1 = load_workbook(file1_path).active
-    sheet2 = load_workbook(file2_path).active
+    # Excel処理（各ファイル1回だけ読込み、解析済みのファイルはキャッシュから取得）
+    columns1, columns2 = (1, 15, 22, 4, 5, 9, 10), (15, 22, 4, 5, 9, 10)
+    with ParseCache() as cache:
+        sheet1 = dict(zip(columns1, cache.get(file1_path, read_columns, columns=columns1)))
+        sheet2 = dict(zip(columns2, cache.get(file2_path, read_columns, columns=columns2)))
 
     # 抽出対象の列番号と対応するシート
     columns = [
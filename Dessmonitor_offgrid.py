@@ -1,8 +1,10 @@
-import openpyxl
-from datetime import datetime
 from tkinter import Tk, filedialog
 from collections import defaultdict
 import os
+import numpy as np
+from dessmonitor_reader import read_energy_columns  # xlsx 1回読込（日時・31列目）
+from dessmonitor_cache import ParseCache  # 解析結果のキャッシュ
+from tariff import hour_table  # 時間帯の一括判定
 
 # ファイル選択ダイアログを表示
 def select_file():
@@ -24,10 +26,8 @@ def get_file_suffix_without_extension(file_path):
     return file_name[-10:]  # 右から10文字を取得
 
 # 時間帯ごとのデータを計算する関数
-def calculate_time_data(file_path):
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb.active
-
+def calculate_time_data(data):
+    """ data: read_energy_columns() の結果（日時・31列目） """
     # 時間帯ごとの最終データを格納する辞書
     time_ranges = {
         "0時～7時": (0, 7),
@@ -36,49 +36,25 @@ def calculate_time_data(file_path):
         "17時～23時": (17, 23),
         "23時～24時": (23, 24)
     }
+    # 時刻付きで31列目が数値の行のみ（列がない・変換できない行は NaN）
+    valid = data.has_time & ~np.isnan(data.values[:, 0])
+    times = data.time[valid]
+    values = data.values[valid, 0]
+
+    # 各行の時間帯（time_ranges の順の番号）を一括で求める
+    hours = (times - times.astype("datetime64[D]")) // np.timedelta64(1, "h")
+    labels = hour_table(time_ranges)[hours.astype(np.int64)]
+
+    # 時間帯ごとの最終データ（ファイルは新しい順のため、各時間帯の最初の行）
+    # 増加量は古い行から見て時間帯が現れた順に計算するため、各時間帯の最後の行（最も古い行）が後ろにあるものから並べる
+    found = []
+    for i, label in enumerate(time_ranges):
+        rows = np.flatnonzero(labels == i)
+        if len(rows):
+            found.append((rows[-1], label, values[rows[0]].item()))
     time_last_values = defaultdict(float)
-
-    # データを逆順で処理（行の終わりが先頭データ）
-    rows = list(sheet.iter_rows(min_row=2))  # ヘッダーをスキップ
-    for row in reversed(rows):  # 行を逆順に処理
-        date_cell = row[0].value  # 1列目の日付データ
-
-        # 列数チェック（31列目が存在するか確認）
-        if len(row) <= 30:
-            print(f"警告: ファイル {file_path} に31列目のデータが存在しません。スキップします。")
-            continue
-
-        value_cell = row[30].value  # 31列目のデータ
-
-        # date_cell の確認と変換
-        if isinstance(date_cell, str):
-            try:
-                date_cell = datetime.strptime(date_cell, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                print(f"date_cell を datetime に変換できませんでした: {date_cell}")
-                continue
-        elif not isinstance(date_cell, datetime):
-            print(f"date_cell が datetime 型ではありません: {date_cell} (type: {type(date_cell)})")
-            continue
-
-        # value_cell の確認と変換
-        try:
-            if isinstance(value_cell, str):
-                value_cell = value_cell.replace(",", "")
-                value_cell = float(value_cell)
-            else:
-                value_cell = float(value_cell)
-        except (ValueError, TypeError):
-            print(f"value_cell を数値に変換できませんでした: {value_cell}")
-            continue
-
-        # 時間部分を抽出
-        hour = date_cell.hour
-
-        # 時間帯ごとの最終データを更新
-        for label, (start, end) in time_ranges.items():
-            if start <= hour < end:
-                time_last_values[label] = value_cell
+    for _, label, value in sorted(found, reverse=True):
+        time_last_values[label] = value
 
     # 時間帯ごとの増加量を計算
     time_increments = defaultdict(float)
@@ -125,18 +101,20 @@ if matching_files:
 else:
     print("一致するファイルは見つかりませんでした。")
 
-# 選択したファイルのデータを計算
+# 選択したファイルのデータを計算（前回から変わっていないファイルはキャッシュから読込）
+cache = ParseCache()
 total_time_zone_totals = defaultdict(float)
-time_zone_totals = calculate_time_data(file_path)
+time_zone_totals = calculate_time_data(cache.get(file_path, read_energy_columns, columns=(30,)))
 for zone, total in time_zone_totals.items():
     total_time_zone_totals[zone] += total
 
 # 一致する別のファイルがあれば計算
 for matching_file in matching_files:
     print(f"一致するファイルを処理中: {matching_file}")
-    time_zone_totals = calculate_time_data(matching_file)
+    time_zone_totals = calculate_time_data(cache.get(matching_file, read_energy_columns, columns=(30,)))
     for zone, total in time_zone_totals.items():
         total_time_zone_totals[zone] += total
+cache.close()
 
 # 各タイムゾーンの集計を表示
 print("\nタイムゾーンごとの集計:")
@@ -5,6 +5,7 @@ import datetime                                                 # 時計モジ
 from time import sleep                                          # タイマー組込
 import tkinter as tk                                            # GUIモジュール組込
 import threading                                                # スレッド組込
+from tk_display import DisplayBridge                            # Tk表示ブリッジ組込
 
 interval=5.9                                                      # 待ち時間（秒）
 # ----------パラメーター設定 [address,byte,name,type,unit,data...]
@@ -325,22 +326,20 @@ def create_gui():                                               # GUI作成
     button=tk.Button(frame,text="計測終了",command=root.destroy) # ループ終了
     button.grid(column=0,row=0)
 
-    thread=threading.Thread(target=update_data,args=([label0,
-                                    [labels1[x]for x in range(para_list)],
-                                    [labels2[x]for x in range(para_list)],
-                                    [labels3[x]for x in range(m2_list)]]))
+    bridge=DisplayBridge(root)                                  # 表示は Tk スレッドで差分更新
+    for name,labels in (("time",[label0]),("id1",labels1),("id2",labels2),("calc",labels3)):
+        bridge.bind(name,labels)
+    thread=threading.Thread(target=update_data,args=(bridge,))
     thread.daemon=True                                          # メインウィンドウが閉じたらスレッドも終了
     thread.start()                                              # スレッド処理開始
     root.mainloop()                                             # メインループ開始
 
 # ----------データ更新処理
-def update_data(label0,labels1,labels2,labels3):
+def update_data(bridge):
         while True:
             date_time,writer_data1,writer_data2,orign_data=data_read()
-            label0.config(text=f"{date_time}")                  # GUIデータ更新
-            [labels1[x].config(text=f"{writer_data1[x]}")for x in range(para_list)]
-            [labels2[x].config(text=f"{writer_data2[x]}")for x in range(para_list)]
-            [labels3[x].config(text=f"{orign_data[x]}")for x in range(m2_list)]
+            bridge.push(time=[date_time],id1=writer_data1,id2=writer_data2, # GUIデータ更新（キューへ登録）
+                        calc=orign_data)
             sleep(interval)                                     # インターバルタイマー
 
 # ----------実行
@@ -1,12 +1,16 @@
 # ----------初期設定・・・・HYP4850U100-H　2並列単相3線仕様専用
-from pymodbus.client import ModbusSerialClient as ModbusClient  # Modbus組込
+from modbus_connection import modbus_pool                       # Modbus常時接続マネージャー組込
+from modbus_planner import plan_block_reads                     # 一括読出プランナー組込
+from register_decoder import compile_decoder                    # レジスターデコーダー組込
 import csv                                                      # CSVファイルモジュール組込
 import datetime                                                 # 時計モジュール組込
-from time import sleep                                          # タイマー組込
+from sampling_scheduler import IntervalScheduler,TIMING_HEADER # 計測周期スケジューラー組込
 import tkinter as tk                                            # GUIモジュール組込
 import threading                                                # スレッド組込
+from tk_display import DisplayBridge                            # Tk表示ブリッジ組込
+from csv_log_writer import DailyCsvWriter                       # 日毎CSVライター組込
 
-interval=5                                                      # 待ち時間（秒）+5秒程度
+interval=10                                                     # 計測周期（秒）
 # ----------パラメーター設定 [address,byte,name,type,unit,data...]
 para_data=[[0x0220,1,"PVHT温度",1,"℃"],[0x0221,1,"INVHT温度",1,"℃"],
            [0x0222,1,"Tr温度",1,"℃"],[0x0223,1,"内部温度",1,"℃"],
@@ -49,24 +53,20 @@ para_xy=[[0,1],[0,2],[0,3],[0,4],
          [10,1],[10,2],[10,3],[10,4],[10,5],[10,6],[10,7],[10,8],
          [10,10],[10,11],[10,12],[10,13],[10,14],[10,15],[10,16],[10,17]]
 sys_list=43
+para_plan=plan_block_reads(para_data[:sys_list])                # 一括読出プラン
 
 # ----------Modbus接続設定・・・・ID1:ポート5、ID2:ポート6  
-client1=ModbusClient(framer="rtu",port="COM5",                  # USBポート5（Windows）
-                       baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
-client2=ModbusClient(framer="rtu",port="COM6",                  # USBポート6（Windows）
-                       baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
+HYB1_PORT,HYB2_PORT="COM5","COM6"                               # USBポート5,6（Windows）
+modbus_pool.add_port(HYB1_PORT,baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
+modbus_pool.add_port(HYB2_PORT,baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
 
 # ----------Modbusデータ読出
 def modbus_read(slave_add,slave_count,slave_id):                # ファンクション03h
-    client1.connect()                                           # ポート接続
-    client2.connect()
-    read_data1=client1.read_holding_registers(
-        address=slave_add,count=slave_count,slave=slave_id)
-    read_data2=client2.read_holding_registers(
-        address=slave_add,count=slave_count,slave=slave_id+1)
-    client1.close()                                             # ポート切断
-    client2.close()
-    return read_data1.registers,read_data2.registers
+    read_data1=modbus_pool.read_holding_registers(              # 常時接続ポートから読出
+        HYB1_PORT,slave_add,slave_count,slave=slave_id)
+    read_data2=modbus_pool.read_holding_registers(
+        HYB2_PORT,slave_add,slave_count,slave=slave_id+1)
+    return read_data1,read_data2
 
 # ----------CSVファイル設定・・・・ファイル名,ID1：シリアルナンバー
 slave_id=1
@@ -77,7 +77,7 @@ file_time=dt_now.strftime('_20%y_%m_%d_%H%M')
 id_name=''
 for a in range(20):id_name=id_name+chr(sys_id[a])
 #file_name1=id_name+'_setting.csv'                               # 設定ファイル名作成
-file_name2=id_name+file_time+'.csv'                             # ログファイル名作成
+file_name2=id_name+'_20yy_mm_dd.csv'                            # ログファイル名（日毎）
 #print("設定ファイル名:",file_name1)
 print("ログファイル名:",file_name2)
 name_data1=[file_time]
@@ -88,63 +88,23 @@ for i in range(sys_list):
 
 
 # ----------データ変換
-def change_type(data_type,rdd,sys_volt,d_type,d_add):           # データタイプ変換
-    if data_type<5:
-        if data_type<4:                                         # 1/10,1/100,1/1000判定
-            if d_type==1 :                                      # 16bit
-                if rdd>32767 :rdd=rdd-65536
-            if d_type==2 :                                      # 32byte
-                if rdd>2147483647 :rdd=rdd-4294967295
-            data_list=[rdd,rdd/10,rdd/100,rdd/1000]
-            d=data_list[data_type]
-        if data_type==4:                                        # 電圧データ判定24V/48V
-            d=rdd/10
-            if sys_volt[0]==24:d=d*2  
-            if sys_volt[0]==48:d=d*4   
-        d=str(d)
-    if data_type==5:d=chr(rdd)                                  # 文字データ判定　
-    if data_type==6:d=data_list["OFF","ON"][rdd]                # ON/OFF判定  
-    if data_type==7:                                            # 時刻判定
-        ym=hex(rdd)[2:].zfill(2)
-        d=str(int(ym[0:2], 16)).zfill(2)+":"+str(int(ym[2:4], 16)).zfill(2)
-    if data_type>=8:
-        d=para_data[d_add][rdd+5]                               # 拡張判定
-    return d
+para_decoder=compile_decoder(para_data[:sys_list],para_plan,    # HYPは下位ワード先頭
+                             type_col=3,enum_col=5,word_order="little")
 
 def data_read():
     dt_now=datetime.datetime.now()                              # 日時を取得
     date_time=dt_now.strftime('%y/%m/%d %H:%M:%S')
-    p_type=0
-    writer_data1=[]
-    writer_data2=[]
-    for a in range(sys_list):
-        d_type=para_data[a][1]
-        data_type=para_data[a][3]
-        read_data1,read_data2=modbus_read(para_data[a][0],d_type,slave_id)
-        if d_type==1:                                           # 16bitデータ変換
-            data1=change_type(data_type,read_data1[0],sys_volt[0],d_type,a)
-            data2=change_type(data_type,read_data2[0],sys_volt[0],d_type,a)
-        else:
-            data1=change_type(data_type,                        # 32bitデータ変換
-                int(str(int(hex(read_data1[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(read_data1[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt,d_type,a)
-            data2=change_type(data_type,
-                int(str(int(hex(read_data2[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(read_data2[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt,d_type,a)
-        writer_data1.append(data1)
-        writer_data2.append(data2)
-    #if p_type==0:prt="logging:"                  
-    #else:prt="setting:"
-    csv_data1=[date_time]
-    csv_data2=[date_time]
-    for i in range(sys_list):
-        csv_data1.append(writer_data1[i])
-        csv_data2.append(writer_data2[i])
+    blk_data1,blk_data2=[],[]
+    for blk in para_plan:                                       # ブロック一括読出
+        read_data1,read_data2=modbus_read(blk[0],blk[1],slave_id)
+        blk_data1.append(read_data1)
+        blk_data2.append(read_data2)
+    writer_data1=para_decoder.decode(blk_data1,sys_volt[0])     # 一括データ変換
+    writer_data2=para_decoder.decode(blk_data2,sys_volt2[0])
+    csv_data1=[date_time]+writer_data1
+    csv_data2=[date_time]+writer_data2
     writer.writerow(csv_data1)                                  # CSVデータ書込
     writer.writerow(csv_data2)
-    #print(prt,date_time)      
     return date_time,writer_data1,writer_data2
 
 # ----------モニター画面
@@ -186,29 +146,32 @@ def create_gui():                                               # GUI作成
     button=tk.Button(frame,text="計測終了",command=root.destroy) # ループ終了
     button.grid(column=13,row=0)
 
-    thread=threading.Thread(target=update_data
-                            ,args=([label0,[labels1[x]for x in range(sys_list)],
-                                    [labels2[x]for x in range(sys_list)],]))
+    bridge=DisplayBridge(root)                                  # 表示は Tk スレッドで差分更新
+    bridge.bind("time",[label0])
+    bridge.bind("id1",labels1)
+    bridge.bind("id2",labels2)
+    thread=threading.Thread(target=update_data,args=(bridge,))
     thread.daemon=True                                          # メインウィンドウが閉じたらスレッド終了
     thread.start()                                              # スレッド処理開始
     root.mainloop()                                             # メインループ開始
 
 # ----------データ更新処理
-def update_data(label0,labels1,labels2):
+def update_data(bridge):
+        sampler=IntervalScheduler(interval,log=timing_log)      # 絶対時刻基準の周期タイマー（計測タイミングを記録）
         while True:
+            tick=sampler.wait()                                 # 次の計測時刻まで待機
+            if tick.overrun:print("周期超過:",tick.skipped,"回スキップ",tick.date_time)
             date_time,writer_data1,writer_data2=data_read()
-            label0.config(text=f"{date_time}")                  # GUIデータ更新
-            [labels1[x].config(text=f"{writer_data1[x]}")for x in range(sys_list)]
-            [labels2[x].config(text=f"{writer_data2[x]}")for x in range(sys_list)]
-            sleep(interval)                                     # インターバルタイマー
+            bridge.push(time=[date_time],id1=writer_data1,id2=writer_data2) # GUIデータ更新（キューへ登録）
 
 # ----------実行
-with open(file_name2,'w', newline='') as file:                  # CSVファイルオープン
-        writer=csv.writer(file)
-        w_data=[name_data1,unit_data1]
-        [writer.writerow(w_data[i])for i in range(2)]           # ヘッダー書込
-        date_time,writer_data1,writer_data2=data_read()
-        if __name__ == "__main__":
-            create_gui()
+writer=DailyCsvWriter(id_name,[name_data1,unit_data1])          # ヘッダーは新規ファイルのみ
+timing_log=DailyCsvWriter(id_name+'_timing',[TIMING_HEADER])    # 計測タイミングログ（遅れ・スキップ）
+date_time,writer_data1,writer_data2=data_read()
+if __name__ == "__main__":
+    create_gui()
+writer.close()                                                  # 未書込分を書込んで閉じる
+timing_log.close()
+modbus_pool.close()                                             # ポート切断
             
 # 終了
@@ -0,0 +1,154 @@
+# 追記型バイナリログストア
+# ----------概要
+# CSVと並行して、1サイクル1レコードの固定長バイナリ（時刻・生レジスター・変換値float32）を
+# 機器毎・日毎のファイルに追記する。レコードは固定長なので np.memmap でそのまま読め、
+# 数か月分でもテキストの再解析なしで読込める。日毎の件数・時刻範囲は index.json に記録する。
+# 必要な時だけ CSV / Parquet に変換する。
+# ----------ファイル構成
+# <root>/<機器名>/schema.json  項目名・単位・ワード数・レコード形式
+# <root>/<機器名>/index.json   {日付: {"count":件数,"t_first":先頭時刻,"t_last":最終時刻}}
+# <root>/<機器名>/YYYY-MM-DD.bin  レコード配列（t:<f8, regs:<u2[n], values:<f4[m]）
+# 使い方: python binary_store.py <機器フォルダー> <出力.csv|出力.parquet> [開始日 終了日]
+import argparse                                                 # 起動引数組込
+import csv                                                      # CSVファイルモジュール組込
+import datetime                                                 # 時計モジュール組込
+import json
+import os
+import time                                                     # タイマー組込
+import numpy as np
+
+def record_dtype(n_regs,n_fields):                              # レコード形式
+    return np.dtype([("t","<f8"),("regs","<u2",(n_regs,)),("values","<f4",(n_fields,))])
+
+def _write_json(file_name,data):                                # 途中で切れないよう置換で保存
+    tmp=file_name+".tmp"
+    with open(tmp,"w",encoding="utf-8") as file:
+        json.dump(data,file,ensure_ascii=False)
+    os.replace(tmp,file_name)
+
+def _read_json(file_name,default=None):
+    if not os.path.exists(file_name):return default
+    with open(file_name,encoding="utf-8") as file:
+        return json.load(file)
+
+class BinaryStore:
+    """ 1機器分の追記型バイナリストア """
+    def __init__(self,root,device,names,units,words,chunk=60):
+        self.dir=os.path.join(root,device)
+        os.makedirs(self.dir,exist_ok=True)
+        self.words=list(words)                                  # 項目毎のワード数
+        self.dtype=record_dtype(sum(self.words),len(self.words))
+        schema={"names":list(names),"units":list(units),"words":self.words,
+                "dtype":self.dtype.descr}
+        schema_file=os.path.join(self.dir,"schema.json")
+        old=_read_json(schema_file)
+        if old is not None and old["words"]!=self.words:
+            raise ValueError(f"{self.dir}: レジスター構成が既存のストアと異なります")
+        _write_json(schema_file,schema)
+        self.index_file=os.path.join(self.dir,"index.json")
+        self.index=_read_json(self.index_file,{})
+        self.buf=np.zeros(chunk,dtype=self.dtype)               # 書込バッファ（chunk件毎に追記）
+        self.n=0
+        self.day=None
+
+    def _path(self,day):
+        return os.path.join(self.dir,day+".bin")
+
+    def _open_day(self,day):                                    # 日替り・起動時の準備
+        path=self._path(day)
+        if os.path.exists(path):                                # 書込途中で切れたレコードを除去
+            size=os.path.getsize(path)
+            if size%self.dtype.itemsize:
+                with open(path,"r+b") as file:
+                    file.truncate(size-size%self.dtype.itemsize)
+        self.day=day
+
+    def append(self,t,field_regs,values):
+        """
+        1サイクル分を追加する。t:エポック秒  field_regs:項目毎のレジスターリスト（None=欠測）
+        values:変換値（数値以外・欠測は NaN）
+        """
+        day=datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d")
+        if day!=self.day:
+            self.flush()
+            self._open_day(day)
+        rec=self.buf[self.n]
+        rec["t"]=t
+        regs=rec["regs"]
+        pos=0
+        for w,r in zip(self.words,field_regs):
+            regs[pos:pos+w]=r if r is not None else 0
+            pos+=w
+        rec["values"]=[v if isinstance(v,(int,float)) else np.nan for v in values]
+        self.n+=1
+        if self.n==len(self.buf):self.flush()
+
+    def flush(self):
+        """ バッファを日毎ファイルに追記し、索引を更新する """
+        if not self.n:return
+        data=self.buf[:self.n]
+        with open(self._path(self.day),"ab") as file:
+            file.write(data.tobytes())
+        entry=self.index.get(self.day,{"count":0,"t_first":float(data["t"][0])})
+        entry["count"]=os.path.getsize(self._path(self.day))//self.dtype.itemsize
+        entry["t_last"]=float(data["t"][-1])
+        self.index[self.day]=entry
+        _write_json(self.index_file,self.index)
+        self.n=0
+
+    def close(self):
+        self.flush()
+
+# ----------読出
+def load_schema(device_dir):
+    schema=_read_json(os.path.join(device_dir,"schema.json"))
+    schema["dtype"]=np.dtype([tuple(f) for f in schema["dtype"]])
+    return schema
+
+def open_day(device_dir,day,schema=None):
+    """ 1日分のレコードを memmap で返す（コピーなし） """
+    dtype=(schema or load_schema(device_dir))["dtype"]
+    path=os.path.join(device_dir,day+".bin")
+    count=os.path.getsize(path)//dtype.itemsize if os.path.exists(path) else 0
+    if not count:return np.zeros(0,dtype=dtype)
+    return np.memmap(path,dtype=dtype,mode="r",shape=(count,))
+
+def load_range(device_dir,start=None,end=None):
+    """ 日付範囲（"YYYY-MM-DD"、両端含む）のレコードを連結して返す """
+    schema=load_schema(device_dir)
+    days=sorted(_read_json(os.path.join(device_dir,"index.json"),{}))
+    days=[d for d in days if (start is None or d>=start) and (end is None or d<=end)]
+    parts=[open_day(device_dir,d,schema) for d in days]
+    if not parts:return np.zeros(0,dtype=schema["dtype"]),schema
+    return np.concatenate(parts),schema
+
+# ----------変換
+def to_csv(records,schema,file_name):
+    """ 変換値を CSV に書出す（ヘッダー: 項目名・単位） """
+    with open(file_name,"w",newline="") as file:
+        writer=csv.writer(file)
+        writer.writerow(["日時"]+schema["names"])
+        writer.writerow(["年月日時分秒"]+schema["units"])
+        for t,values in zip(records["t"],records["values"]):
+            date_time=datetime.datetime.fromtimestamp(t).strftime('%y/%m/%d %H:%M:%S')
+            writer.writerow([date_time]+["" if np.isnan(v) else round(float(v),4) for v in values])
+
+def to_parquet(records,schema,file_name):
+    """ 変換値を Parquet に書出す（pandas・pyarrow が必要） """
+    import pandas as pd
+    df=pd.DataFrame(np.asarray(records["values"]),columns=schema["names"])
+    offset=time.localtime().tm_gmtoff                           # 現地時刻に変換
+    df.insert(0,"日時",pd.to_datetime(np.asarray(records["t"])+offset,unit="s"))
+    df.to_parquet(file_name,index=False)
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="バイナリログストアの書出し")
+    parser.add_argument("device_dir")
+    parser.add_argument("output",help="出力ファイル（.csv / .parquet）")
+    parser.add_argument("start",nargs="?",help="開始日 YYYY-MM-DD")
+    parser.add_argument("end",nargs="?",help="終了日 YYYY-MM-DD")
+    args=parser.parse_args()
+    records,schema=load_range(args.device_dir,args.start,args.end)
+    if args.output.endswith(".parquet"):to_parquet(records,schema,args.output)
+    else:to_csv(records,schema,args.output)
+    print("書出し:",args.output,len(records),"件")
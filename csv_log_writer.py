@@ -0,0 +1,109 @@
+# 日毎CSVログライター
+# ----------概要
+# 行をメモリーにまとめてから書込み、行数または経過時間で flush、設定した間隔で fsync する。
+# ファイルは <名前>_20yy_mm_dd.csv の日毎とし、ローカル時刻の0時で次のファイルに切替える。
+# 起動時に当日ファイルが残っていれば追記し、停電等で途中で切れた最終行は削除してから続ける。
+import csv                                                      # CSVファイルモジュール組込
+import datetime                                                 # 時計モジュール組込
+import io
+import os
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+
+TAIL_SIZE=65536                                                 # 最終行の確認範囲（バイト）
+
+def repair_last_line(file_name):
+    """ 改行で終わっていない最終行を削除する  戻り値: 修復後のファイルサイズ """
+    with open(file_name,"rb+") as file:
+        size=file.seek(0,os.SEEK_END)
+        if not size:return 0
+        start=max(0,size-TAIL_SIZE)
+        file.seek(start)
+        tail=file.read()
+        if tail.endswith(b"\n"):return size
+        cut=tail.rfind(b"\n")
+        size=start+cut+1 if cut>=0 else start                   # 最後の改行の直後まで
+        file.truncate(size)
+        print("CSV最終行を修復:",file_name)
+        return size
+
+class DailyCsvWriter:
+    """ バッファ付き・日毎切替の CSV ライター（csv.writer と同じ writerow で使用） """
+    def __init__(self,name,header_rows=(),directory=".",flush_rows=60,flush_seconds=10,
+                 fsync_seconds=60,encoding=None,on_close=None):
+        self.name=name                                          # ファイル名の先頭
+        self.header_rows=list(header_rows)                      # 新規ファイルのヘッダー
+        self.directory=directory
+        self.flush_rows=flush_rows                              # flush する行数
+        self.flush_seconds=flush_seconds                        # flush する経過時間（秒）
+        self.fsync_seconds=fsync_seconds                        # fsync する間隔（秒、0=flush毎）
+        self.encoding=encoding
+        self.on_close=on_close                                  # ファイルを閉じた後の処理 on_close(ファイル名,日付)
+        self.buffer=io.StringIO()
+        self.writer=csv.writer(self.buffer)
+        self.rows=0                                             # バッファ内の行数
+        self.file=None
+        self.path=None
+        self.day=None
+        self.last_flush=self.last_sync=time.monotonic()
+        self.lock=threading.Lock()
+
+    def file_name(self,day):
+        return os.path.join(self.directory,self.name+day.strftime('_20%y_%m_%d')+'.csv')
+
+    def _open(self,day):                                        # 日毎ファイルを開く
+        file_name=self.file_name(day)
+        exists=os.path.exists(file_name) and repair_last_line(file_name)>0
+        self.file=open(file_name,"a",newline="",encoding=self.encoding)
+        self.path=file_name
+        self.day=day
+        if not exists:                                          # 新規ファイルはヘッダー書込
+            csv.writer(self.file).writerows(self.header_rows)
+            self._sync()
+
+    def _write(self):                                           # バッファを1回の write で書込
+        if self.rows:
+            self.file.write(self.buffer.getvalue())
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.rows=0
+        self.file.flush()
+        self.last_flush=time.monotonic()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync=time.monotonic()
+
+    def _close(self):
+        if self.file is None:return
+        self._write()
+        self._sync()
+        self.file.close()
+        self.file=None
+        if self.on_close:self.on_close(self.path,self.day)      # 日替り・終了時（書出し等）
+
+    def writerow(self,row,t=None):
+        """ 1行追加する  t: 行の時刻（エポック秒、省略時は現在時刻）で日毎ファイルを決める """
+        day=datetime.date.fromtimestamp(time.time() if t is None else t)
+        with self.lock:
+            if day!=self.day:                                   # 0時で切替
+                self._close()
+                self._open(day)
+            self.writer.writerow(row)
+            self.rows+=1
+            now=time.monotonic()
+            if self.rows>=self.flush_rows or now-self.last_flush>=self.flush_seconds:
+                self._write()
+                if now-self.last_sync>=self.fsync_seconds:self._sync()
+
+    def flush(self,sync=True):
+        """ バッファを書込む（sync=True で fsync も行う） """
+        with self.lock:
+            if self.file is None:return
+            self._write()
+            if sync:self._sync()
+
+    def close(self):
+        with self.lock:
+            self._close()
@@ -9,6 +9,13 @@ import openpyxl
 from openpyxl import Workbook
 import os
 import threading
+import queue
+from modbus_rtu import FrameParser, frame_gap
+from serial_proxy import SerialProxy
+from csv_log_writer import DailyCsvWriter
+from modbus_correlator import RegisterSnapshot, TransactionCorrelator
+from serial_capture import CaptureWriter, DIR_REQUEST, DIR_RESPONSE
+import csv
 
 modbus_data = {
     0x000b:[1, 1,'Product type',0,["Controller","Controller","Inverter","Integrated inverter controller","Main friequency off-grid"]],
@@ -196,134 +203,75 @@ except serial.SerialException:
     print("ERROR")
     exit()
 
-# CRC16 計算関数
-def calc_crc16(data):
-    """
-    Modbus RTU用CRC16計算
-    """
-    crc = 0xFFFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x0001:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc & 0xFFFF
-
-# Modbusフレームからアドレスデータ抽出
-def extract_modbus_register_address(data):
-    """ Modbusフレームからレジスターアドレスを抽出し、データ数分のアドレスリストを作成 """
-    if len(data) >= 6:  # Modbusフレームの最低長
-        base_address = int.from_bytes(data[2:4], byteorder='big')  # レジスターアドレス（3,4バイト目）
-        register_count = int.from_bytes(data[4:6], byteorder='big')  # レジスターデータの数（5バイト目）
-        
-        address_list = [hex(base_address + i) for i in range(register_count)]  # アドレスリスト作成
-        
-        #print(f"抽出したレジスターアドレス: {hex(base_address)}")
-                
-        return address_list
-    return []
-
-def extract_modbus_register_value(data):
+FRAME_GAP = frame_gap(BAUD_RATE, BYTE_SIZE, PARITY, STOP_BITS)  # フレーム区切りの無通信時間（秒）
+
+# 中継データのキャプチャ（True で記録、再生は python serial_capture.py <ファイル>）
+CAPTURE_ENABLED = False
+capture = CaptureWriter(datetime.now().strftime('capture_%Y%m%d_%H%M%S.scap')) if CAPTURE_ENABLED else None
+
+# ログの見出し
+LOG_HEADERS = ['Timestamp'] + [item[2] for item in modbus_items_sorted] + [
+    'battery energy today discharge(Wh)',
+    'battery energy today charge(Wh)',
+    'battery energy total charge(Wh)',
+    'battery energy total discharge(Wh)',
+]
+
+def excel_file_name(file_prefix, day):
+    """ 書出し先のExcelファイル名（例: test1-2025-01-31.xlsx） """
+    return f"{file_prefix}-{day.strftime('%Y-%m-%d')}.xlsx"
+
+def csv_value(text):
+    """ CSVの文字列を数値に戻す（数値でなければそのまま） """
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+def export_to_excel(csv_file, file_name):
     """
-    Modbusフレームからレジスターデータを抽出し、
-    modbus_dataのリスト1番目が1の場合は2バイト、2の場合は4バイト、3の場合は6バイトで1つの値として処理しリスト化する。
-    CRCエラーの場合はデータを無効とする。
+    日毎CSVから新しい順（2行目が最新）のExcelファイルを作成する。
+    write_only で1回だけ保存するため、行数に比例した時間で済む。
     """
-    if len(data) >= 7:  # レスポンスフレームの最低長
-        data_bytes = data[3:-2]  # データ数バイト以降がデータ部
-        base_addr = int.from_bytes(data[2:4], byteorder='big') if len(data) >= 4 else 0
-        data_list = []
-        idx = 0
-        addr = base_addr
-        while idx < len(data_bytes):
-            word_count = 1
-            if addr in modbus_data and len(modbus_data[addr]) > 0:
-                word_count = modbus_data[addr][0]
-            if word_count == 3 and idx + 6 <= len(data_bytes):
-                value = (
-                    (int.from_bytes(data_bytes[idx:idx+2], byteorder='big', signed=False) << 32) |
-                    (int.from_bytes(data_bytes[idx+2:idx+4], byteorder='big', signed=False) << 16) |
-                    int.from_bytes(data_bytes[idx+4:idx+6], byteorder='big', signed=False)
-                )
-                idx += 6
-            elif word_count == 2 and idx + 4 <= len(data_bytes):
-                value = (
-                    (int.from_bytes(data_bytes[idx:idx+2], byteorder='big', signed=False) << 16) |
-                    int.from_bytes(data_bytes[idx+2:idx+4], byteorder='big', signed=False)
-                )
-                idx += 4
-            elif word_count == 1 and idx + 2 <= len(data_bytes):
-                scale = 1
-                signed_flag = False
-                if addr in modbus_data and len(modbus_data[addr]) > 3:
-                    scale = modbus_data[addr][3]
-                    # 4番目が負ならsignedで変換し、絶対値で割る
-                    #if isinstance(scale, (int, float)) and scale < 0:
-                    #    signed_flag = True
-                    #    scale = abs(scale)
-                if signed_flag:
-                    # 2バイト値をsignedで取得
-                    value = int.from_bytes(data_bytes[idx:idx+2], byteorder='big', signed=True)
-                    value = value / scale
-                else:
-                    value = int.from_bytes(data_bytes[idx:idx+2], byteorder='big', signed=False)
-                    if isinstance(scale, (int, float)) and scale > 1:
-                        value = value / scale
-                idx += 2
-            else:
-                break
-            # 文字列変換
-            if addr in modbus_data:
-                v = modbus_data[addr]
-                if len(v) > 4 and v[3] == 0 and isinstance(v[4], list):
-                    try:
-                        if 0 <= value < len(v[4]):
-                            value = v[4][int(value)]
-                    except Exception:
-                        pass
-            data_list.append(value)
-            addr += 1
-        return data_list
-    return []
-
-# Excelファイルに書き込む関数
-def write_to_excel(log_data_list, file_name):
+    try:
+        with open(csv_file, newline='') as file:
+            rows = list(csv.reader(file))
+        if not rows:
+            return
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Log Data")
+        ws.append(rows[0])
+        for row in reversed(rows[1:]):
+            ws.append([csv_value(v) for v in row])
+        wb.save(file_name)
+        print(f"Excelファイルを書き出しました: {file_name}（{len(rows) - 1}行）")
+    except Exception as e:
+        print(f"Excelファイル書き出し中にエラーが発生しました: {e}")
+
+# ログの追記先（ファイル名の先頭毎の日毎CSV、日替り・終了時にExcelを書出し）
+log_sinks = {}
+
+def write_to_excel(log_data_list, file_prefix):
     """
-    ログデータをExcelファイルに追記する。
-    2行目を改行し、2行目にデータを書き込む（既存データは3行目以降にシフト）。
+    ログデータを日毎CSV（<file_prefix>_20yy_mm_dd.csv）に追記する。
+    1件の書込はファイルの大きさに関係なく一定時間で済む。
+    新しい順のExcelファイルは日替り・終了時に export_to_excel で作成する。
     """
     try:
-        if os.path.exists(file_name):
-            wb = openpyxl.load_workbook(file_name)
-            ws = wb.active
-            # 2行目に空行を挿入してデータを2行目に書き込む
-            ws.insert_rows(2)
-            for i, row in enumerate(log_data_list):
-                for j, value in enumerate(row, 1):
-                    ws.cell(row=2, column=j, value=value)
-        else:
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Log Data"
-            global modbus_items_sorted
-            headers = ['Timestamp'] + [item[2] for item in modbus_items_sorted]
-            headers += [
-                'battery energy today discharge(Wh)',
-                'battery energy today charge(Wh)',
-                'battery energy total charge(Wh)',
-                'battery energy total discharge(Wh)',
-            ]
-            ws.append(headers)
-            for row in log_data_list:
-                ws.append(row)
+        if file_prefix not in log_sinks:
+            log_sinks[file_prefix] = DailyCsvWriter(
+                file_prefix, [LOG_HEADERS], flush_rows=1,
+                on_close=lambda csv_file, day: export_to_excel(csv_file, excel_file_name(file_prefix, day)))
+        for row in log_data_list:
+            log_sinks[file_prefix].writerow(row)
         print(log_data_list)
-        wb.save(file_name)
     except Exception as e:
-        print(f"Excelファイル書き込み中にエラーが発生しました: {e}")
+        print(f"ログファイル書き込み中にエラーが発生しました: {e}")
 
-def process_and_save_data(timestamp, address_list, value_list, file_name):
+def process_and_save_data(timestamp, address_list, value_list, file_prefix):
     """
     address_list: 受信したアドレスリスト（例: [0x000b, 0x0101, ...]）
     value_list:   受信した値リスト（例: [12, 34, ...]）
@@ -402,156 +350,135 @@ def process_and_save_data(timestamp, address_list, value_list, file_name):
     row.append(round(v4 * v33, 1))  # 4番目×33番目
     row.append(round(v4 * v34, 1))  # 4番目×34番目
 
-    write_to_excel([row], file_name)
-
-
-
-# 共有バッファとロック
-shared_data = {"logger1": None, "logger2": None}
-shared_lock = threading.Lock()
-write_event = threading.Event()
-
-def process_and_save_data_sync(logger_id, address_list, value_list, file_name):
-    with shared_lock:
-        now = datetime.now()
-        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-        shared_data[logger_id] = (timestamp, address_list, value_list, file_name)
-        # Loggerが2つある場合のみ両方揃ったら同時書き込み
-        if (ser_logger1 and ser_logger2) and shared_data["logger1"] and shared_data["logger2"]:
-            t, addr1, val1, file1 = shared_data["logger1"]
-            _, addr2, val2, file2 = shared_data["logger2"]
-            process_and_save_data(timestamp, addr1, val1, file1)
-            process_and_save_data(timestamp, addr2, val2, file2)
-            shared_data["logger1"] = None
-            shared_data["logger2"] = None
-        # Loggerが1つだけの場合は即書き込み
-        elif (ser_logger1 and not ser_logger2 and logger_id == "logger1") or (ser_logger2 and not ser_logger1 and logger_id == "logger2"):
-            t, addr, val, file = shared_data[logger_id]
-            process_and_save_data(timestamp, addr, val, file)
-            shared_data[logger_id] = None
-
-# --- handle_logger1_inverter1 の該当部分を修正 ---
-def handle_logger1_inverter1():
-    """ Logger1とInverter1間のデータ送受信を高速に処理するスレッド """
-    try:
-        data_buffer = {}
-        inverter1_frame_buffer = b''  # 受信フレーム結合用バッファ
-        while True:
-            did_process = False
-            if ser_logger1 and ser_inverter1:
-                if ser_logger1.in_waiting:
-                    logger1_data = ser_logger1.read(ser_logger1.in_waiting)
-                    #print(f"[Logger1→Inverter1] 受信: {logger1_data.hex()}")
-                    reg_address = extract_modbus_register_address(logger1_data)
-                    ser_inverter1.write(logger1_data)
-                    #print(f"[Logger1→Inverter1] 送信: {logger1_data.hex()}")
-                    did_process = True
-
-                if ser_inverter1.in_waiting:
-                    inverter1_data = ser_inverter1.read(ser_inverter1.in_waiting)
-                    #print(f"[Inverter1→Logger1] 受信: {inverter1_data.hex()}")
-                    # 受信したら即Loggerへ送信
-                    ser_logger1.write(inverter1_data)
-                    #print(f"[Inverter1→Logger1] 送信: {inverter1_data.hex()}")
-                    # フレームをバッファに追加
-                    inverter1_frame_buffer += inverter1_data
-                    # フレーム終端判定（例：CRC2バイトを含む長さで判定、またはプロトコル仕様に応じて調整）
-                    # ここでは「連続で2つ以上のフレームが来たら結合して処理」とする
-                    # 例: 1フレーム目受信後、2フレーム目受信時に結合して処理
-                    # CRC2バイトを含むフレーム長を判定する場合は下記のように調整
-                    # ここでは単純に2フレーム分たまったら処理
-                    if len(inverter1_frame_buffer) > 0:
-                        # 例: 2フレーム分たまったら処理（必要に応じて判定方法を調整）
-                        # ここでは100ms待って追加受信がなければ処理する簡易方式
-                        time.sleep(0.1)
-                        if not ser_inverter1.in_waiting:
-                            # ファイル書き込み処理は結合したフレームで
-                            reg_value = extract_modbus_register_value(inverter1_frame_buffer)
-                            reg_address = extract_modbus_register_address(logger1_data)
-                            if reg_value and reg_address:
-                                addr_ints = [int(a, 16) for a in reg_address]
-                                for addr, val in zip(addr_ints, reg_value):
-                                    data_buffer[addr] = val
-                                if 0xf040 in addr_ints:
-                                    write_addrs = [addr for addr in modbus_addr_sorted if 0x000b <= addr <= 0xf04b]
-                                    row_values = [data_buffer.get(addr, "") for addr in write_addrs]
-                                    file_name = f"test1-{datetime.now().strftime('%Y-%m-%d')}.xlsx"
-                                    process_and_save_data_sync("logger1", write_addrs, row_values, file_name)
-                                    data_buffer.clear()
-                            inverter1_frame_buffer = b''  # バッファクリア
-                    did_process = True
-
-            if not did_process:
-                time.sleep(0.001)
-    except Exception as e:
-        print(f"Logger1-Inverter1スレッドでエラーが発生しました: {e}")
+    write_to_excel([row], file_prefix)
+
 
-def handle_logger2_inverter2():
-    """ Logger2とInverter2間のデータ送受信を高速に処理するスレッド """
-    try:
-        data_buffer = {}
-        inverter2_frame_buffer = b''
-        while True:
-            did_process = False
-            if ser_logger2 and ser_inverter2:
-                if ser_logger2.in_waiting:
-                    logger2_data = ser_logger2.read(ser_logger2.in_waiting)
-                    print(f"[Logger2→Inverter2] 受信: {logger2_data.hex()}")
-                    reg_address = extract_modbus_register_address(logger2_data)
-                    ser_inverter2.write(logger2_data)
-                    print(f"[Logger2→Inverter2] 送信: {logger2_data.hex()}")
-                    did_process = True
-
-                if ser_inverter2.in_waiting:
-                    inverter2_data = ser_inverter2.read(ser_inverter2.in_waiting)
-                    print(f"[Inverter2→Logger2] 受信: {inverter2_data.hex()}")
-                    ser_logger2.write(inverter2_data)
-                    print(f"[Inverter2→Logger2] 送信: {inverter2_data.hex()}")
-                    inverter2_frame_buffer += inverter2_data
-                    time.sleep(0.1)
-                    if not ser_inverter2.in_waiting:
-                        reg_value = extract_modbus_register_value(inverter2_frame_buffer)
-                        reg_address = extract_modbus_register_address(logger2_data)
-                        if reg_value and reg_address:
-                            addr_ints = [int(a, 16) for a in reg_address]
-                            for addr, val in zip(addr_ints, reg_value):
-                                data_buffer[addr] = val
-                            if 0xf040 in addr_ints:
-                                write_addrs = [addr for addr in modbus_addr_sorted if 0x000b <= addr <= 0xf04b]
-                                row_values = [data_buffer.get(addr, "") for addr in write_addrs]
-                                file_name = f"test2-{datetime.now().strftime('%Y-%m-%d')}.xlsx"
-                                process_and_save_data_sync("logger2", write_addrs, row_values, file_name)
-                                data_buffer.clear()
-                        inverter2_frame_buffer = b''
-                    did_process = True
-
-            if not did_process:
-                time.sleep(0.001)
-    except Exception as e:
-        print(f"Logger2-Inverter2スレッドでエラーが発生しました: {e}")
 
-# スレッドの作成
-threads = []
+# --- 書込スレッド（中継側はキューに入れるだけで、ファイル書込を待たない） ---
+PAIR_WINDOW = 30  # Logger1/Logger2 を同じ行時刻で書き込む最大の時刻差（秒）
+sample_queue = queue.Queue()
+active_loggers = []  # 中継中のLogger（"logger1", "logger2"）
+
+def enqueue_sample(logger_id, address_list, value_list, file_prefix):
+    """ 1周期分の値を書込スレッドに渡す（中継ループから呼ぶ） """
+    sample_queue.put((time.time(), logger_id, address_list, value_list, file_prefix))
+
+def save_samples(samples):
+    """ 同じ行時刻（最後の受信時刻）で書き込む """
+    timestamp = datetime.fromtimestamp(max(sample[0] for sample in samples)).strftime("%Y-%m-%d %H:%M:%S")
+    for t, logger_id, address_list, value_list, file_prefix in samples:
+        process_and_save_data(timestamp, address_list, value_list, file_prefix)
+
+def writer_loop():
+    """
+    キューから受け取った値を変換・保存する。Loggerが2つある場合は PAIR_WINDOW 秒以内の
+    Logger1/Logger2 を組にして同時に書き込み、相手が来ないまま時間を過ぎた値は単独で書き込む。
+    """
+    pending = {}
+    while True:
+        try:
+            sample = sample_queue.get(timeout=PAIR_WINDOW)
+        except queue.Empty:
+            sample = False
+        if sample is None:  # 終了
+            break
+        now = time.time()
+        if sample:
+            logger_id = sample[1]
+            if len(active_loggers) < 2:
+                save_samples([sample])
+                continue
+            if logger_id in pending:  # 相手が来る前に次の周期：前の値は単独で保存
+                save_samples([pending.pop(logger_id)])
+            pending[logger_id] = sample
+            if len(pending) == len(active_loggers):
+                save_samples([pending[logger_id] for logger_id in active_loggers])
+                pending.clear()
+        for logger_id in [logger_id for logger_id, sample in pending.items() if now - sample[0] > PAIR_WINDOW]:
+            save_samples([pending.pop(logger_id)])
+    for sample in pending.values():
+        save_samples([sample])
+    for sink in log_sinks.values():
+        sink.close()  # 未書込分を書込み、当日分をExcelに書出し
+
+# 全Inverterのレジスター最新値（(Inverterポート, スレーブ) 毎、他の処理からも参照可）
+register_snapshot = RegisterSnapshot()
+
+def process_transaction(transaction, state, logger_id, file_prefix):
+    """
+    対応付けたリクエスト・レスポンスの1組を処理する（値はスナップショットに記録済み）。
+    最後のブロック（0xf040）を受信したら、前回の行以降に更新されたレジスターを1行として保存する。
+    """
+    if transaction is None or transaction.registers is None:
+        return  # 対応するリクエストがない、例外応答
+    if transaction.address <= 0xf040 < transaction.address + transaction.count:
+        device = (state["bus"], transaction.slave)
+        write_addrs = [addr for addr in modbus_addr_sorted if 0x000b <= addr <= 0xf04b]
+        row_values = register_snapshot.values(device, write_addrs, since=state["since"], default="")
+        enqueue_sample(logger_id, write_addrs, row_values, file_prefix)
+        state["since"] = time.time()
+
+# --- 受信データは即転送し、フレームの完成（長さ・CRC）を順次判定する ---
+def add_logger_inverter(proxy, ser_logger, ser_inverter, logger_id, file_prefix, verbose=False):
+    """ LoggerとInverter間の中継を登録する（受信した時だけ呼ばれる） """
+    name = logger_id.capitalize()
+    inverter_name = name.replace("Logger", "Inverter")
+    request_parser = FrameParser(False, FRAME_GAP)   # Logger→Inverter のリクエスト切出
+    response_parser = FrameParser(True, FRAME_GAP)   # Inverter→Logger のレスポンス切出
+    correlator = TransactionCorrelator(ser_inverter.port, register_snapshot)
+    state = {"bus": ser_inverter.port, "since": 0}
+
+    def on_request(data):
+        if verbose:
+            print(f"[{name}→{inverter_name}] 中継: {data.hex()}")
+        if capture:
+            capture.write(state["bus"], DIR_REQUEST, data)
+        for frame in request_parser.feed(data):
+            correlator.request(frame)
+
+    def on_response(data):
+        if verbose:
+            print(f"[{inverter_name}→{name}] 中継: {data.hex()}")
+        if capture:
+            capture.write(state["bus"], DIR_RESPONSE, data)
+        # 完成したフレームから順にリクエストと対応付けて処理
+        for frame in response_parser.feed(data):
+            process_transaction(correlator.response(frame), state, logger_id, file_prefix)
+
+    def on_idle():
+        request_parser.expire()
+        response_parser.expire()
+
+    proxy.add_pair(ser_logger, ser_inverter, on_request, on_response)
+    active_loggers.append(logger_id)
+    proxy.add_idle(on_idle)
+
+# 中継ループの作成（全てのLogger/Inverterの組を1つのループで処理）
+proxy = SerialProxy(FRAME_GAP)
 
 if ser_logger1 and ser_inverter1:
-    thread1 = threading.Thread(target=handle_logger1_inverter1, daemon=True)
-    threads.append(thread1)
+    add_logger_inverter(proxy, ser_logger1, ser_inverter1, "logger1", "test1")
 
 if ser_logger2 and ser_inverter2:
-    thread2 = threading.Thread(target=handle_logger2_inverter2, daemon=True)
-    threads.append(thread2)
+    add_logger_inverter(proxy, ser_logger2, ser_inverter2, "logger2", "test2", verbose=True)
 
-# スレッドの開始
-for thread in threads:
-    thread.start()
+# 書込スレッドの開始
+writer_thread = threading.Thread(target=writer_loop, daemon=True)
+writer_thread.start()
 
-# メインスレッドでスレッドの終了を待機
+# 受信待ちループ（Ctrl+Cで終了）
 try:
-    for thread in threads:
-        thread.join()
+    if proxy.ports:
+        proxy.run()
 except KeyboardInterrupt:
     print("データ交換を終了します。")
+except Exception as e:
+    print(f"中継ループでエラーが発生しました: {e}")
 finally:
+    sample_queue.put(None)  # 書込スレッドの終了を待つ
+    writer_thread.join()
+    if capture:
+        capture.close()
     if ser_logger1 and ser_logger1.is_open:
         ser_logger1.close()
     if ser_inverter1 and ser_inverter1.is_open:
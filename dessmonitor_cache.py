@@ -0,0 +1,81 @@
+# Dessmonitor 解析結果のディスクキャッシュ
+# ----------概要
+# 過去分の energy-storage-container-*.xlsx は書き換わらないため、ファイル毎の解析結果
+# （dessmonitor_reader の配列・タプル）を SQLite 1ファイルに保存しておき、パス・サイズ・
+# 更新時刻が同じ間は xlsx を開かずに返す。新しい・変更されたファイルだけ解析し直す。
+# キーには解析関数名と引数も含める。解析内容を変えた場合は CACHE_VERSION を上げる。
+import os
+import pickle
+import sqlite3
+
+CACHE_VERSION=1                                                 # 解析結果の形式（変えたら上げる）
+CACHE_FILE=os.path.join(os.path.expanduser("~"),".dessmonitor_cache.sqlite3") # 既定の保存先
+MISS=object()                                                   # キャッシュなし（None も結果になり得る）
+
+class ParseCache:
+    """ 解析結果のキャッシュ  key() で鍵を作り lookup() / store()、または get() で解析込み """
+    def __init__(self,file_name=CACHE_FILE):
+        self.file_name=file_name
+        self.conn=sqlite3.connect(file_name)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS parsed (path TEXT, parser TEXT, size INTEGER,"
+                          " mtime INTEGER, data BLOB, PRIMARY KEY (path, parser))")
+        self.stats={"hits":0,"misses":0}
+
+    def key(self,file_path,parse,**kwargs):
+        """ (絶対パス, 解析関数と引数, サイズ, 更新時刻ns)  ファイルがない場合は OSError """
+        path=os.path.abspath(file_path)
+        st=os.stat(path)
+        parser=f"{parse.__module__}.{parse.__qualname__}{sorted(kwargs.items())} v{CACHE_VERSION}"
+        return path,parser,st.st_size,st.st_mtime_ns
+
+    def lookup(self,key):
+        """ 保存済みの結果（サイズ・更新時刻が違う・未保存は MISS） """
+        path,parser,size,mtime=key
+        row=self.conn.execute("SELECT size, mtime, data FROM parsed WHERE path=? AND parser=?",(path,parser)).fetchone()
+        if row is None or row[0]!=size or row[1]!=mtime:
+            self.stats["misses"]+=1
+            return MISS
+        try:
+            value=pickle.loads(row[2])
+        except Exception:                                       # 読めない結果は解析し直す
+            self.stats["misses"]+=1
+            return MISS
+        self.stats["hits"]+=1
+        return value
+
+    def store(self,key,value):
+        """ 結果を保存する（同じパス・解析関数の古い結果は置換え）  確定は commit() """
+        path,parser,size,mtime=key
+        self.conn.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?, ?)",
+                          (path,parser,size,mtime,pickle.dumps(value,pickle.HIGHEST_PROTOCOL)))
+
+    def get(self,file_path,parse,**kwargs):
+        """ キャッシュがあれば返し、なければ parse(file_path,**kwargs) して保存する """
+        key=self.key(file_path,parse,**kwargs)
+        value=self.lookup(key)
+        if value is MISS:
+            value=parse(file_path,**kwargs)
+            self.store(key,value)
+            self.commit()
+        return value
+
+    def prune(self):
+        """ 存在しなくなったファイルの結果を削除する  戻り値: 削除件数 """
+        paths=[row[0] for row in self.conn.execute("SELECT DISTINCT path FROM parsed")]
+        gone=[(path,) for path in paths if not os.path.exists(path)]
+        self.conn.executemany("DELETE FROM parsed WHERE path=?",gone)
+        self.commit()
+        return len(gone)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
@@ -0,0 +1,74 @@
+# Dessmonitor エクスポートフォルダーの並列読込
+# ----------概要
+# フォルダー内の xlsx をプロセスプールで並列に解析し、ファイル毎の結果（配列・タプル）を
+# 元のファイル順で親プロセスに返す。集計は親プロセスで行う。
+# 子プロセスは呼出し元のスクリプトを読み直す（Windows の spawn）ため、呼出し元の処理は
+# if __name__ == "__main__": の中に置くこと。解析関数はモジュールの関数（pickle 可能）を渡す。
+# 解析結果のキャッシュ（dessmonitor_cache）を渡すと、新しい・変更されたファイルだけ解析する。
+import fnmatch
+import os
+from concurrent.futures import ProcessPoolExecutor,as_completed
+from functools import partial
+from dessmonitor_cache import MISS
+
+MIN_PARALLEL=4                                                  # これより少ないファイル数は逐次処理
+
+def find_files(folder,patterns=("*.xlsx",)):
+    """ フォルダー配下（再帰）のファイルを名前順で返す """
+    files=[]
+    for root,_,names in os.walk(folder):
+        files+=[os.path.join(root,name) for name in names
+                if any(fnmatch.fnmatch(name,pattern) for pattern in patterns)]
+    return sorted(files)
+
+def print_progress(done,total,file_path):                       # 進捗表示（既定）
+    print(f"\r読込 {done}/{total} {os.path.basename(file_path)[:60]:<60}",end="" if done<total else "\n",flush=True)
+
+def ingest(files,parse,workers=None,progress=None,cache=None,**kwargs):
+    """
+    各ファイルを parse(file_path,**kwargs) で解析する  戻り値: [(ファイル, 結果), ...]（入力順）
+    解析に失敗したファイルの結果は例外オブジェクト  progress(済み件数,全件数,ファイル) は親で呼ぶ
+    cache: ParseCache（dessmonitor_cache）を渡すと、変わっていないファイルは解析せず保存済みの結果を使う
+    """
+    if cache is None:
+        return list(zip(files,parse_files(files,parse,workers,progress,**kwargs)))
+    results=[None]*len(files)
+    keys={}                                                     # {番号: 鍵}  解析が必要なファイル
+    for i,file_path in enumerate(files):
+        try:
+            key=cache.key(file_path,parse,**kwargs)
+        except OSError as e:
+            results[i]=e
+            continue
+        results[i]=cache.lookup(key)
+        if results[i] is MISS:keys[i]=key
+    parsed=parse_files([files[i] for i in keys],parse,workers,progress,**kwargs)
+    for (i,key),result in zip(keys.items(),parsed):
+        results[i]=result
+        if not isinstance(result,Exception):cache.store(key,result)
+    cache.commit()
+    return list(zip(files,results))
+
+def parse_files(files,parse,workers=None,progress=None,**kwargs):
+    """ 各ファイルを解析する（少数は逐次、それ以外はプロセスプール）  戻り値: 結果のリスト（入力順） """
+    parse=partial(parse,**kwargs) if kwargs else parse
+    workers=workers or os.cpu_count() or 1
+    results=[None]*len(files)
+    if workers<=1 or len(files)<MIN_PARALLEL:                   # 少数は起動時間の方が長い
+        for i,file_path in enumerate(files):
+            try:
+                results[i]=parse(file_path)
+            except Exception as e:
+                results[i]=e
+            if progress:progress(i+1,len(files),file_path)
+        return results
+    with ProcessPoolExecutor(max_workers=min(workers,len(files))) as pool:
+        futures={pool.submit(parse,file_path):i for i,file_path in enumerate(files)}
+        for done,future in enumerate(as_completed(futures),1):
+            i=futures[future]
+            try:
+                results[i]=future.result()
+            except Exception as e:
+                results[i]=e
+            if progress:progress(done,len(files),files[i])
+    return results
@@ -0,0 +1,118 @@
+# Dessmonitor エクスポート（xlsx）読込
+# ----------概要
+# energy-storage-container-*.xlsx を read_only / values_only で先頭から1回だけ読み、
+# 日時と指定列の数値を NumPy 配列にまとめて返す。ブックは行オブジェクトを作らずに
+# 流し読みするため、1年分のフォルダーでもメモリー使用量は1ファイル分の配列だけで済む。
+# 読込関数はプロセスプール（dessmonitor_ingest）から呼ばれるため、結果は配列・タプルで返す。
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+import openpyxl
+
+DATE_FORMATS=("%Y-%m-%d %H:%M:%S","%Y-%m-%d")                    # 日付文字列の書式（先頭が日時）
+
+# time:日時 datetime64[s]  has_time:時刻付きの行  values:指定列の数値（変換できない・列がない場合は NaN）
+EnergyData=namedtuple("EnergyData","time has_time values")
+# 日付・時毎（古い順）  date:"YYYY-MM-DD"  hour:時  pv:発電量  energy:蓄電量  charge:商用充電量（kWh）
+HourlyEnergy=namedtuple("HourlyEnergy","date hour pv energy charge")
+
+def parse_date(value):
+    """ セルの日付を datetime に変換する  戻り値: (datetime または None, 時刻付きか) """
+    if isinstance(value,datetime):return value,True
+    if isinstance(value,str):
+        for i,fmt in enumerate(DATE_FORMATS):
+            try:
+                return datetime.strptime(value,fmt),i==0
+            except ValueError:
+                pass
+        print(f"無効な日付データ: {value}")
+    return None,False
+
+def to_float(value):
+    """ セルの値を数値に変換する（カンマ区切り可、変換できない場合は NaN） """
+    if isinstance(value,str):value=value.replace(",","")
+    try:
+        return float(value)
+    except (ValueError,TypeError):
+        return np.nan
+
+def read_energy_columns(file_path,columns=(30,31),date_column=0):
+    """
+    ヘッダーを除く全行の日時と指定列（0始まり）の数値を読込む（日付のない行は除く）
+    行の順番はファイルのまま（Dessmonitor のエクスポートは新しい順）
+    """
+    width=max(columns)+1
+    times,has_time,values=[],[],[]
+    wb=openpyxl.load_workbook(file_path,read_only=True,data_only=True)
+    try:
+        for row in wb.active.iter_rows(min_row=2,values_only=True):
+            if not row:continue
+            t,full=parse_date(row[date_column])
+            if t is None:continue
+            times.append(t)
+            has_time.append(full)
+            values.append([to_float(row[c]) for c in columns] if len(row)>=width else [np.nan]*len(columns))
+    finally:
+        wb.close()
+    return EnergyData(np.array(times,dtype="datetime64[s]"),np.array(has_time,dtype=bool),
+                      np.array(values,dtype=np.float64).reshape(-1,len(columns)))
+
+def read_cells(file_path,row=3,columns=(0,29,30)):
+    """ 1行（1始まり）の指定列（0始まり）の値を返す（列が足りない場合は None） """
+    wb=openpyxl.load_workbook(file_path,read_only=True,data_only=True)
+    try:
+        for values in wb.worksheets[0].iter_rows(min_row=row,max_row=row,values_only=True):
+            if len(values)>max(columns):return tuple(values[c] for c in columns)
+        return None
+    finally:
+        wb.close()
+
+def read_columns(file_path,columns,min_row=1):
+    """ 指定列（1始まり）の空でないセルの値を列毎のリストで返す（ブックは1回だけ流し読み） """
+    data=[[] for _ in columns]
+    wb=openpyxl.load_workbook(file_path,read_only=True,data_only=True)
+    try:
+        for row in wb.active.iter_rows(min_row=min_row,values_only=True):
+            for values,c in zip(data,columns):
+                if c<=len(row) and row[c-1] is not None:values.append(row[c-1])
+    finally:
+        wb.close()
+    return data
+
+def read_hourly_energy(file_path):
+    """
+    日付・時毎の発電量（30列目）・蓄電量（31列目）の増加分と、商用充電量
+    （9列目×10列目−22列目、5分毎を kWh 換算、負は0）の合計を返す
+    日時が "YYYY-MM-DD HH:MM:SS" 文字列の行のみ対象とする
+    """
+    dates,hours,rows=[],[],[]
+    wb=openpyxl.load_workbook(file_path,read_only=True,data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(min_row=2,values_only=True):
+            if not row or not isinstance(row[0],str) or len(row[0])<13:continue
+            try:
+                hour=int(row[0][11:13])
+            except ValueError:
+                continue
+            dates.append(row[0][:10])
+            hours.append(hour)
+            rows.append([to_float(row[c]) if len(row)>c else np.nan for c in (29,30,8,9,21)])
+    finally:
+        wb.close()
+    if not rows:
+        empty=np.zeros(0)
+        return HourlyEnergy(np.zeros(0,dtype="U10"),np.zeros(0,dtype=np.int16),empty,empty,empty)
+    date=np.array(dates[::-1])                                  # 古い順（エクスポートは新しい順）
+    hour=np.array(hours[::-1],dtype=np.int16)
+    v=np.array(rows[::-1],dtype=np.float64)
+    order=np.lexsort((hour,date))                               # 日付・時の順（同じ時の中は元の順）
+    date,hour,v=date[order],hour[order],v[order]
+    start=np.flatnonzero(np.r_[True,(date[1:]!=date[:-1])|(hour[1:]!=hour[:-1])]) # 各グループの先頭
+    end=np.r_[start[1:],len(date)]-1                            # 各グループの最後
+    def increase(col):                                          # 最後−最初（減少・1件のみは0）
+        first,last=v[start,col],v[end,col]
+        return np.where((first>last)|(start==end),0.0,last-first)
+    charge=(v[:,2]*v[:,3]-v[:,4])*(1/12000)
+    charge=np.where(charge<0,0.0,charge)
+    charge[start]=0.0                                           # 各グループの先頭行は含めない
+    return HourlyEnergy(date[start],hour[start],increase(0),increase(1),np.add.reduceat(charge,start))
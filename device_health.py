@@ -0,0 +1,80 @@
+# 機器通信状態管理
+# ----------概要
+# 機器（ポート・スレーブ）毎に連続読出失敗回数を記録し、通信断の機器は指数バックオフで
+# 読出を休止する。再試行時は全レジスターではなく1レジスターの確認読出（プローブ）だけを行い、
+# 応答があった場合のみ通常読出に戻す。読出できなかった機器は None を返し、呼出し側で欠測とする。
+# 1台の通信断で他の機器の計測周期が遅れないように、連続失敗中の機器は再試行・再接続せずに読出し、
+# 2回目以降の失敗は1回分のタイムアウトに抑える。
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+from modbus_connection import ModbusReadError                   # Modbus読出失敗
+
+class DeviceState:
+    """ 1台分の通信状態 """
+    __slots__=("failures","next_retry","offline_since","last_error")
+    def __init__(self):
+        self.failures=0                                         # 連続失敗回数
+        self.next_retry=0.0                                     # 次回再試行時刻（monotonic秒）
+        self.offline_since=None                                 # 通信断の開始時刻（エポック秒）
+        self.last_error=None
+
+    @property
+    def online(self):
+        return self.offline_since is None
+
+class DeviceHealth:
+    """ 機器毎の通信状態と再試行タイミングを管理する """
+    def __init__(self,fail_threshold=2,base_backoff=2,max_backoff=300):
+        self.fail_threshold=fail_threshold                      # 通信断と判定する連続失敗回数
+        self.base_backoff=base_backoff                          # 最初の休止時間（秒）
+        self.max_backoff=max_backoff                            # 最大休止時間（秒）
+        self.devices={}
+        self.lock=threading.Lock()
+
+    def state(self,key):
+        with self.lock:
+            return self.devices.setdefault(key,DeviceState())
+
+    def _success(self,key,st):
+        if not st.online:
+            print("通信復帰:",key,f"{time.time()-st.offline_since:.0f}秒")
+        st.failures=0
+        st.next_retry=0.0
+        st.offline_since=None
+        st.last_error=None
+
+    def _failure(self,key,st,error):
+        st.failures+=1
+        st.last_error=error
+        over=st.failures-self.fail_threshold
+        if over<0:return                                        # 一時的な失敗は次サイクルで再読出
+        if st.online:
+            st.offline_since=time.time()
+            print("通信断:",key,error)
+        st.next_retry=time.monotonic()+min(self.base_backoff*2**over,self.max_backoff)
+
+    def read(self,key,read,probe):
+        """
+        read(retries): 通常読出関数  probe(retries): 確認読出関数（1レジスター）
+        retries: 読出毎の再接続回数（失敗中の機器は 0、それ以外は None=接続マネージャーの既定値）
+        戻り値: 読出結果  休止中・読出失敗時は None
+        """
+        st=self.state(key)
+        retries=0 if st.failures else None                      # 失敗中は再試行しない
+        try:
+            if not st.online:
+                if time.monotonic()<st.next_retry:return None   # バックオフ中は読出しない
+                probe(retries)                                  # 確認読出のみで判定
+            result=read(retries)
+        except ModbusReadError as e:
+            self._failure(key,st,e)
+            return None
+        self._success(key,st)
+        return result
+
+    def status(self):
+        """ 機器毎の (通信中, 連続失敗回数) """
+        with self.lock:
+            return {key:(st.online,st.failures)for key,st in self.devices.items()}
+
+device_health=DeviceHealth()                                    # 共有通信状態
@@ -0,0 +1,95 @@
+# 土日祝カレンダー（日単位の bool 配列）
+# ----------概要
+# 対象期間の各日が土日祝（休日）かを bool 配列で1回だけ作り、ファイルに保存して次回の起動でも使う。
+# 判定は日付の配列から配列の番号を引くだけで、集計の途中で jpholiday・pd.to_datetime を呼ばない。
+# 期間は年単位で持ち、範囲外の日付が来た時に足りない年だけ作って広げる。
+# jpholiday の版が変わった場合（祝日の追加・変更）は保存ファイルを使わずに作り直す。
+import os
+import numpy as np
+import jpholiday                                                # 日本の祝日判定
+
+CALENDAR_FILE=os.path.join(os.path.expanduser("~"),".holiday_calendar.npz") # 既定の保存先
+VERSION=str(getattr(jpholiday,"__version__",None) or os.path.getmtime(jpholiday.__file__)) # 祝日表の版
+
+def to_days(values):
+    """ 日付・日時（datetime/Timestamp/文字列/datetime64 の配列・単体）を datetime64[D] の配列にする """
+    values=np.asarray(values)
+    if values.dtype.kind!="M":values=values.astype("datetime64[s]")
+    return values.astype("datetime64[D]")
+
+def build_flags(first_year,last_year):
+    """ first_year/1/1～last_year/12/31 の土日祝の bool 配列 """
+    start=np.datetime64(f"{first_year:04d}-01-01")
+    days=np.arange(start,np.datetime64(f"{last_year+1:04d}-01-01"))
+    flags=(days.astype(np.int64)+3)%7>=5                        # 土日（1970-01-01 は木曜）
+    for year in range(first_year,last_year+1):
+        for day,_ in jpholiday.year_holidays(year):             # 祝日（振替休日を含む）
+            flags[(np.datetime64(day,"D")-start).astype(np.int64)]=True
+    return flags
+
+class HolidayCalendar:
+    """ 土日祝カレンダー  lookup(日付の配列) で判定する """
+    def __init__(self,file_name=CALENDAR_FILE):
+        self.file_name=file_name                                # None の場合は保存しない
+        self.first_year=self.last_year=None
+        self.flags=np.zeros(0,dtype=bool)                       # first_year/1/1 からの日毎
+        self.load()
+
+    def load(self):
+        """ 保存ファイルを読む（ない・版が違う・壊れている場合は空のまま） """
+        if not self.file_name or not os.path.exists(self.file_name):return
+        try:
+            with np.load(self.file_name) as saved:
+                if str(saved["version"])!=VERSION:return
+                flags=saved["flags"].astype(bool)
+                first_year,last_year=int(saved["first_year"]),int(saved["last_year"])
+        except Exception:
+            return
+        if len(flags)==(np.datetime64(f"{last_year+1:04d}-01-01")-np.datetime64(f"{first_year:04d}-01-01")).astype(np.int64):
+            self.flags,self.first_year,self.last_year=flags,first_year,last_year
+
+    def save(self):
+        if not self.file_name:return
+        temp=self.file_name+".tmp.npz"                          # 書込中に読まれないよう置換えで保存
+        try:
+            np.savez(temp,version=VERSION,first_year=self.first_year,last_year=self.last_year,flags=self.flags)
+            os.replace(temp,self.file_name)
+        except OSError as e:
+            print(f"土日祝カレンダーを保存できません: {e}")
+
+    def cover(self,first_year,last_year):
+        """ first_year～last_year を含むように広げる（足りない年だけ作り、広げた場合は保存） """
+        if self.first_year is None:
+            self.flags=build_flags(first_year,last_year)
+        elif first_year<self.first_year or last_year>self.last_year:
+            parts=[self.flags]
+            if first_year<self.first_year:parts.insert(0,build_flags(first_year,self.first_year-1))
+            if last_year>self.last_year:parts.append(build_flags(self.last_year+1,last_year))
+            self.flags=np.concatenate(parts)
+            first_year,last_year=min(first_year,self.first_year),max(last_year,self.last_year)
+        else:
+            return
+        self.first_year,self.last_year=first_year,last_year
+        self.save()
+
+    def lookup(self,days):
+        """ 日付の配列 → 土日祝の bool 配列（NaT は False） """
+        days=to_days(days)
+        valid=~np.isnat(days)
+        if not valid.any():return np.zeros(days.shape,dtype=bool)
+        years=days[valid].astype("datetime64[Y]").astype(np.int64)+1970
+        self.cover(int(years.min()),int(years.max()))
+        index=np.where(valid,(days-np.datetime64(f"{self.first_year:04d}-01-01")).astype(np.int64),0)
+        return valid&self.flags[index]
+
+_calendar=None
+
+def calendar():
+    """ 共通の土日祝カレンダー（初回に保存ファイルを読む） """
+    global _calendar
+    if _calendar is None:_calendar=HolidayCalendar()
+    return _calendar
+
+def non_working_days(days):
+    """ 土日祝の判定（日付の配列 → bool 配列、NaT は False） """
+    return calendar().lookup(days)
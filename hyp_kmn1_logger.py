@@ -1,12 +1,21 @@
 # HYP4850U100-H_parallel_KM-N1_Logger
 # ----------初期設定
-from pymodbus.client import ModbusSerialClient as ModbusClient  # Modbus組込
+from modbus_connection import modbus_pool                       # Modbus常時接続マネージャー組込
+from device_health import device_health                        # 機器通信状態管理組込
+from modbus_planner import plan_tiered_reads,slice_block_results # 一括読出プランナー組込
+from modbus_poller import port_poller                           # 複数バス同時読出組込
+from register_decoder import compile_decoder                    # レジスターデコーダー組込
+from register_tables import RATE_CLASS,p_data,k_data,p_group,k_group # レジスターテーブル組込
 import csv                                                      # CSVファイルモジュール組込
 #from openpyxl import load_workbook                              # xlsxファイルモジュール組込
 import datetime                                                 # 時計モジュール組込
-from time import sleep                                          # タイマー組込
+from sampling_scheduler import IntervalScheduler,TierTimer,TIMING_HEADER # 計測周期スケジューラー組込
 import tkinter as tk                                            # GUIモジュール組込
 import threading                                                # スレッド組込
+from tk_display import DisplayBridge                            # Tk表示ブリッジ組込
+from live_chart import LiveChart                                # ライブチャート組込
+from binary_store import BinaryStore                            # バイナリログストア組込
+from csv_log_writer import DailyCsvWriter                       # 日毎CSVライター組込
 import matplotlib.pyplot as plt                                 # グラフ作成
 import matplotlib.ticker as ticker                              # グラフ補助
 import matplotlib.animation as animation                        # グラフ補助
@@ -19,60 +28,11 @@ import glob
 import os
 #import pydrive                                                  # GoogleDrive組込
 
+plt.rcParams['font.family']='MS Gothic'                         # Windows の場合（ライブチャートの日本語表示）
 
-interval1=5.9                                                   # 待ち時間（秒）
+interval1=RATE_CLASS["fast"]                                    # 計測周期（秒）
 
-# ----------ログパラメーター [0address,1byte,2x,3y,4type,5name,6unit,7len,8min,9max,10set,11data...]
-p_data=[[0x0213,1,0,2,1,"系統電圧","V(AC)"],
-        [0x0214,1,0,3,1,"系統電流","A(AC)"],
-        [0x0215,1,0,4,2,"系統周波数","Hz"],
-        [0x021e,1,0,5,1,"系統充電電流","A(AC)"],
-        [0x0210,1,0,7,8,"機器状態","",0,0,0,"起動","待機","初期化","省電力","商用出力",
-        "インバーター出力","系統出力","混合出力","-","-","停止","故障"],
-        [0x0216,1,0,8,1,"出力電圧","V(AC)"],
-        [0x0219,1,0,9,1,"出力電流","A(AC)"],
-        [0x0218,1,0,10,2,"出力周波数","Hz"],
-        [0x021b,1,0,11,0,"負荷有効電力","W"],
-        [0x021c,1,0,12,0,"負荷皮相電力","W"],
-        [0x021f,1,0,13,0,"負荷率","%"],
-        
-        [0x010b,1,0,15,8,"充電状態","",0,0,0,"未充電","定電流(CC)充電","定電圧(CV)充電","-",
-        "浮遊充電","-","充電中1","充電中2"],
-        [0x0100,1,0,16,0,"蓄電池SOC","%"],
-        [0x0101,1,0,17,1,"蓄電池電圧","V(DC)"],
-        [0x0102,1,0,18,1,"蓄電池電流","A(DC)"],
-        [0x010e,1,0,19,0,"充電電力","W"],
-        [0x0217,1,0,20,1,"INV電流 ","A(DC)"],
-        
-        [0x0107,1,0,22,1,"PV入力電圧","V(DC)"],
-        [0x0108,1,0,23,1,"PV入力電流","A(DC)"],
-        [0x0109,1,0,24,0,"PV入力電力","W"],
-        [0x0224,1,0,25,1,"PV降圧電流","A(DC)"],
-           
-        [0x0212,1,0,27,1,"DCバス電圧","V(DC)"],
-        [0x0225,1,0,28,1,"降圧電流","A(DC)"],
-        [0x0220,1,0,29,1,"PVHT温度","℃"],
-        [0x0221,1,0,30,1,"INVHT温度","℃"],
-        [0x0222,1,0,31,1,"Tr温度","℃"],
-        [0x0223,1,0,32,1,"内部温度","℃"],
-           
-        [0xf02d,1,5,2,0,"本日充電量","Ah"],
-        [0xf02e,1,5,3,0,"本日放電量","Ah"],
-        [0xf02f,1,5,4,1,"本日発電量","kWh"],
-        [0xf030,1,5,5,1,"本日消費量","kWh"],
-        [0xf03c,1,5,6,0,"本日商用充電量","Ah"],
-        [0xf03d,1,5,7,1,"本日商用電力消費量","kWh"],
-        [0xf03e,1,5,8,0,"本日インバーター稼働時間","時間"],
-        [0xf03f,1,5,9,0,"本日バイパス稼働時間","時間"],
-
-        [0xf034,2,5,11,0,"累積充電量","Ah"],
-        [0xf036,2,5,12,0,"累積放電量","Ah"],
-        [0xf038,2,5,13,0,"累積発電量","kWh"],
-        [0xf03a,2,5,14,0,"累積負荷積算電力量","kWh"],
-        [0xf046,2,5,15,0,"累積商用充電量","kWh"],
-        [0xf048,2,5,16,0,"累積商用負荷電力消費量","kWh"],
-        [0xf04a,1,5,17,0,"累積インバーター稼働時間","時間"],
-        [0xf04b,1,5,18,0,"累積バイパス稼働時間","時間"]]
+# ----------合算・表示パラメーター
 r_data=[["蓄電池総合電流",5,20,1,1,"A"],["蓄電池総合電力",5,21,2,1,"kW"],
         ["PV発電総合電力",5,22,3,3,"kW"],["AC入力総合電力",5,23,4,3,"kVA"],
         ["AC出力総合電力",5,24,5,3,"kW"],["機器消費電力",5,25,6,0,"W"],
@@ -86,26 +46,13 @@ t_data=[["日時",4,0,4],["L1側",1,1,1],["L2側",3,1,1],["L1側",6,1,1],
         ["内部システム",0,26,0],["当日積算データ",5,1,0],
         ["累積積算データ",5,10,0],["KM-N1データ",0,35,0],["入力側",1,35,1],
         ["出力側",3,35,1],["入力側",6,35,1],["出力側",8,35,1]]
-k_data=[[0x0000,2,0,36,1,"電圧1","V"],
-        [0x0002,2,0,37,1,"電圧2","V"],
-        [0x0004,2,0,38,1,"電圧3","V"],
-        [0x0006,2,0,39,3,"電流1","A"],
-        [0x0008,2,0,40,3,"電流2","A"],
-        [0x000a,2,0,41,3,"電流3","A"],
-        [0x000c,2,0,42,2,"力率",""],
-        [0x000e,2,0,43,1,"周波数","Hz"],
-        [0x0010,2,0,44,1,"有効電力","W"],
-        [0x0012,2,0,45,1,"無効電力","Var"],
-        [0x0200,2,5,36,0,"積算有効電力量","Wh"],
-        [0x0202,2,5,37,0,"積算回生電力量","Wh"],
-        [0x0204,2,5,38,0,"積算進み無効電力量","Varh"],
-        [0x0206,2,5,39,0,"積算遅れ無効電力量","Varh"],
-        [0x0208,2,5,40,0,"積算総合無効電力量","Varh"],
-        [0x0220,2,5,41,0,"積算有効電力量","kWh"],
-        [0x0222,2,5,42,0,"積算回生電力量","kWh"],
-        [0x0224,2,5,43,0,"積算進み無効電力量","kVarh"],
-        [0x0226,2,5,44,0,"積算遅れ無効電力量","kVarh"],
-        [0x0228,2,5,45,0,"積算総合無効電力量","kVarh"]]
+# ----------チャートパラメーター [0name,1グラフ番号]
+c_axes=["L1側 電力(W)","L2側 電力(W)","蓄電池SOC(%)","KM-N1 有効電力(W)"]
+c_data=[["PV入力",0],["蓄電池",0],["AC入力",0],["AC出力",0],
+        ["PV入力",1],["蓄電池",1],["AC入力",1],["AC出力",1],
+        ["L1側",2],["L2側",2],["入力側",3],["出力側",3]]
+p_index={row[0]:i for i,row in enumerate(p_data)}              # アドレス→項目番号
+k_index={row[0]:i for i,row in enumerate(k_data)}
 # ----------設定パラメーター [0address,1byte,2x,3y,4type,5name,6unit,7len,8min,9max,10set,11data...]
 s_data=[[0xe004,1,0,2,8,"蓄電池タイプ","",14,0,13,"設定08","ユーザー設定","密閉型鉛","開放型鉛","ゲル型鉛",
           "LFPx14","LEPx15","LFPx16","LFPx7","LFPx8","LFPx8","NCAx7","NCAx8","NCAx13","NCAx14"],#0
@@ -189,23 +136,18 @@ s_data=[[0xe004,1,0,2,8,"蓄電池タイプ","",14,0,13,"設定08","ユーザー
         [0xe033,1,10,15,6,"放電時間設定","",0,0,0,"設定53"]]
 
 # ----------Modbus接続設定
-client1=ModbusClient(framer="rtu",port="COM7",                  # Hybrid1（Windows）
-                       baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
-client2=ModbusClient(framer="rtu",port="COM8",                  # Hyblid2（Windows）
-                       baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1)
-client3=ModbusClient(framer="rtu",port="COM9",                  # KM-N112（Windows）
-                       baudrate=9600,bytesize=8,stopbits=2,parity='N',timeout=1)
+HYB1_PORT,HYB2_PORT,KMN1_PORT="COM7","COM8","COM9"              # Hybrid1,Hyblid2,KM-N112（Windows）
+READ_TIMEOUT=0.5                                                # 1回の読出タイムアウト（秒）:125レジスターで約0.3秒
+modbus_pool.add_port(HYB1_PORT,baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=READ_TIMEOUT)
+modbus_pool.add_port(HYB2_PORT,baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=READ_TIMEOUT)
+modbus_pool.add_port(KMN1_PORT,baudrate=9600,bytesize=8,stopbits=2,parity='N',timeout=READ_TIMEOUT)
 # ----------ハイブリッドインバーターデータ取得
-def hybrid_modbus_read(slave_add,slave_count):                  # ファンクション03h
-    client1.connect()                                           # ポート接続
-    client2.connect()
-    read_data1=client1.read_holding_registers(
-        address=slave_add,count=slave_count,slave=0)
-    read_data2=client2.read_holding_registers(
-        address=slave_add,count=slave_count,slave=1)
-    client1.close()                                             # ポート切断
-    client2.close()
-    return read_data1.registers,read_data2.registers
+def hybrid_modbus_read(slave_add,slave_count):                  # ファンクション03h（通信断の機器は None）
+    read_data1,read_data2=(device_health.read((port,slave),     # 常時接続ポートから読出
+        lambda retries:modbus_pool.read_holding_registers(port,slave_add,slave_count,slave=slave,retries=retries),
+        lambda retries:modbus_pool.read_holding_registers(port,slave_add,1,slave=slave,retries=retries))
+        for port,slave in ((HYB1_PORT,0),(HYB2_PORT,1)))
+    return read_data1,read_data2
 # ----------未接続時テスト用
     test_data=[ [0x010b,[1],[2]],[0x0100,[53],[54]],[0x0101,[524],[525]],[0x0102,[10],[10]],[0x010e,[241],[242]],
                 [0x0107,[1727],[1728]],[0x0108,[14],[15]],[0x0109,[241],[242]],[0x0224,[4],[5]],
@@ -232,13 +174,11 @@ def hybrid_modbus_read(slave_add,slave_count):                  # ファンク
 
 # ----------KM-N1データ取得
 def kmn1_modbus_read(slave_add,slave_count):                    # ファンクション03h
-    client3.connect()                                           # ポート接続
-    read_data3=client3.read_holding_registers(
-        address=slave_add,count=slave_count,slave=0)
-    read_data4=client3.read_holding_registers(
-        address=slave_add,count=slave_count,slave=1)
-    client3.close()                                             # ポート切断
-    return read_data3.registers,read_data4.registers
+    read_data3=modbus_pool.read_holding_registers(              # 常時接続ポートから読出
+        KMN1_PORT,slave_add,slave_count,slave=0)
+    read_data4=modbus_pool.read_holding_registers(
+        KMN1_PORT,slave_add,slave_count,slave=1)
+    return read_data3,read_data4
 # ----------未接続時テスト用
     test_data=[[0x0000,[0,0],[0,966]],[0x0002,[0,0],[0,1012]],[0x0004,[0,0],[0,1977]],
                [0x0006,[0,0],[0,5943]],[0x0008,[0,0],[0,3466]],[0x000a,[0,0],[0,3208]],
@@ -260,93 +200,104 @@ def change_minus(rdd):                                          # 負変換
     if rdd>32767 :rdd=rdd-65536
     return rdd
 
-def change_type(d_type,rdd,sys_volt,byte,d_add,n_data):         # データタイプ変換
-    if d_type<5:
-        if d_type<4:                                            # 1/10,1/100,1/1000判定
-            if byte==1 :                                        # 16bit
-                rdd=change_minus(rdd)
-            if byte==2 :                                        # 32byte
-                if rdd>2147483647 :rdd=rdd-4294967295
-            data_list=[rdd,rdd/10,rdd/100,rdd/1000]
-            d=data_list[d_type]
-        if d_type==4:                                           # 電圧データ判定24V/48V
-            d=rdd/10
-            if sys_volt==24:d=d*2  
-            if sys_volt==48:d=d*4   
-        d=str(d)
-    if d_type==5:d=chr(rdd)                                     # 文字データ判定　
-    if d_type==6:d=["OFF","ON"][rdd]                            # ON/OFF判定  
-    if d_type==7:                                               # 時刻判定
-        ym=hex(rdd)[4:].zfill(4)
-        d=str(int(ym[0:2],16)).zfill(2)+":"+str(int(ym[2:4],16)).zfill(2)
-    if d_type==8:d=n_data[d_add][rdd+11]                        # 拡張判定 p:ps=7,s:ps=10
-    if d_type==9:print(rdd)
-        
-    return d
+def group_rate(group,addr):                                     # アドレスの読出周期（秒）
+    for start,end,rate_class in group:
+        if start<=addr<=end:return RATE_CLASS[rate_class]
+    return RATE_CLASS["fast"]
+
+def compile_tiers(n_data,group,max_gap=None,**kwargs):          # 周期毎の読出プラン・デコーダー
+    plans=plan_tiered_reads(n_data,lambda row:group_rate(group,row[0]),max_gap=max_gap)
+    return {rate:(plan,compile_decoder(n_data,plan,**kwargs))for rate,plan in plans.items()}
+
+tiers_cache={}                                                  # コンパイル済み読出プラン
+def table_tiers(n_data):                                        # HYP読出プラン取得
+    if id(n_data) not in tiers_cache:                           # HYPは下位ワード先頭
+        tiers_cache[id(n_data)]=compile_tiers(n_data,p_group,type_col=4,
+                                              enum_col=10,word_order="little")
+    return tiers_cache[id(n_data)]
+k_tiers=compile_tiers(k_data,k_group,max_gap=0,                 # KM-N1は上位ワード先頭・連続ブロックのみ
+                      type_col=4,word_order="big")
+
+last_data={}                                                    # 機器毎の最新値（低速グループの前回値保持）
+def fill_forward(key,n_fields,tiers,results,sys_volt=0):       # 読出分を更新し前回値で補完
+    if results is None:                                         # 通信断：全項目を欠測にする
+        last_data.pop(key,None)
+        return [None]*n_fields,[""]*n_fields
+    regs,values=last_data.setdefault(key,([None]*n_fields,[None]*n_fields))
+    for rate,block_regs in results.items():
+        plan,decoder=tiers[rate]
+        for i,r in enumerate(slice_block_results(plan,block_regs,n_fields)):
+            if r is not None:regs[i]=r
+        for i,v in enumerate(decoder.decode(block_regs,sys_volt)):
+            if v is not None:values[i]=v
+    return list(regs),list(values)
 
-def data_read(n_data):                                          # データ処理
-    dt_now=datetime.datetime.now()                              # 日時を取得
+def block_read(port,slave,plan,retries=None):                   # 1バス分のブロック読出
+    return [modbus_pool.read_holding_registers(port,blk[0],blk[1],slave=slave,retries=retries)for blk in plan]
+
+def tier_read(port,slave,tiers,due,volt_addr=None):             # 周期到来グループのみ読出
+    key=(port,slave)
+    if key not in last_data:due=list(tiers)                     # 初回・通信復帰時は全グループ
+    first=tiers[min(tiers)][0][0][0]                            # 確認読出アドレス
+    def read(retries):
+        if volt_addr is not None and not sys_volts.get(key):    # システム電圧未取得（起動時に通信断）
+            sys_volts[key]=modbus_pool.read_holding_registers(port,volt_addr,1,slave=slave,retries=retries)[0]
+        return {rate:block_read(port,slave,tiers[rate][0],retries)for rate in due if rate in tiers}
+    return device_health.read(key,read,
+        lambda retries:modbus_pool.read_holding_registers(port,first,1,slave=slave,retries=retries))
+
+def data_read(n_data,due=None):                                 # データ処理 due:読出する周期（None=全て）
+    o_data=[]
+    n_list,k_list=len(n_data),len(k_data)
+    n_tiers=table_tiers(n_data)                                 # 読出プラン・デコーダー
+    if due is None:due=list(RATE_CLASS.values())
+    dt_now,bus_data=port_poller.poll({                          # 3バス同時読出
+        HYB1_PORT:lambda:tier_read(HYB1_PORT,0,n_tiers,due,VOLT_ADDR),
+        HYB2_PORT:lambda:tier_read(HYB2_PORT,1,n_tiers,due,VOLT_ADDR),
+        KMN1_PORT:lambda:(tier_read(KMN1_PORT,0,k_tiers,due),tier_read(KMN1_PORT,1,k_tiers,due))})
     date_time=dt_now.strftime('%y/%m/%d %H:%M:%S')
-    hiwd1,hiwd2,hird1,hird2,o_data=[],[],[],[],[]
-    kmwd1,kmwd2,kmrd1,kmrd2=[],[],[],[]
-    n_list=len(n_data)
-    for a in range(n_list):
-        byte=n_data[a][1]
-        d_type=n_data[a][4]
-        r_data1,r_data2=[],[]
-        r_data1,r_data2=hybrid_modbus_read(n_data[a][0],byte)
-        if byte==1:                                             # 16bitデータ変換
-            data1=change_type(d_type,r_data1[0],sys_volt1[0],byte,a,n_data)
-            data2=change_type(d_type,r_data2[0],sys_volt1[0],byte,a,n_data)
-        else:                                                   # 32bitデータ変換
-            data1=change_type(d_type,
-                int(str(int(hex(r_data1[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(r_data1[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt1,byte,a,n_data)
-            data2=change_type(d_type,
-                int(str(int(hex(r_data2[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(r_data2[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt1,byte,a,n_data)
-        hiwd1.append(data1)
-        hiwd2.append(data2)
-        hird1.append(r_data1)
-        hird2.append(r_data2)
-    for a in range(len(k_data)):
-        r_data1,r_data2=kmn1_modbus_read(k_data[a][0],2,)
-        data1=change_type(d_type,
-                int(str(int(hex(r_data1[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(r_data1[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt1,byte,a,n_data)
-        data2=change_type(d_type,
-                int(str(int(hex(r_data2[1])[2:].zfill(2)[0:4],16))
-                +str(int(hex(r_data2[0])[2:].zfill(2)[0:4],16)))
-                ,sys_volt1,byte,a,n_data)
-        kmwd1.append(data1)
-        kmwd2.append(data2)
-        kmrd1.append(r_data1)
-        kmrd2.append(r_data2)
+    hird1,hiwd1=fill_forward((HYB1_PORT,0),n_list,n_tiers,bus_data[HYB1_PORT],sys_volts.get((HYB1_PORT,0)) or 0)
+    hird2,hiwd2=fill_forward((HYB2_PORT,1),n_list,n_tiers,bus_data[HYB2_PORT],sys_volts.get((HYB2_PORT,1)) or 0)
+    kmrd1,kmwd1=fill_forward((KMN1_PORT,0),k_list,k_tiers,bus_data[KMN1_PORT][0])
+    kmrd2,kmwd2=fill_forward((KMN1_PORT,1),k_list,k_tiers,bus_data[KMN1_PORT][1])
     csv_data1=[date_time]
     csv_data2=[date_time]
     csv_data1=csv_data1+hiwd1
     csv_data2=csv_data2+hiwd2
     
-    rdd=hird1[14][0]
-    q=change_minus(rdd)
-    rdd=hird2[14][0]
-    r=change_minus(rdd)
-    i_calc=((hird1[0][0]*hird1[1][0])+(hird2[0][0]*hird2[1][0]))/100000 # AC入力合算
-    o_calc=(hird1[8][0]+hird2[8][0])/1000                               # AC出力合算
-    p_calc=(hird1[19][0]+hird2[19][0])/1000                             # PV入力合算
-    b_calc=round(((hird1[13][0]*q+hird2[13][0]*r)/100)/1000,3)          # バッテリー電力合算
-    b_curr=((q+r)/10)                                                   # バッテリー電流合算
-    calc_list=[b_curr,b_calc,p_calc,i_calc,o_calc
-               ,round(b_calc+o_calc-p_calc-i_calc,3),
-               hird1[27][0]+hird2[27][0],hird1[28][0]+hird2[28][0],
-               (hird1[29][0]+hird2[29][0])/10,(hird1[30][0]+hird2[30][0])/10,
-               hird1[31][0]+hird2[31][0],(hird1[32][0]+hird2[32][0])/10]
+    if hird1[0] is None or hird2[0] is None:                    # 通信断時は合算値も欠測
+        calc_list=[""]*len(r_data)
+    else:
+        rdd=hird1[14][0]
+        q=change_minus(rdd)
+        rdd=hird2[14][0]
+        r=change_minus(rdd)
+        i_calc=((hird1[0][0]*hird1[1][0])+(hird2[0][0]*hird2[1][0]))/100000 # AC入力合算
+        o_calc=(hird1[8][0]+hird2[8][0])/1000                               # AC出力合算
+        p_calc=(hird1[19][0]+hird2[19][0])/1000                             # PV入力合算
+        b_calc=round(((hird1[13][0]*q+hird2[13][0]*r)/100)/1000,3)          # バッテリー電力合算
+        b_curr=((q+r)/10)                                                   # バッテリー電流合算
+        calc_list=[b_curr,b_calc,p_calc,i_calc,o_calc
+                   ,round(b_calc+o_calc-p_calc-i_calc,3),
+                   hird1[27][0]+hird2[27][0],hird1[28][0]+hird2[28][0],
+                   (hird1[29][0]+hird2[29][0])/10,(hird1[30][0]+hird2[30][0])/10,
+                   hird1[31][0]+hird2[31][0],(hird1[32][0]+hird2[32][0])/10]
     for s in range(len(r_data)):o_data.append(calc_list[s])
     return date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2
 
+def num(v):                                                     # 欠測は NaN
+    return v if isinstance(v,(int,float)) else np.nan
+
+def chart_values(hiwd1,hiwd2,kmwd1,kmwd2):                      # チャート系列の値（c_data順）
+    c_list=[]
+    for hiwd in (hiwd1,hiwd2):
+        f=lambda addr:num(hiwd[p_index[addr]])
+        c_list+=[f(0x0109),f(0x0101)*f(0x0102),                 # PV入力,蓄電池（電圧x電流）
+                 f(0x0213)*f(0x0214),f(0x021b)]                 # AC入力（電圧x電流）,AC出力
+    c_list+=[num(hiwd1[p_index[0x0100]]),num(hiwd2[p_index[0x0100]])]
+    c_list+=[num(kmwd1[k_index[0x0010]]),num(kmwd2[k_index[0x0010]])]
+    return c_list
+
 # ----------モニター画面
 def create_gui():                                               # GUI作成
     root=tk.Tk()
@@ -406,47 +357,52 @@ def create_gui():                                               # GUI作成
     button1.grid(column=8,row=0)
     button2=tk.Button(frame,text="機器機器設定",command=root.destroy) # ループ終了
     button2.grid(column=6,row=0)
-    button3=tk.Button(frame,text="チャート表示",command=root.destroy) # チャート移動
+    chart=LiveChart(root,"HYP4850U100-H 並列チャート",c_axes,c_data) # 24時間分のリングバッファ
+    button3=tk.Button(frame,text="チャート表示",command=chart.show) # チャート表示
     button3.grid(column=3,row=0)
 
-    thread1=threading.Thread(target=update_data,args=([label0,
-                                    [labels1[x]for x in range(p_list)],
-                                    [labels2[x]for x in range(p_list)],
-                                    [labels3[x]for x in range(r_list)],
-                                    [labels4[x]for x in range(k_list)],
-                                    [labels5[x]for x in range(k_list)],]))
+    bridge=DisplayBridge(root)                                  # 表示は Tk スレッドで差分更新
+    for name,labels in (("time",[label0]),("hyp1",labels1),("hyp2",labels2),
+                        ("calc",labels3),("kmn1",labels4),("kmn2",labels5)):
+        bridge.bind(name,labels)
+    thread1=threading.Thread(target=update_data,args=(bridge,chart))
     
     thread1.daemon=True                                         # スレッド終了
     thread1.start()                                             # スレッド処理開始
     root.mainloop()                                             # メインループ開始
 
 # ----------データ更新処理
-def update_data(label0,labels1,labels2,labels3,labels4,labels5):
+def update_data(bridge,chart):
+        sampler=IntervalScheduler(interval1,log=timing_log)     # 絶対時刻基準の周期タイマー（計測タイミングを記録）
+        tier_timer=TierTimer(RATE_CLASS.values())               # 周期クラス毎の読出判定
         while True:
-            p_list,k_list=len(p_data),len(k_data)
-            date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2=data_read(p_data)
-            writer1.writerow(csv_data1)
-            writer2.writerow(csv_data2)
-            label0.config(text=f"{date_time}")                  # GUIデータ更新
-            [labels1[x].config(text=f"{hiwd1[x]}")for x in range(p_list)]
-            [labels2[x].config(text=f"{hiwd2[x]}")for x in range(p_list)]
-            [labels3[x].config(text=f"{o_data[x]}")for x in range(len(r_data))]
-            [labels4[x].config(text=f"{kmwd1[x]}")for x in range(k_list)]
-            [labels5[x].config(text=f"{kmwd2[x]}")for x in range(k_list)]
-            sleep(interval1)                                    # インターバルタイマー
+            tick=sampler.wait()                                 # 次の計測時刻まで待機
+            if tick.overrun:print("周期超過:",tick.skipped,"回スキップ",tick.date_time)
+            date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2=data_read(
+                p_data,tier_timer.due(tick.deadline))
+            writer1.writerow(csv_data1,tick.deadline)           # 計測時刻の日付のファイルへ
+            writer2.writerow(csv_data2,tick.deadline)
+            for (key,store),wd in zip(stores,(hiwd1,hiwd2,kmwd1,kmwd2)):
+                rd=last_data[key][0] if key in last_data else [None]*len(wd)
+                store.append(tick.deadline,rd,wd)               # バイナリストア追記
+            bridge.push(time=[date_time],hyp1=hiwd1,hyp2=hiwd2, # GUIデータ更新（キューへ登録）
+                        calc=o_data,kmn1=kmwd1,kmn2=kmwd2)
+            chart.push(tick.deadline,chart_values(hiwd1,hiwd2,kmwd1,kmwd2)) # チャートデータ追加
 
 # ----------CSVファイル設定
-sys_volt1,sys_volt2=hybrid_modbus_read(0xe003,1)                # システム電圧読込
-sys_id1,sys_id2=hybrid_modbus_read(0x0035,20)                   # プロダクトID読込
+VOLT_ADDR=0xe003                                                # システム電圧アドレス
+sys_volt1,sys_volt2=hybrid_modbus_read(VOLT_ADDR,1)             # システム電圧読込（通信断は None）
+sys_id1,sys_id2=hybrid_modbus_read(0x0035,20)                   # プロダクトID読込（通信断は None）
+sys_volts={(HYB1_PORT,0):sys_volt1 and sys_volt1[0],           # 機器毎のシステム電圧（None は通信復帰後に読込）
+           (HYB2_PORT,1):sys_volt2 and sys_volt2[0]}
 dt_now = datetime.datetime.now()                                # 日時を取得
 file_time=dt_now.strftime('_20%y_%m_%d_%H%M')
-id_name1,id_name2,id_name3='','','omuron'
-for a in range(20):
-    id_name1=id_name1+chr(sys_id1[a])
-    id_name2=id_name2+chr(sys_id2[a])
+id_name1=''.join(map(chr,sys_id1)) if sys_id1 else 'HYP_'+HYB1_PORT # 起動時に通信断の場合はポート名
+id_name2=''.join(map(chr,sys_id2)) if sys_id2 else 'HYP_'+HYB2_PORT
+id_name3='omuron'
 file_name='today_logfile.csv'
-file_name1=id_name1+file_time+'.csv'                            # ID1ファイル名作成
-file_name2=id_name2+file_time+'.csv'                            # ID2ファイル名作成
+file_name1=id_name1+'_20yy_mm_dd.csv'                           # ID1ファイル名（日毎）
+file_name2=id_name2+'_20yy_mm_dd.csv'                           # ID2ファイル名（日毎）
 file_name3=id_name3+file_time+'.csv'                            # KM-N1ファイル名作成
 print("ID1 ログファイル名:",file_name1)
 print("ID2 ログファイル名:",file_name2)
@@ -462,20 +418,28 @@ for a in range(3):
     if a==1:n_data2,u_data2=n_data,u_data
     if a==2:n_data3,u_data3=n_data,u_data
 
+# ----------バイナリストア設定（機器毎・日毎に追記）
+stores=[((HYB1_PORT,0),BinaryStore("store",id_name1,n_data1[1:],u_data1[1:],[row[1] for row in p_data])),
+        ((HYB2_PORT,1),BinaryStore("store",id_name2,n_data1[1:],u_data1[1:],[row[1] for row in p_data])),
+        ((KMN1_PORT,0),BinaryStore("store",id_name3+"1",n_data3[1:],u_data3[1:],[row[1] for row in k_data])),
+        ((KMN1_PORT,1),BinaryStore("store",id_name3+"2",n_data3[1:],u_data3[1:],[row[1] for row in k_data]))]
+
 # ----------実行
+writer1=DailyCsvWriter(id_name1,[n_data1,u_data1])              # ID1ログ（日毎・ヘッダーは新規ファイルのみ）
+writer2=DailyCsvWriter(id_name2,[n_data1,u_data1])              # ID2ログ
+timing_log=DailyCsvWriter('hyp_kmn1_timing',[TIMING_HEADER])    # 計測タイミングログ（遅れ・スキップ）
 with open(file_name,'w', newline='') as file:                  # CSVファイルオープン
         writer=csv.writer(file)
-        with open(file_name1,'w',newline='')as file1:
-            writer1=csv.writer(file1)
-            [writer1.writerow([n_data1,u_data1][i])for i in range(2)]# ヘッダー書込
-            with open(file_name2,'w',newline='')as file2:
-                writer2=csv.writer(file2)
-                [writer2.writerow([n_data1,u_data1][i])for i in range(2)]
-                date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2=data_read(p_data)
-                writer1.writerow(csv_data1)
-                writer2.writerow(csv_data2)
-                if __name__ == "__main__":
-                    create_gui()
+        date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2=data_read(p_data)
+        writer1.writerow(csv_data1)
+        writer2.writerow(csv_data2)
+        if __name__ == "__main__":
+            create_gui()
+writer1.close()                                                 # 未書込分を書込んで閉じる
+writer2.close()
+timing_log.close()
+for key,store in stores:store.close()                           # バイナリストア書込
+modbus_pool.close()                                             # ポート切断
             
 # 終了
 
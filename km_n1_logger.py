@@ -1,19 +1,22 @@
 # ----------初期設定
-from pymodbus.client import ModbusSerialClient as ModbusClient # Modbusモジュール組込
+from modbus_connection import modbus_pool               # Modbus常時接続マネージャー組込
+from modbus_planner import plan_block_reads             # 一括読出プランナー組込
+from register_decoder import compile_decoder            # レジスターデコーダー組込
 import csv                                              # CSVファイルモジュール組込
 import datetime                                         # 時計モジュール組込
-from time import sleep                                  # タイマー組込
+from sampling_scheduler import IntervalScheduler,TIMING_HEADER # 計測周期スケジューラー組込
 import tkinter as tk                                    # GUIモジュール組込
 import threading                                        # スレッド組込
+from tk_display import DisplayBridge                    # Tk表示ブリッジ組込
+from csv_log_writer import DailyCsvWriter               # 日毎CSVライター組込
 
 machine=2                                               # 計測機器台数　設定
 interval=10                                             # 計測間隔（秒）設定
 # ----------接続設定
-client = ModbusClient(framer="rtu",port="COM5",         # USBポート（Windows）
-    stopbits=2,bytesize=8,parity='N',baudrate=9600,timeout=1)
+KMN1_PORT="COM5"                                        # USBポート（Windows）
+modbus_pool.add_port(KMN1_PORT,stopbits=2,bytesize=8,parity='N',baudrate=9600,timeout=1)
 
 # ----------パラメーターデータ
-pra_type=[]
 ctrl_loop=3
 ctrl_name=[["電圧1","電圧2","電圧3","電流1","電流2","電流3","力率","周波数"
            ,"有効電力","無効電力"]
@@ -29,11 +32,8 @@ ctrl_count=[10,5,5]
 ctrl_add=[0x0000,0x0200,0x0220]
 
 # ----------CSVファイル設定
-file_name='omron'
-dt_now = datetime.datetime.now()                        # 日時を取得
-file_time=dt_now.strftime('_20%y_%m_%d_%H%M')
-file_name=file_name+file_time+'.csv'
-print("ファイル名:",file_name)
+file_name='omron'                                       # ファイル名 omron_20yy_mm_dd.csv（日毎）
+print("ファイル名:",file_name+'_20yy_mm_dd.csv')
 id_data=["","入力側"]
 for i in range(19):id_data.append("")
 id_data.append("出力側")
@@ -48,52 +48,20 @@ for a in range(machine):
             name_data.append(data1[c])
             unit_data.append(data2[c])
 
-# ----------データ変換
-def change_type(data_type,rdd,sys_volt,cnt_count):      # データタイプ変換
-    if data_type<5:
-        if data_type<4:                                 # 1/10,1/100,1/1000判定
-            if cnt_count==1 :                           # 1byte
-                if rdd>32767 :rdd=rdd-65536
-            if cnt_count==2 :                           # 2byte
-                if rdd>2147483647 :rdd=rdd-4294967295
-            data_list=[rdd,rdd/10,rdd/100,rdd/1000]
-            d=data_list[data_type]
-        if data_type==4:                                # 電圧データ判定24V/48V
-            d=rdd/10
-            if sys_volt[0]==24:d=d*2  
-            if sys_volt[0]==48:d=d*4   
-        d=str(d)
-    if data_type==5:d=chr(rdd)                          # 文字データ判定　
-    if data_type==6:                                    # ON/OFF判定
-        data_list=["OFF","ON"]
-        d=data_list[rdd]
-    if data_type==7:                                    # 時刻判定
-        ym=hex(rdd)[2:].zfill(2)
-        d=str(int(ym[0:2], 16)).zfill(2)+":"+str(int(ym[2:4], 16)).zfill(2)
-    if data_type>=8:                                    # 拡張判定
-        d_type=pra_type[data_type-8]
-        d=d_type[rdd]
-    return d
+# ----------データ変換 [0address,1words,2type]
+ctrl_table=[[ctrl_add[b]+c*2,2,ctrl_type[b][c]]for b in range(ctrl_loop)for c in range(ctrl_count[b])]
+ctrl_plan=plan_block_reads(ctrl_table,max_gap=0)        # 読出プラン（ブロック毎に一括）
+ctrl_decoder=compile_decoder(ctrl_table,ctrl_plan,      # KM-N1は上位ワード先頭
+                             type_col=2,word_order="big")
 
 # ----------Modbus読出
 def data_set(date_time):                                # データ読出
     set_data=[]
-    client.connect()                                    # ポート接続開始
     for a in range(machine):
-        for b in range(ctrl_loop):
-            ctrl_data=client.read_holding_registers(    # Modbus ファンクション03H
-                address=ctrl_add[b],count=ctrl_count[b]*2,slave=a+1)  
-            cnt_rdd=ctrl_data.registers
-#            cnt_rdd=test(ctrl_add[b],a)                # 未接続テスト用
-            cnt_type=ctrl_type[b]
-            cnt_data=[]
-            for c in range(ctrl_count[b]):              # 一括データ変換
-                add=c*2
-                cnt_data.append(change_type(
-                    cnt_type[c],int(str(int(hex(cnt_rdd[add])[2:].zfill(2)+
-                        hex(cnt_rdd[add+1])[2:].zfill(2),16)).zfill(2)),0,2))
-            set_data=set_data+cnt_data
-    client.close()    
+        cnt_rdd=[modbus_pool.read_holding_registers(    # Modbus ファンクション03H
+            KMN1_PORT,blk[0],blk[1],slave=a+1)for blk in ctrl_plan]
+#        cnt_rdd=[test(blk[0],a)for blk in ctrl_plan]   # 未接続テスト用
+        set_data=set_data+ctrl_decoder.decode(cnt_rdd)  # 一括データ変換
     write_data=[date_time]+set_data
     #print("Modbus :",write_data)                        # コンソール画面に出力  
     return write_data
@@ -152,30 +120,33 @@ def create_gui():                                       # GUI作成
     button=tk.Button(frame,text="計測終了",command=root.destroy) # ループ終了
     button.grid(column=11,row=0)
     
-    thread=threading.Thread(target=update_data
-                            ,args=([label0,[labels1[x]for x in range(40)],]))
+    bridge=DisplayBridge(root)                          # 表示は Tk スレッドで差分更新
+    bridge.bind("time",[label0])
+    bridge.bind("data",labels1)
+    thread=threading.Thread(target=update_data,args=(bridge,))
     thread.daemon=True                                  # メインウィンドウが閉じたらスレッドも終了
     thread.start()                                      # スレッド処理開始
     root.mainloop()                                     # メインループ開始
 
 # ----------データ更新処理
-def update_data(label0,labels1):
+def update_data(bridge):
+        sampler=IntervalScheduler(interval,log=timing_log) # 絶対時刻基準の周期タイマー（計測タイミングを記録）
         while True:
+            tick=sampler.wait()                         # 次の計測時刻まで待機
+            if tick.overrun:print("周期超過:",tick.skipped,"回スキップ",tick.date_time)
             dt_now=datetime.datetime.now()              # 日時を取得
             date_time=dt_now.strftime('%y/%m/%d %H:%M:%S')
             writer_data=data_set(date_time)             # Modbusデータ読込
-            writer.writerow(writer_data)                # CSVデータ書込
-            label0.config(text=f"{writer_data[0]}")     # GUIデータ更新
-            [labels1[x].config(text=f"{writer_data[x+1]}")for x in range(40)]
-            sleep(interval)                             # インターバルタイマー
+            writer.writerow(writer_data,tick.deadline)  # CSVデータ書込
+            bridge.push(time=writer_data[:1],data=writer_data[1:41]) # GUIデータ更新（キューへ登録）
 
 # ----------スタート
-with open(file_name, 'w', newline='') as file:          # CSVファイルオープン
-        writer = csv.writer(file)
-        w_data=[id_data,name_data,unit_data]
-        [writer.writerow(w_data[i])for i in range(3)]   # ヘッダー書込
-       
-        if __name__ == "__main__":
-            create_gui()
+writer=DailyCsvWriter(file_name,[id_data,name_data,unit_data]) # ヘッダーは新規ファイルのみ
+timing_log=DailyCsvWriter(file_name+'_timing',[TIMING_HEADER]) # 計測タイミングログ（遅れ・スキップ）
+if __name__ == "__main__":
+    create_gui()
+writer.close()                                          # 未書込分を書込んで閉じる
+timing_log.close()
+modbus_pool.close()                                     # ポート切断
             
 # 終了
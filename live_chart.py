@@ -0,0 +1,146 @@
+# ライブチャート
+# ----------概要
+# 計測値を固定長の NumPy リングバッファに保持し、Tk ウインドウに埋め込んだ matplotlib で時系列表示する。
+# 表示区間（10分/1時間/24時間）の点数が表示点数を超える場合は、区間を等分した各ビンの
+# 最小・最大値に間引いてピークを残す。横軸は「現在からの経過時間」で固定し、目盛や縦軸が
+# 変わらない間は線だけを再描画（ブリッティング）する。24時間・1秒周期（86,400点/系列）でも応答を保つ。
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+import tkinter as tk                                            # GUIモジュール組込
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+WINDOWS=[["10分",600,60,"分"],["1時間",3600,60,"分"],["24時間",86400,3600,"時間"]] # [名前,秒,横軸単位(秒),単位名]
+
+class RingBuffer:
+    """ 時刻と複数系列の固定長リングバッファ（2倍長に書込み、最新区間を連続ビューで取り出す） """
+    def __init__(self,capacity,n_series):
+        self.capacity=capacity
+        self.t=np.full(capacity*2,np.nan)                       # 時刻（エポック秒）
+        self.y=np.full((capacity*2,n_series),np.nan,dtype=np.float32)
+        self.pos=0                                              # 次の書込位置
+        self.count=0                                            # 保持点数
+        self.lock=threading.Lock()
+
+    def append(self,t,values):
+        """ 1サンプル追加（計測スレッドから） """
+        with self.lock:
+            i=self.pos
+            self.t[i]=self.t[i+self.capacity]=t
+            self.y[i]=self.y[i+self.capacity]=values
+            self.pos=(i+1)%self.capacity
+            self.count=min(self.count+1,self.capacity)
+
+    def window(self,seconds,max_points):
+        """ 最新時刻から seconds 秒以内の点を max_points 以下に間引いて返す（コピー） """
+        with self.lock:
+            end=self.pos+self.capacity
+            t=self.t[end-self.count:end]
+            y=self.y[end-self.count:end]
+            if not len(t):return t.copy(),y.copy()
+            start=np.searchsorted(t,t[-1]-seconds)              # 時刻は単調増加
+            return minmax_decimate(t[start:],y[start:],max_points//2)
+
+def minmax_decimate(t,y,n_bins):
+    """ 各ビンの最小・最大値の2点に間引く  戻り値: 時刻(2*n_bins), 値(2*n_bins,系列数) """
+    n=len(t)
+    if n<=n_bins*2:return t.copy(),y.copy()
+    k=n//n_bins                                                 # 1ビンの点数
+    m=k*n_bins
+    tb=t[n-m:].reshape(n_bins,k)                                # 古い端数は捨てる
+    yb=y[n-m:].reshape(n_bins,k,-1)
+    tt=np.stack([tb[:,0],tb[:,-1]],axis=1).reshape(-1)
+    yy=np.stack([np.fmin.reduce(yb,axis=1),np.fmax.reduce(yb,axis=1)],axis=1) # 欠測(NaN)は無視
+    return tt,yy.reshape(n_bins*2,-1)
+
+class LiveChart:
+    """ リングバッファと埋込チャートウインドウ """
+    def __init__(self,master,title,axes,series,capacity=86400,max_points=1200,period_ms=1000):
+        self.master=master
+        self.title=title
+        self.axes_names=axes                                    # グラフ毎の縦軸名
+        self.series=series                                      # [[系列名,グラフ番号], ...]
+        self.buffer=RingBuffer(capacity,len(series))
+        self.max_points=max_points                              # 1系列の最大表示点数
+        self.period_ms=period_ms                                # 再描画周期（ミリ秒）
+        self.win=None
+        self.background=None
+
+    def push(self,t,values):
+        """ 計測値を追加する（計測スレッドから、欠測は NaN） """
+        self.buffer.append(t,values)
+
+    def show(self):
+        """ チャートウインドウを開く（開いている場合は前面に表示） """
+        if self.win is not None and self.win.winfo_exists():
+            self.win.lift()
+            return
+        self.win=tk.Toplevel(self.master)
+        self.win.title(self.title)
+        self.win_sel=tk.IntVar(self.win,value=1)
+        bar=tk.Frame(self.win)
+        bar.pack(side=tk.TOP,fill=tk.X)
+        for i,(name,*_) in enumerate(WINDOWS):
+            tk.Radiobutton(bar,text=name,variable=self.win_sel,value=i,
+                           command=self.full_redraw).pack(side=tk.LEFT)
+        self.fig=Figure(figsize=(9,7))
+        n=len(self.axes_names)
+        self.axs=[self.fig.add_subplot(n,1,i+1) for i in range(n)]
+        for ax,name in zip(self.axs,self.axes_names):
+            ax.set_ylabel(name)
+            ax.grid(True)
+        self.lines=[self.axs[no].plot([],[],label=name,animated=True)[0]for name,no in self.series]
+        for ax in self.axs:ax.legend(loc="upper left",fontsize=8)
+        self.canvas=FigureCanvasTkAgg(self.fig,master=self.win)
+        self.canvas.get_tk_widget().pack(side=tk.TOP,fill=tk.BOTH,expand=True)
+        self.canvas.mpl_connect("draw_event",self._on_draw)
+        self.full_redraw()
+        self.win.after(self.period_ms,self._tick)
+
+    def _on_draw(self,event):                                   # 全体描画後に背景を保存
+        self.background=self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines:line.axes.draw_artist(line)
+
+    def _tick(self):                                            # 定期再描画（Tk スレッド）
+        if not self.win.winfo_exists():return
+        self.redraw()
+        self.win.after(self.period_ms,self._tick)
+
+    def _update_lines(self):                                    # 表示データ更新  戻り値: 縦軸の変更要否
+        name,seconds,scale,unit=WINDOWS[self.win_sel.get()]
+        t,y=self.buffer.window(seconds,self.max_points)
+        x=(t-time.time())/scale                                 # 現在からの経過時間
+        for i,line in enumerate(self.lines):line.set_data(x,y[:,i])
+        rescale=False
+        for no,ax in enumerate(self.axs):
+            cols=[i for i,(_,n) in enumerate(self.series) if n==no]
+            v=y[:,cols]
+            if not len(v) or np.isnan(v).all():continue
+            lo,hi=float(np.nanmin(v)),float(np.nanmax(v))
+            pad=max((hi-lo)*0.1,1.0)
+            y0,y1=ax.get_ylim()
+            if lo<y0 or hi>y1 or (hi-lo+pad*2)<(y1-y0)*0.5:     # 範囲外・大きく縮小した時のみ縦軸変更
+                ax.set_ylim(lo-pad,hi+pad)
+                rescale=True
+        return rescale
+
+    def full_redraw(self):
+        """ 軸・目盛を含めて全体を描画する """
+        name,seconds,scale,unit=WINDOWS[self.win_sel.get()]
+        for ax in self.axs:ax.set_xlim(-seconds/scale,0)
+        self.axs[-1].set_xlabel(f"経過時間（{unit}）")
+        self._update_lines()
+        self.canvas.draw()                                      # draw_event で背景を保存
+
+    def redraw(self):
+        """ 線のみ再描画する（縦軸変更時は全体描画） """
+        if self._update_lines() or self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_lines()
+        self.canvas.blit(self.fig.bbox)
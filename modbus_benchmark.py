@@ -0,0 +1,196 @@
+# HYP/KM-N1 ロガー ベンチマーク
+# ----------概要
+# modbus_simulator のバス上で hyp_kmn1_logger の data_read() を繰り返し実行し、
+# サイクル時間（p50/p95/p99）、1サイクルの通信回数・通信バイト数、処理段階毎のCPU時間を計測する。
+# 読出方式（項目毎/一括/周期別一括）とポーリング方式（順次/同時）を組み合わせて比較する。
+# 使い方: python modbus_benchmark.py --cycles 20 --latency 0.02（Linux）
+import argparse                                                 # 起動引数組込
+import csv                                                      # CSVファイルモジュール組込
+import math
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+import types
+from modbus_poller import PortPoller,SequentialPoller           # 同時/順次ポーリング
+from register_decoder import compile_decoder                    # レジスターデコーダー組込
+from sampling_scheduler import TierTimer                        # 周期クラス判定
+
+REPO_DIR=os.path.dirname(os.path.abspath(__file__))
+BUSES=[("hyp","COM7"),("hyp","COM8"),("kmn1","COM9")]          # hyp_kmn1_logger の接続構成
+READ_MODES=["register","block","tiered"]                        # 項目毎 / 一括 / 周期別一括
+POLL_MODES=["sequential","concurrent"]                          # 順次 / 同時
+
+def percentile(values,p):                                       # パーセンタイル（最近順位法）
+    s=sorted(values)
+    return s[max(0,math.ceil(p/100*len(s))-1)]
+
+class StageTimer:
+    """ 処理段階毎の経過時間・CPU時間と通信量をサイクル単位で集計する """
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.cycles=[]
+        self.begin_cycle()
+
+    def begin_cycle(self):
+        self.current={"transactions":0,"bytes":0}
+
+    def end_cycle(self):
+        self.cycles.append(self.current)
+        self.begin_cycle()
+
+    def add(self,key,value):
+        with self.lock:
+            self.current[key]=self.current.get(key,0)+value
+
+    def wrap(self,stage,func):                                  # 関数を計測付きに置換
+        def timed(*args,**kwargs):
+            wall,cpu=time.perf_counter(),time.process_time()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                self.add(stage+"_wall",time.perf_counter()-wall)
+                self.add(stage+"_cpu",time.process_time()-cpu)
+        return timed
+
+    def wrap_read(self,func):                                   # Modbus読出の通信量計測
+        def counted(port,address,count,slave):
+            self.add("transactions",1)
+            self.add("bytes",8+5+count*2)                       # リクエスト8バイト＋レスポンス
+            return func(port,address,count,slave=slave)
+        return counted
+
+    def mean(self,key):
+        return sum(c.get(key,0) for c in self.cycles)/len(self.cycles)
+
+# ----------シミュレーター
+def start_simulator(workdir,args):
+    cmd=[sys.executable,os.path.join(REPO_DIR,"modbus_simulator.py"),
+         "--baud",str(args.baud),"--latency",str(args.latency),
+         "--drop-rate",str(args.drop_rate),"--crc-error-rate",str(args.crc_error_rate)]
+    for device,port in BUSES:cmd+=["--bus",f"{device}:{port}"]
+    proc=subprocess.Popen(cmd,cwd=workdir,stdout=subprocess.PIPE,text=True)
+    deadline=time.monotonic()+10
+    while not all(os.path.islink(os.path.join(workdir,port)) for _,port in BUSES):
+        if time.monotonic()>deadline or proc.poll() is not None:
+            proc.kill()
+            raise RuntimeError("シミュレーターを起動できません")
+        time.sleep(0.05)
+    return proc
+
+def stop_simulator(proc):
+    proc.send_signal(signal.SIGINT)
+    out,_=proc.communicate(timeout=10)
+    return out
+
+# ----------読出方式
+def register_tiers(logger,table,**kwargs):                      # 1項目1回読出（従来方式）
+    plan=[[row[0],row[1],[(i,0,row[1])]] for i,row in enumerate(table)]
+    return {logger.RATE_CLASS["fast"]:(plan,compile_decoder(table,plan,**kwargs))}
+
+def set_read_mode(logger,mode):
+    hyp_kwargs=dict(type_col=4,enum_col=10,word_order="little")
+    kmn1_kwargs=dict(type_col=4,word_order="big")
+    if mode=="register":
+        logger.tiers_cache[id(logger.p_data)]=register_tiers(logger,logger.p_data,**hyp_kwargs)
+        logger.k_tiers=register_tiers(logger,logger.k_data,**kmn1_kwargs)
+    else:
+        logger.tiers_cache[id(logger.p_data)]=logger.compile_tiers(
+            logger.p_data,logger.p_group,**hyp_kwargs)
+        logger.k_tiers=logger.compile_tiers(logger.k_data,logger.k_group,max_gap=0,**kmn1_kwargs)
+    logger.last_data.clear()
+
+# ----------Tk更新（表示可能な環境のみ）
+def create_labels(logger):
+    try:
+        import tkinter as tk
+        root=tk.Tk()
+    except Exception:                                           # 画面なし
+        return None
+    root.withdraw()
+    sizes=[len(logger.p_data),len(logger.p_data),len(logger.r_data),
+           len(logger.k_data),len(logger.k_data)]
+    return root,[[tk.Label(root) for _ in range(n)] for n in sizes]
+
+def update_labels(gui,values):
+    root,groups=gui
+    for labels,data in zip(groups,values):
+        [labels[x].config(text=f"{data[x]}")for x in range(len(labels))]
+    root.update_idletasks()
+
+# ----------計測
+def run_case(logger,timer,read_mode,poll_mode,cycles,writer,gui):
+    set_read_mode(logger,read_mode)
+    poller=PortPoller() if poll_mode=="concurrent" else SequentialPoller()
+    logger.port_poller=types.SimpleNamespace(poll=timer.wrap("bus",poller.poll))
+    tier_timer=TierTimer(logger.RATE_CLASS.values())
+    interval=logger.interval1
+    write_rows=timer.wrap("csv",lambda rows:[writer.writerow(row)for row in rows])
+    update=timer.wrap("tk",update_labels)
+    logger.data_read(logger.p_data)                             # 前回値の初期化（計測対象外）
+    timer.cycles=[]
+    timer.begin_cycle()
+    for n in range(cycles):
+        due=tier_timer.due(n*interval) if read_mode=="tiered" else None
+        wall,cpu=time.perf_counter(),time.process_time()
+        date_time,hiwd1,hiwd2,kmwd1,kmwd2,o_data,csv_data1,csv_data2=logger.data_read(
+            logger.p_data,due)
+        timer.add("cycle_wall",time.perf_counter()-wall)
+        timer.add("data_read_cpu",time.process_time()-cpu)
+        write_rows([csv_data1,csv_data2])
+        if gui:update(gui,[hiwd1,hiwd2,o_data,kmwd1,kmwd2])
+        timer.end_cycle()
+    poller.close()
+
+def report(read_mode,poll_mode,timer):
+    walls=[c["cycle_wall"]*1000 for c in timer.cycles]
+    decode=timer.mean("decode_cpu")
+    calc=timer.mean("data_read_cpu")-timer.mean("bus_cpu")-decode
+    print(f"{read_mode:>8} {poll_mode:>10} "
+          f"{percentile(walls,50):8.1f} {percentile(walls,95):8.1f} {percentile(walls,99):8.1f} "
+          f"{timer.mean('transactions'):6.1f} {timer.mean('bytes'):7.0f} "
+          f"{timer.mean('bus_cpu')*1000:7.2f} {decode*1000:7.2f} {calc*1000:7.2f} "
+          f"{timer.mean('csv_cpu')*1000:7.2f} {timer.mean('tk_cpu')*1000:7.2f}")
+
+def main():
+    parser=argparse.ArgumentParser(description="HYP/KM-N1 ロガー ベンチマーク")
+    parser.add_argument("--cycles",type=int,default=20,help="計測サイクル数")
+    parser.add_argument("--read",choices=READ_MODES,action="append",help="読出方式（省略時は全て）")
+    parser.add_argument("--poll",choices=POLL_MODES,action="append",help="ポーリング方式（省略時は全て）")
+    parser.add_argument("--baud",type=int,default=9600,help="シミュレーターの通信速度")
+    parser.add_argument("--latency",type=float,default=0.02,help="シミュレーターの応答遅延（秒）")
+    parser.add_argument("--drop-rate",type=float,default=0.0)
+    parser.add_argument("--crc-error-rate",type=float,default=0.0)
+    args=parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        proc=start_simulator(workdir,args)
+        os.chdir(workdir)                                       # ポート名リンク・ログファイルの場所
+        try:
+            import hyp_kmn1_logger as logger                    # 起動時読出・CSV作成を実行
+            timer=StageTimer()
+            pool=logger.modbus_pool
+            pool.read_holding_registers=timer.wrap_read(pool.read_holding_registers)
+            logger.fill_forward=timer.wrap("decode",logger.fill_forward)
+            gui=create_labels(logger)
+            print(f"サイクル数:{args.cycles} 応答遅延:{args.latency}s 通信速度:{args.baud}bps"
+                  f"{'' if gui else ' （画面なし: Tk更新は計測しない）'}")
+            print(f"{'読出':>8} {'ポーリング':>10} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+                  f"{'通信回数':>6} {'バイト':>7} {'通信CPU':>7} {'変換CPU':>7} {'演算CPU':>7} "
+                  f"{'CSV CPU':>7} {'Tk CPU':>7}")
+            with open("benchmark.csv","w",newline="") as file:
+                writer=csv.writer(file)
+                for read_mode in args.read or READ_MODES:
+                    for poll_mode in args.poll or POLL_MODES:
+                        run_case(logger,timer,read_mode,poll_mode,args.cycles,writer,gui)
+                        report(read_mode,poll_mode,timer)
+            if gui:gui[0].destroy()
+            logger.modbus_pool.close()
+        finally:
+            os.chdir(REPO_DIR)
+            print(stop_simulator(proc))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,75 @@
+# Modbus シリアル接続マネージャー
+# ----------概要
+# COMポート毎に1つの ModbusSerialClient を保持し、起動中は接続したままにする。
+# 読出エラー時のみ切断・再接続し、同じポートへの同時アクセスはロックで直列化する。
+# 再試行しない最後の読出が無応答（タイムアウト）だけの場合はポートを開いたままにする。
+from pymodbus.client import ModbusSerialClient as ModbusClient  # Modbus組込
+from pymodbus.exceptions import ModbusException,ModbusIOException # Modbus例外
+import threading                                                # スレッド組込
+
+class ModbusReadError(Exception):
+    """ Modbus読出失敗（再接続後も応答なし・例外応答） """
+
+class ModbusConnectionPool:
+    """ COMポート毎の常時接続クライアントを管理する """
+    def __init__(self,retries=1):
+        self.retries=retries                                    # エラー時の再接続回数
+        self.settings={}                                        # ポート毎の通信設定
+        self.clients={}                                         # ポート毎のクライアント
+        self.locks={}                                           # ポート毎の排他ロック
+        self.pool_lock=threading.Lock()
+
+    def add_port(self,port,baudrate=9600,bytesize=8,stopbits=1,parity='N',timeout=1):
+        """ 使用するポートと通信設定を登録する（同じポートの再登録は無視） """
+        with self.pool_lock:
+            if port in self.settings:return
+            self.settings[port]=dict(framer="rtu",port=port,baudrate=baudrate,
+                                     bytesize=bytesize,stopbits=stopbits,
+                                     parity=parity,timeout=timeout,
+                                     retries=0)                 # 再送はプール側（retries）で行う
+            self.locks[port]=threading.Lock()
+
+    def _client(self,port):                                     # 接続済みクライアント取得
+        client=self.clients.get(port)
+        if client is None:
+            client=ModbusClient(**self.settings[port])
+            self.clients[port]=client
+        if not client.connected:
+            client.connect()                                    # ポート接続
+        return client
+
+    def _reset(self,port):                                      # エラー時の切断
+        client=self.clients.pop(port,None)
+        if client is not None:
+            client.close()
+
+    def read_holding_registers(self,port,address,count,slave,retries=None): # ファンクション03h
+        """
+        レジスターを読出してレジスターリストを返す。失敗時は ModbusReadError
+        retries: この読出の再接続回数（None は self.retries）
+        """
+        if retries is None:retries=self.retries
+        with self.locks[port]:
+            error=None
+            for attempt in range(retries+1):
+                try:
+                    read_data=self._client(port).read_holding_registers(
+                        address=address,count=count,slave=slave)
+                except ModbusException as e:
+                    error=e
+                    if attempt<retries or not isinstance(e,ModbusIOException):
+                        self._reset(port)                       # 再接続（無応答のみの最後の失敗は接続を維持）
+                    continue
+                if read_data.isError():                         # 例外応答（接続は維持）
+                    raise ModbusReadError(f"{port} slave={slave} address=0x{address:04x}: {read_data}")
+                return read_data.registers
+            raise ModbusReadError(f"{port} slave={slave} address=0x{address:04x} count={count}: {error}")
+
+    def close(self):
+        """ 全ポートを切断する """
+        with self.pool_lock:
+            for port in list(self.clients):
+                with self.locks[port]:
+                    self._reset(port)
+
+modbus_pool=ModbusConnectionPool()                              # 共有接続マネージャー
@@ -0,0 +1,107 @@
+# Modbus RTU 送受信の対応付けとレジスタースナップショット
+# ----------概要
+# バスを中継・傍受して得たリクエストとレスポンスのフレームを、未応答のリクエスト
+# （スレーブ・ファンクション・アドレス・個数）と照合して1件の取引にまとめる。
+# 読出・書込が成立したレジスターは、機器毎のスナップショットに値と受信時刻を記録する。
+# 他の処理はフレームを解析し直さずに、スナップショットから最新値・更新時刻を参照できる。
+import struct                                                   # バイナリ変換組込
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+from collections import namedtuple
+
+Transaction=namedtuple("Transaction","slave function address count registers exception t_request t_response")
+
+class RegisterSnapshot:
+    """ 機器毎（バス名,スレーブ）のレジスター最新値と更新時刻（複数スレッドから参照可） """
+    def __init__(self):
+        self.devices={}                                         # {機器: {アドレス: (値,時刻)}}
+        self.lock=threading.Lock()
+
+    def update(self,device,address,registers,t):
+        """ 連続するレジスターの値を記録する """
+        with self.lock:
+            regs=self.devices.setdefault(device,{})
+            for i,value in enumerate(registers):regs[address+i]=(value,t)
+
+    def get(self,device,address,count=1,since=None,default=None):
+        """ 連続するレジスターの値のリストを返す（未取得・since より古い値は default） """
+        return self.values(device,range(address,address+count),since,default)
+
+    def values(self,device,addresses,since=None,default=None):
+        """ 任意のアドレス列の値を返す（since より古い値は default） """
+        with self.lock:
+            regs=self.devices.get(device,{})
+            values=[]
+            for addr in addresses:
+                value,t=regs.get(addr,(default,None))
+                values.append(value if t is not None and (since is None or t>=since) else default)
+            return values
+
+    def timestamps(self,device,addresses):
+        """ 更新時刻のリスト（未取得は None） """
+        with self.lock:
+            regs=self.devices.get(device,{})
+            return [regs.get(addr,(None,None))[1] for addr in addresses]
+
+    def copy(self,device):
+        """ 1機器分の {アドレス: (値,時刻)} の写し """
+        with self.lock:
+            return dict(self.devices.get(device,{}))
+
+class TransactionCorrelator:
+    """
+    1本のバスのリクエスト／レスポンスを対応付ける（RTU は1バスに未応答1件）
+    request(frame) / response(frame) に切出済みのフレーム（CRC確認済み）を与える。
+    """
+    def __init__(self,bus,snapshot=None,timeout=1.0):
+        self.bus=bus                                            # スナップショットの機器名に使うバス名
+        self.snapshot=snapshot
+        self.timeout=timeout                                    # 応答待ちの上限（秒）
+        self.pending=None                                       # 未応答のリクエスト
+        self.stats={"transactions":0,"exceptions":0,"unmatched":0,"no_response":0}
+
+    def request(self,frame,t=None):
+        """ リクエストを登録する（応答のないまま次のリクエストが来た場合は無応答として数える） """
+        t=time.time() if t is None else t
+        if self.pending is not None:self.stats["no_response"]+=1
+        slave,function=frame[0],frame[1]
+        address=count=0
+        values=None
+        if function in (0x01,0x02,0x03,0x04,0x0f,0x10) and len(frame)>=8:
+            address,count=struct.unpack('>HH',frame[2:6])
+            if function==0x10 and len(frame)>=9+count*2:
+                values=list(struct.unpack(f'>{count}H',frame[7:7+count*2]))
+        elif function in (0x05,0x06) and len(frame)>=8:
+            address,value=struct.unpack('>HH',frame[2:6])
+            count=1
+            if function==0x06:values=[value]
+        self.pending=(slave,function,address,count,values,t)
+
+    def response(self,frame,t=None):
+        """ レスポンスを未応答のリクエストと照合する  戻り値: Transaction（対応なしは None） """
+        t=time.time() if t is None else t
+        pending=self.pending
+        if pending is not None and t-pending[5]>self.timeout:   # 応答時間切れ
+            self.stats["no_response"]+=1
+            pending=self.pending=None
+        slave,function=frame[0],frame[1]
+        if pending is None or pending[0]!=slave or pending[1]!=function&0x7f:
+            self.stats["unmatched"]+=1
+            return None
+        self.pending=None
+        p_slave,p_function,address,count,values,t_request=pending
+        if function&0x80:                                       # 例外応答
+            self.stats["exceptions"]+=1
+            return Transaction(slave,p_function,address,count,None,frame[2],t_request,t)
+        registers=None
+        if function in (0x03,0x04):
+            if frame[2]!=count*2:                               # 個数が合わない応答
+                self.stats["unmatched"]+=1
+                return None
+            registers=list(struct.unpack(f'>{count}H',frame[3:3+count*2]))
+        elif function in (0x06,0x10):
+            registers=values                                    # 書込成功：リクエストの値
+        self.stats["transactions"]+=1
+        if registers is not None and self.snapshot is not None:
+            self.snapshot.update((self.bus,slave),address,registers,t)
+        return Transaction(slave,p_function,address,count,registers,None,t_request,t)
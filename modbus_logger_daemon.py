@@ -0,0 +1,211 @@
+# Modbus ヘッドレスロガー（HYP4850U100-H / OMRON KM-N1）
+# ----------概要
+# GUI（Tkinter）を使わずに 読出→変換→CSV書込 を常駐実行する。ポート・スレーブ・読出グループ・
+# 周期は設定ファイル（JSON）で指定し、小型Linux機での無人運転を想定する。
+# 最新データは TCP（JSON 1行/サンプル）で配信し、modbus_viewer.py を画面として後から接続できる。
+# 画面の描画は別プロセスになるため、計測周期に影響しない。
+# store_dir を指定すると、CSVと並行してバイナリログストア（binary_store）にも記録する。
+# CSVは機器毎・日毎（csv_log_writer）で、書込・fsync の間隔は設定ファイルの "csv" で指定する。
+# 使い方: python modbus_logger_daemon.py modbus_daemon.json
+import datetime                                                 # 時計モジュール組込
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading                                                # スレッド組込
+from binary_store import BinaryStore                            # バイナリログストア組込
+from csv_log_writer import DailyCsvWriter                       # 日毎CSVライター組込
+from device_health import device_health                        # 機器通信状態管理組込
+from modbus_connection import modbus_pool                       # Modbus常時接続マネージャー組込
+from modbus_planner import plan_tiered_reads,slice_block_results # 一括読出プランナー組込
+from modbus_poller import port_poller                           # 複数バス同時読出組込
+from register_decoder import compile_decoder                    # レジスターデコーダー組込
+from register_tables import RATE_CLASS,p_data,k_data,p_group,k_group # レジスターテーブル組込
+from sampling_scheduler import IntervalScheduler,TierTimer,TIMING_HEADER # 計測周期スケジューラー組込
+
+# ----------機器プロファイル
+PROFILES={
+    "hyp":dict(table=p_data,group=p_group,type_col=4,enum_col=10,  # HYP4850U100-H
+               word_order="little",max_gap=None,volt_addr=0xe003),
+    "kmn1":dict(table=k_data,group=k_group,type_col=4,enum_col=None, # KM-N1
+                word_order="big",max_gap=0,volt_addr=None)}
+
+def parse_group(group):                                         # 設定ファイルのグループ（"0x0100"表記可）
+    return [[int(start,0) if isinstance(start,str) else start,
+             int(end,0) if isinstance(end,str) else end,rate_class]for start,end,rate_class in group]
+
+class LoggerDevice:
+    """ 1台分の読出プラン・デコーダー・最新値 """
+    def __init__(self,name,port,slave,profile,rates,group=None):
+        prof=PROFILES[profile]
+        self.name=name
+        self.port=port
+        self.slave=slave
+        self.table=prof["table"]
+        self.volt_addr=prof["volt_addr"]
+        self.sys_volt=0                                         # システム電圧（HYPのみ）
+        group=group or prof["group"]
+        def rate_of(row):
+            for start,end,rate_class in group:
+                if start<=row[0]<=end:return rates[rate_class]
+            return min(rates.values())
+        plans=plan_tiered_reads(self.table,rate_of,max_gap=prof["max_gap"])
+        self.tiers={rate:(plan,compile_decoder(self.table,plan,type_col=prof["type_col"],
+                                               enum_col=prof["enum_col"],word_order=prof["word_order"]))
+                    for rate,plan in plans.items()}
+        self.values=None                                        # 最新値（None=未取得・通信断）
+        self.regs=None                                          # 最新の項目毎レジスター
+
+    @property
+    def key(self):
+        return (self.port,self.slave)
+
+    def _read(self,due,retries=None):
+        if self.volt_addr is not None and not self.sys_volt:   # システム電圧は初回のみ
+            self.sys_volt=modbus_pool.read_holding_registers(self.port,self.volt_addr,1,slave=self.slave,
+                                                             retries=retries)[0]
+        if self.values is None:due=list(self.tiers)             # 初回・通信復帰時は全グループ
+        return {rate:[modbus_pool.read_holding_registers(self.port,blk[0],blk[1],slave=self.slave,retries=retries)
+                      for blk in self.tiers[rate][0]]for rate in due if rate in self.tiers}
+
+    def read(self,due):
+        """ 周期到来グループを読出す（通信断時は None） """
+        first=self.tiers[min(self.tiers)][0][0][0]
+        return device_health.read(self.key,lambda retries:self._read(due,retries),
+            lambda retries:modbus_pool.read_holding_registers(self.port,first,1,slave=self.slave,retries=retries))
+
+    def update(self,results):
+        """ 読出結果で最新値を更新し、CSV用の値リストを返す """
+        n=len(self.table)
+        if results is None:                                     # 通信断：全項目を欠測にする
+            self.values=self.regs=None
+            return [""]*n
+        if self.values is None:self.values,self.regs=[None]*n,[None]*n
+        for rate,block_regs in results.items():
+            plan,decoder=self.tiers[rate]
+            for i,r in enumerate(slice_block_results(plan,block_regs,n)):
+                if r is not None:self.regs[i]=r
+            for i,v in enumerate(decoder.decode(block_regs,self.sys_volt)):
+                if v is not None:self.values[i]=v
+        return list(self.values)
+
+# ----------画面配信
+class ViewerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server=self.server
+        seq=-1
+        try:
+            self.wfile.write((json.dumps(server.meta,ensure_ascii=False)+"\n").encode())
+            while server.running:
+                with server.cond:                               # 新しいサンプルまで待機
+                    server.cond.wait_for(lambda:server.seq!=seq or not server.running,timeout=5)
+                    if server.seq==seq:continue
+                    seq,line=server.seq,server.line             # 遅い画面は最新のみ送信
+                self.wfile.write(line)
+        except OSError:                                         # 画面側の切断
+            pass
+
+class ViewerServer(socketserver.ThreadingTCPServer):
+    """ 最新サンプルを接続中の画面へ配信する """
+    daemon_threads=True
+    allow_reuse_address=True
+    def __init__(self,address,meta):
+        super().__init__(address,ViewerHandler)
+        self.meta=meta                                          # 機器・項目名・単位
+        self.cond=threading.Condition()
+        self.seq=0
+        self.line=None
+        self.running=True
+
+    def publish(self,sample):
+        line=(json.dumps(sample,ensure_ascii=False)+"\n").encode()
+        with self.cond:
+            self.seq+=1
+            self.line=line
+            self.cond.notify_all()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever,daemon=True).start()
+
+    def stop(self):
+        with self.cond:
+            self.running=False
+            self.cond.notify_all()
+        self.shutdown()
+        self.server_close()
+
+# ----------設定ファイル
+def load_config(file_name):
+    with open(file_name,encoding="utf-8") as file:
+        config=json.load(file)
+    rates=dict(RATE_CLASS,**config.get("rates",{}))
+    groups={profile:parse_group(group)for profile,group in config.get("groups",{}).items()}
+    buses=[]
+    for bus in config["buses"]:
+        modbus_pool.add_port(bus["port"],baudrate=bus.get("baudrate",9600),bytesize=bus.get("bytesize",8),
+                             stopbits=bus.get("stopbits",1),parity=bus.get("parity","N"),
+                             timeout=bus.get("timeout",0.5))
+        buses.append((bus["port"],[LoggerDevice(dev["name"],bus["port"],dev["slave"],dev["profile"],
+                                                rates,groups.get(dev["profile"]))
+                                   for dev in bus["devices"]]))
+    return config,rates,buses
+
+# ----------実行
+def run(config_file):
+    config,rates,buses=load_config(config_file)
+    interval=config.get("interval",min(rates.values()))         # 計測周期（秒）
+    log_dir=config.get("log_dir",".")
+    os.makedirs(log_dir,exist_ok=True)
+    devices=[dev for _,bus_devices in buses for dev in bus_devices]
+    file_time=datetime.datetime.now().strftime('_20%y_%m_%d_%H%M')
+    csv_config=config.get("csv",{})                             # flush_rows,flush_seconds,fsync_seconds
+    writers={dev.name:DailyCsvWriter(dev.name,[[file_time]+[row[5] for row in dev.table],
+                                               ["日付"]+[row[6] for row in dev.table]],
+                                     directory=log_dir,**csv_config)
+             for dev in devices}                                # 機器毎・日毎のCSVファイル
+    timing_log=DailyCsvWriter("timing",[TIMING_HEADER],directory=log_dir,**csv_config) # 計測タイミングログ（遅れ・スキップ）
+    stores={}
+    if config.get("store_dir"):                                 # バイナリストア（機器毎・日毎）
+        stores={dev.name:BinaryStore(config["store_dir"],dev.name,[row[5] for row in dev.table],
+                                     [row[6] for row in dev.table],[row[1] for row in dev.table])
+                for dev in devices}
+    viewer=None
+    if config.get("viewer"):
+        meta={"devices":[{"name":dev.name,"fields":[row[5] for row in dev.table],
+                          "units":[row[6] for row in dev.table]}for dev in devices],"interval":interval}
+        viewer=ViewerServer((config["viewer"].get("host","127.0.0.1"),config["viewer"]["port"]),meta)
+        viewer.start()
+    signal.signal(signal.SIGTERM,lambda signum,frame:sys.exit(0)) # サービス停止
+    sampler=IntervalScheduler(interval,log=timing_log)          # 絶対時刻基準の周期タイマー（計測タイミングを記録）
+    tier_timer=TierTimer(rates.values())                        # 周期クラス毎の読出判定
+    print("ロガー開始:",[dev.name for dev in devices],"周期",interval,"秒")
+    try:
+        while True:
+            tick=sampler.wait()                                 # 次の計測時刻まで待機
+            if tick.overrun:print("周期超過:",tick.skipped,"回スキップ",tick.date_time)
+            due=tier_timer.due(tick.deadline)
+            dt_now,bus_data=port_poller.poll({port:lambda bus_devices=bus_devices:
+                                              [dev.read(due)for dev in bus_devices]
+                                              for port,bus_devices in buses})
+            date_time=dt_now.strftime('%y/%m/%d %H:%M:%S')
+            sample={"time":date_time,"devices":{}}
+            for port,bus_devices in buses:
+                for dev,results in zip(bus_devices,bus_data[port]):
+                    values=dev.update(results)
+                    writers[dev.name].writerow([date_time]+values,tick.deadline)
+                    if stores:stores[dev.name].append(tick.deadline,dev.regs or [None]*len(values),values)
+                    sample["devices"][dev.name]=values
+            if viewer:viewer.publish(sample)
+    except KeyboardInterrupt:
+        print("ロガーを終了します。")
+    finally:
+        if viewer:viewer.stop()
+        for writer in writers.values():writer.close()
+        timing_log.close()
+        for store in stores.values():store.close()
+        port_poller.close()
+        modbus_pool.close()                                     # ポート切断
+
+if __name__=="__main__":
+    run(sys.argv[1] if len(sys.argv)>1 else "modbus_daemon.json")
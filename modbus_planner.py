@@ -0,0 +1,53 @@
+# Modbus レジスター一括読出プランナー
+# ----------概要
+# レジスターテーブル（p_data,k_data,para_data 等）から連続するアドレスをまとめ、
+# Modbus 1回の読出上限（125レジスター）以内で最小回数のブロック読出に変換する。
+# 読出結果はブロックから各項目のレジスターリストへ切り出して元のテーブル順で返す。
+
+MAX_READ_COUNT=125                                              # ファンクション03h 最大読出数
+
+def plan_block_reads(table,addr_col=0,words_col=1,max_count=MAX_READ_COUNT,max_gap=None):
+    """
+    レジスターテーブルからブロック読出プランを作成する。
+    戻り値: [[0address,1count,2fields], ...]  fields=[(テーブル番号,ブロック内オフセット,ワード数), ...]
+    max_gap: ブロック内で許容する未使用アドレス数（None=制限なし、0=完全連続のみ）
+    """
+    items=sorted((row[addr_col],row[words_col],i) for i,row in enumerate(table))
+    blocks=[]
+    for addr,words,i in items:
+        if blocks:
+            start,count,fields=blocks[-1]
+            end=start+count                                     # 現ブロックの次アドレス
+            gap=addr-end
+            if (addr+words-start<=max_count
+                    and (max_gap is None or gap<=max_gap)):
+                fields.append((i,addr-start,words))
+                blocks[-1][1]=max(count,addr+words-start)
+                continue
+        blocks.append([addr,words,[(i,0,words)]])
+    return blocks
+
+def slice_block_results(blocks,block_regs,n_fields):
+    """ ブロック読出結果（ブロック毎のレジスターリスト）を項目毎のレジスターリストに戻す """
+    field_regs=[None]*n_fields
+    for (start,count,fields),regs in zip(blocks,block_regs):
+        for i,offset,words in fields:
+            field_regs[i]=regs[offset:offset+words]
+    return field_regs
+
+def plan_tiered_reads(table,rate_of,**kwargs):
+    """
+    周期クラス毎にブロック読出プランを作成する。
+    rate_of: テーブル行から読出周期（秒）を返す関数
+    戻り値: {周期: プラン}  プランの項目番号は元のテーブル番号のまま
+    """
+    tiers={}
+    for i,row in enumerate(table):
+        tiers.setdefault(rate_of(row),[]).append(i)
+    plans={}
+    for rate,index in sorted(tiers.items()):
+        plan=plan_block_reads([table[i] for i in index],**kwargs)
+        for blk in plan:                                        # テーブル番号に戻す
+            blk[2]=[(index[i],offset,words) for i,offset,words in blk[2]]
+        plans[rate]=plan
+    return plans
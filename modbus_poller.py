@@ -0,0 +1,35 @@
+# Modbus 複数ポート同時読出エンジン
+# ----------概要
+# COMポート（物理バス）毎の読出処理をスレッドで同時に実行し、結果をまとめて返す。
+# 1サイクルの所要時間は全バスの合計ではなく、最も遅いバスの時間になる。
+from concurrent.futures import ThreadPoolExecutor               # スレッドプール組込
+import datetime                                                 # 時計モジュール組込
+
+class PortPoller:
+    """ ポート毎の読出関数を同時に実行する """
+    def __init__(self,max_workers=8):
+        self.executor=ThreadPoolExecutor(max_workers=max_workers,
+                                         thread_name_prefix="modbus_poll")
+
+    def poll(self,tasks):
+        """
+        tasks: {ポート名: 読出関数}  戻り値: (日時, {ポート名: 読出結果})
+        読出関数の例外はそのまま呼出し元に送出する。
+        """
+        dt_now=datetime.datetime.now()                          # サイクル開始日時
+        futures={port:self.executor.submit(read) for port,read in tasks.items()}
+        return dt_now,{port:future.result() for port,future in futures.items()}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+class SequentialPoller:
+    """ ポート毎の読出関数を順番に実行する（比較計測・デバッグ用） """
+    def poll(self,tasks):
+        dt_now=datetime.datetime.now()
+        return dt_now,{port:read() for port,read in tasks.items()}
+
+    def close(self):
+        pass
+
+port_poller=PortPoller()                                        # 共有ポーリングエンジン
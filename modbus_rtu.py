@@ -0,0 +1,140 @@
+# Modbus RTU フレーム共通処理
+# ----------概要
+# CRC16（テーブル方式）とフレーム組立の共通関数、受信バイト列のフレーム切出（FrameParser）。
+import struct                                                   # バイナリ変換組込
+import time                                                     # タイマー組込
+
+def _crc_table():                                               # CRC16テーブル作成（多項式0xA001）
+    table=[]
+    for byte in range(256):
+        crc=byte
+        for _ in range(8):
+            crc=(crc>>1)^0xA001 if crc&1 else crc>>1
+        table.append(crc)
+    return tuple(table)
+
+CRC_TABLE=_crc_table()
+
+def crc16(data):
+    """ Modbus RTU用CRC16計算（テーブル方式） """
+    crc=0xFFFF
+    table=CRC_TABLE
+    for byte in data:
+        crc=(crc>>8)^table[(crc^byte)&0xFF]
+    return crc
+
+def append_crc(frame):
+    """ フレームにCRC（リトルエンディアン）を付加する """
+    return bytes(frame)+struct.pack('<H',crc16(frame))
+
+def check_crc(frame):
+    """ CRCを含むフレームのCRC判定 """
+    return len(frame)>=4 and crc16(frame[:-2])==struct.unpack('<H',frame[-2:])[0]
+
+def read_request(slave,address,count,function=0x03):
+    """ ファンクション03h/04h 読出リクエスト作成 """
+    return append_crc(struct.pack('>BBHH',slave,function,address,count))
+
+def read_response(slave,registers,function=0x03):
+    """ ファンクション03h/04h 読出レスポンス作成 """
+    return append_crc(struct.pack(f'>BBB{len(registers)}H',slave,function,
+                                  len(registers)*2,*registers))
+
+def exception_response(slave,function,code):
+    """ 例外レスポンス作成（01:不正ファンクション 02:不正アドレス 03:不正データ 04:機器異常） """
+    return append_crc(bytes([slave,function|0x80,code]))
+
+# ----------フレーム切出
+MIN_GAP=0.02                                                    # USB変換器の受信遅延を見込んだ最小区切り（秒）
+
+def frame_gap(baudrate,bytesize=8,parity="N",stopbits=1):
+    """ 3.5文字分の無通信時間（秒、19200bps超は1.75ms固定）  MIN_GAP 未満にはしない """
+    bits=1+bytesize+(parity!="N")+stopbits
+    t35=3.5*bits/baudrate if baudrate<=19200 else 0.00175
+    return max(t35,MIN_GAP)
+
+def frame_length(buf,response):
+    """
+    フレーム先頭からの全長（CRC含む）を返す
+    None=判定にあと数バイト必要  0=長さ不明のファンクション（無通信時間で区切る）
+    """
+    if len(buf)<2:return None
+    function=buf[1]
+    if response:
+        if function&0x80:return 5                               # 例外レスポンス
+        if function in (0x01,0x02,0x03,0x04):
+            return 5+buf[2] if len(buf)>=3 else None            # アドレス・FC・バイト数・データ・CRC
+        if function in (0x05,0x06,0x0f,0x10):return 8
+    else:
+        if function in (0x01,0x02,0x03,0x04,0x05,0x06):return 8
+        if function in (0x0f,0x10):
+            return 9+buf[6] if len(buf)>=7 else None
+    return 0
+
+class FrameParser:
+    """
+    受信したバイト列を順次与え、完成したフレームを直ちに返す（片方向1本につき1個）
+    長さはファンクションコード・バイト数から決め、CRC異常の時は1バイトずつずらして同期を取り直す。
+    前回の受信から gap 秒以上空いた時は、途中のフレームを捨てて新しいフレームの先頭とする。
+    """
+    def __init__(self,response,gap=MIN_GAP):
+        self.response=response                                  # True=レスポンス側 False=リクエスト側
+        self.gap=gap
+        self.buf=bytearray()
+        self.last=0.0                                           # 最後に受信した時刻
+        self.hunting=False                                      # CRC異常後の再同期中
+        self.stats={"frames":0,"crc_errors":0,"discarded":0}
+
+    def feed(self,data,now=None):
+        """ 受信データを追加する  戻り値: 完成したフレームのリスト """
+        now=time.monotonic() if now is None else now
+        if now-self.last>=self.gap:                             # 無通信で区切り
+            if self.buf:self._discard(len(self.buf))
+            self.hunting=False
+        self.last=now
+        self.buf+=data
+        frames=[]
+        while self.buf:
+            length=frame_length(self.buf,self.response)
+            if length==0 and self.hunting:                      # 再同期中は長さ不明の先頭を読み飛ばす
+                self._discard(1)
+                continue
+            if not length or len(self.buf)<length:              # 続きを待つ・長さ不明は無通信時間まで待つ
+                if not self._resync(1):break                    # 先頭が誤りで後ろに完全なフレームがあれば進む
+                continue
+            if check_crc(self.buf[:length]):
+                frames.append(bytes(self.buf[:length]))
+                del self.buf[:length]
+                self.stats["frames"]+=1
+                self.hunting=False
+                continue
+            if not self.hunting:self.stats["crc_errors"]+=1
+            if not self._resync(1):                             # 1バイトずつずらして再同期
+                self._discard(1)
+                self.hunting=True
+        return frames
+
+    def _resync(self,start):                                    # CRCの合う次のフレーム先頭まで捨てる  戻り値: 発見有無
+        for i in range(start,len(self.buf)-3):
+            length=frame_length(self.buf[i:],self.response)
+            if length and i+length<=len(self.buf) and check_crc(self.buf[i:i+length]):
+                self._discard(i)
+                self.hunting=False
+                return True
+        return False
+
+    def expire(self,now=None):
+        """ 無通信時間の経過を確認する  長さ不明でCRCが正しいバッファはフレームとして返す """
+        now=time.monotonic() if now is None else now
+        if not self.buf or now-self.last<self.gap:return []
+        frame=bytes(self.buf)
+        if frame_length(frame,self.response)==0 and check_crc(frame):
+            self.buf.clear()
+            self.stats["frames"]+=1
+            return [frame]
+        self._discard(len(self.buf))
+        return []
+
+    def _discard(self,n):
+        del self.buf[:n]
+        self.stats["discarded"]+=n
@@ -0,0 +1,287 @@
+# Modbus RTU スレーブシミュレーター（HYP4850U100-H / OMRON KM-N1）
+# ----------概要
+# 疑似端末（pty）上に Modbus RTU スレーブを作成し、実機なしでロガーを動作・計測する（Linux用）。
+# ・ボーレートに応じた送受信時間、応答遅延、エラー注入（無応答・CRC異常・例外応答）
+# ・時刻に応じて変化する計測値（PV発電は日射カーブ、積算値は時間積分）
+# 使い方: python modbus_simulator.py --bus hyp:COM7 --bus hyp:COM8 --bus kmn1:COM9
+#   カレントフォルダーに COM7 等のシンボリックリンクを作成するので、
+#   同じフォルダーで起動したロガーは "COM7" を開くとシミュレーターに接続される。
+import argparse                                                 # 起動引数組込
+import math
+import os
+import random
+import select
+import struct                                                   # バイナリ変換組込
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+import tty
+from modbus_rtu import check_crc,read_response,exception_response,append_crc
+
+# ----------HYP4850U100-H モデル
+class HypModel:
+    """ HYP4850U100-H の計測値モデル（16bit、32bitは下位ワード先頭） """
+    valid_ranges=[(0x000a,0x0049),(0x0100,0x0111),(0x0200,0x0240),(0xdf00,0xdf20),
+                  (0xe000,0xe040),(0xe100,0xe130),(0xe200,0xe220),(0xf000,0xf050)]
+
+    def __init__(self,serial_no=1):
+        self.regs={}
+        self.serial_no=serial_no
+        self.last=time.time()
+        self.soc=60.0
+        self.energy={"chg_ah":0.0,"dis_ah":0.0,"pv_kwh":0.0,"load_kwh":0.0,
+                     "grid_ah":0.0,"grid_kwh":0.0}
+        self.total={"chg_ah":4079.0,"dis_ah":2488.0,"pv_kwh":3061.0,"load_kwh":2022.0,
+                    "grid_ah":991.0,"grid_kwh":825.0}
+        self.day=time.localtime().tm_mday
+        for i,c in enumerate(f"HYP4850SIM{serial_no:010d}"):    # プロダクトID（1文字1レジスター）
+            self.regs[0x0035+i]=ord(c)
+        self.regs.update({0x000b:3,0xe003:48,0xe004:6,0xe116:34,0xe20f:2,0xe204:0})
+
+    def update(self,now):
+        dt=max(0.0,now-self.last)
+        self.last=now
+        lt=time.localtime(now)
+        if lt.tm_mday!=self.day:                                # 日替りで当日積算値をリセット
+            self.day=lt.tm_mday
+            for k in self.energy:self.energy[k]=0.0
+        hour=lt.tm_hour+lt.tm_min/60+lt.tm_sec/3600
+        sun=max(0.0,math.sin(math.pi*(hour-6)/12))              # 6時～18時の日射カーブ
+        pv_w=3000*sun*(0.9+0.1*random.random())
+        load_w=450+250*math.sin(now/300)+random.uniform(-30,30)
+        batt_v=48.0+0.08*self.soc+random.uniform(-0.1,0.1)
+        batt_w=pv_w-load_w                                      # 正:充電 負:放電
+        if self.soc<=20 and batt_w<0:batt_w=0.0
+        grid_w=load_w-pv_w if self.soc<=20 and pv_w<load_w else 0.0
+        batt_a=batt_w/batt_v
+        self.soc=min(100.0,max(0.0,self.soc+batt_a*dt/3600/2)) # 200Ah相当
+        ah=abs(batt_a)*dt/3600
+        for store in (self.energy,self.total):
+            store["chg_ah" if batt_a>=0 else "dis_ah"]+=ah
+            store["pv_kwh"]+=pv_w*dt/3.6e6
+            store["load_kwh"]+=load_w*dt/3.6e6
+            store["grid_kwh"]+=grid_w*dt/3.6e6
+            store["grid_ah"]+=grid_w/batt_v*dt/3600
+        pv_v=120.0+30*sun if sun>0 else 0.0
+        r=self.regs
+        r[0x0100]=int(self.soc)
+        r[0x0101]=int(batt_v*10)
+        r[0x0102]=int(batt_a*10)&0xFFFF
+        r[0x0107]=int(pv_v*10)
+        r[0x0108]=int(pv_w/pv_v*10) if pv_v else 0
+        r[0x0109]=int(pv_w)
+        r[0x010b]=2 if batt_w>0 else 0
+        r[0x010e]=int(max(batt_w,0))
+        r[0x0210]=6 if grid_w>0 else 5
+        r[0x0212]=int(3930+random.uniform(-20,20))
+        r[0x0213]=int(1005+random.uniform(-10,10)) if grid_w>0 else 0
+        r[0x0214]=int(grid_w/100.5*10)
+        r[0x0215]=6000 if grid_w>0 else 0
+        r[0x0216]=int(1000+random.uniform(-5,5))
+        r[0x0217]=int(load_w/batt_v*10)
+        r[0x0218]=6000
+        r[0x0219]=int(load_w/100*10)
+        r[0x021b]=int(load_w)
+        r[0x021c]=int(load_w*1.03)
+        r[0x021e]=int(grid_w/100.5*10) if grid_w>0 else 0
+        r[0x021f]=int(load_w/4800*100)
+        for i,base in enumerate((410,404,537,349)):             # 温度
+            r[0x0220+i]=int(base+40*sun+random.uniform(-3,3))
+        r[0x0224]=int(pv_w/batt_v*10)
+        r[0x0225]=int(pv_w/400*10)
+        e,t=self.energy,self.total
+        r[0xf02d]=int(e["chg_ah"])
+        r[0xf02e]=int(e["dis_ah"])
+        r[0xf02f]=int(e["pv_kwh"]*10)
+        r[0xf030]=int(e["load_kwh"]*10)
+        r[0xf03c]=int(e["grid_ah"])
+        r[0xf03d]=int(e["grid_kwh"]*10)
+        r[0xf03e]=lt.tm_hour
+        r[0xf03f]=0
+        for addr,key in ((0xf034,"chg_ah"),(0xf036,"dis_ah"),(0xf038,"pv_kwh"),
+                         (0xf03a,"load_kwh"),(0xf046,"grid_ah"),(0xf048,"grid_kwh")):
+            v=int(t[key])
+            r[addr],r[addr+1]=v&0xFFFF,v>>16                    # 下位ワード先頭
+        r[0xf04a]=752+int(now//3600)%1000
+        r[0xf04b]=83
+
+# ----------OMRON KM-N1 モデル
+class Kmn1Model:
+    """ KM-N1 の計測値モデル（32bit、上位ワード先頭） """
+    valid_ranges=[(0x0000,0x0014),(0x0200,0x020a),(0x0220,0x022a),
+                  (0x2000,0x2014),(0x2200,0x221a)]
+
+    def __init__(self,serial_no=1):
+        self.regs={}
+        self.last=time.time()
+        self.wh=0.0
+        self.set32(0x2000,1)                                    # 相線式 1P3W
+        self.set32(0x2002,serial_no)                            # ID
+        self.set32(0x2200,1)                                    # プロトコル Modbus
+        self.set32(0x2202,3)                                    # 9.6kbps
+
+    def set32(self,addr,v):
+        v&=0xFFFFFFFF
+        self.regs[addr],self.regs[addr+1]=v>>16,v&0xFFFF        # 上位ワード先頭
+
+    def update(self,now):
+        dt=max(0.0,now-self.last)
+        self.last=now
+        p=800+400*math.sin(now/600)+random.uniform(-20,20)
+        v1,v2=101.0+random.uniform(-0.5,0.5),100.8+random.uniform(-0.5,0.5)
+        pf=0.95+random.uniform(-0.02,0.02)
+        i1,i2=p/2/v1/pf,p/2/v2/pf
+        self.wh+=p*dt/3600
+        for addr,v in ((0x0000,v1*10),(0x0002,v2*10),(0x0004,(v1+v2)*10),
+                       (0x0006,i1*1000),(0x0008,(i1-i2)*1000),(0x000a,i2*1000),
+                       (0x000c,pf*100),(0x000e,600),(0x0010,p*10),
+                       (0x0012,p*math.tan(math.acos(pf))*10),
+                       (0x0200,self.wh),(0x0202,0),(0x0204,0),(0x0206,self.wh*0.3),(0x0208,self.wh*0.3),
+                       (0x0220,self.wh/1000),(0x0222,0),(0x0224,0),(0x0226,self.wh*0.3/1000),
+                       (0x0228,self.wh*0.3/1000)):
+            self.set32(addr,int(v))
+
+DEVICE_MODELS={"hyp":HypModel,"kmn1":Kmn1Model}
+
+# ----------バス（疑似端末）
+class SimulatedBus:
+    """ 1本の RS485 バス（pty）上のスレーブ群 """
+    def __init__(self,device,link=None,slaves=None,baudrate=9600,stopbits=1,
+                 latency=0.02,drop_rate=0.0,crc_error_rate=0.0,exception_rate=0.0):
+        self.device=device
+        self.slaves=slaves                                      # 応答するスレーブID（None=全て）
+        self.models={}
+        self.char_time=(1+8+stopbits)/baudrate                  # 1文字の送信時間（秒）
+        self.latency=latency                                    # 応答遅延（秒）
+        self.drop_rate=drop_rate                                # 無応答の確率
+        self.crc_error_rate=crc_error_rate                      # CRC異常の確率
+        self.exception_rate=exception_rate                      # 例外応答（機器異常）の確率
+        self.master_fd,self.slave_fd=os.openpty()
+        tty.setraw(self.slave_fd)
+        self.port=os.ttyname(self.slave_fd)
+        self.link=link
+        if link:                                                # ロガーから開くポート名
+            if os.path.islink(link):os.remove(link)
+            os.symlink(self.port,link)
+        self.stats={"requests":0,"responses":0,"dropped":0,"crc_errors":0,"exceptions":0}
+        self.running=False
+        self.thread=None                                        # 応答スレッド
+
+    def model(self,slave):
+        if slave not in self.models:
+            self.models[slave]=DEVICE_MODELS[self.device](serial_no=slave+1)
+        return self.models[slave]
+
+    def split_request(self,buf):                                # リクエスト1フレーム切出
+        if len(buf)<8:return None,buf
+        function=buf[1]
+        if function in (0x03,0x04,0x06):length=8
+        elif function==0x10:
+            if len(buf)<7:return None,buf
+            length=9+buf[6]
+        else:return None,b''                                    # 不明なフレームは破棄
+        if len(buf)<length:return None,buf
+        return buf[:length],buf[length:]
+
+    def valid(self,model,address,count):
+        return any(start<=address and address+count<=end for start,end in model.valid_ranges)
+
+    def respond(self,frame):                                    # レスポンス作成
+        slave,function=frame[0],frame[1]
+        if self.slaves is not None and slave not in self.slaves:return b''
+        model=self.model(slave)
+        model.update(time.time())
+        if random.random()<self.exception_rate:
+            self.stats["exceptions"]+=1
+            return exception_response(slave,function,0x04)
+        address,value=struct.unpack('>HH',frame[2:6])
+        if function in (0x03,0x04):
+            if not 1<=value<=125 or not self.valid(model,address,value):
+                self.stats["exceptions"]+=1
+                return exception_response(slave,function,0x02)
+            return read_response(slave,[model.regs.get(address+i,0)for i in range(value)],function)
+        if function==0x06:
+            model.regs[address]=value
+            return bytes(frame)
+        if function==0x10:
+            values=struct.unpack(f'>{value}H',frame[7:7+value*2])
+            for i,v in enumerate(values):model.regs[address+i]=v
+            return append_crc(frame[:6])
+        return exception_response(slave,function,0x01)
+
+    def serve(self):
+        """ リクエストを受信して応答する（スレッドで実行） """
+        buf=b''
+        while self.running:
+            try:
+                ready,_,_=select.select([self.master_fd],[],[],0.2)
+                if not ready:
+                    buf=b''                                     # 無通信でフレーム区切り
+                    continue
+                buf+=os.read(self.master_fd,256)
+            except OSError:
+                if not self.running:return                      # close() 済み
+                raise
+            while True:
+                frame,buf=self.split_request(buf)
+                if frame is None:break
+                self.stats["requests"]+=1
+                time.sleep(len(frame)*self.char_time)           # リクエスト受信時間
+                if not check_crc(frame):
+                    self.stats["crc_errors"]+=1
+                    continue
+                if random.random()<self.drop_rate:
+                    self.stats["dropped"]+=1
+                    continue
+                response=self.respond(frame)
+                if not response:continue
+                if random.random()<self.crc_error_rate:         # CRC異常を注入
+                    response=response[:-1]+bytes([response[-1]^0xFF])
+                time.sleep(self.latency+len(response)*self.char_time)
+                os.write(self.master_fd,response)
+                self.stats["responses"]+=1
+
+    def start(self):
+        self.running=True
+        self.thread=threading.Thread(target=self.serve,daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def close(self):
+        self.running=False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()                                  # select のタイムアウト（0.2秒）以内に終了
+        if self.link and os.path.islink(self.link):os.remove(self.link)
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+# ----------起動
+def main():
+    parser=argparse.ArgumentParser(description="Modbus RTU スレーブシミュレーター")
+    parser.add_argument("--bus",action="append",required=True,
+                        help="機器:ポート名 例 hyp:COM7 kmn1:COM9")
+    parser.add_argument("--baud",type=int,default=9600)
+    parser.add_argument("--latency",type=float,default=0.02,help="応答遅延（秒）")
+    parser.add_argument("--drop-rate",type=float,default=0.0,help="無応答の確率")
+    parser.add_argument("--crc-error-rate",type=float,default=0.0,help="CRC異常の確率")
+    parser.add_argument("--exception-rate",type=float,default=0.0,help="例外応答の確率")
+    args=parser.parse_args()
+    buses=[]
+    for spec in args.bus:
+        device,link=spec.split(":",1)
+        bus=SimulatedBus(device,link,baudrate=args.baud,stopbits=2 if device=="kmn1" else 1,
+                         latency=args.latency,drop_rate=args.drop_rate,
+                         crc_error_rate=args.crc_error_rate,exception_rate=args.exception_rate)
+        bus.start()
+        buses.append(bus)
+        print(f"{device}: {link} -> {bus.port}")
+    try:
+        while True:time.sleep(1)
+    except KeyboardInterrupt:
+        print("シミュレーターを終了します。")
+    finally:
+        for bus in buses:
+            print(bus.link,bus.stats)
+            bus.close()
+
+if __name__=="__main__":
+    main()
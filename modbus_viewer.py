@@ -0,0 +1,57 @@
+# Modbus ロガー 画面（ビューアー）
+# ----------概要
+# modbus_logger_daemon の配信ポートへ接続し、最新データを表示するだけの画面。
+# 受信はスレッドで行い、画面の更新は表示ブリッジ（tk_display）で最新サンプルの差分のみ反映する。
+# 使い方: python modbus_viewer.py [ホスト] [ポート]
+import json
+import socket
+import sys
+import threading                                                # スレッド組込
+import tkinter as tk                                            # GUIモジュール組込
+from tk_display import DisplayBridge                            # Tk表示ブリッジ組込
+
+class ViewerClient:
+    """ 配信を受信して表示ブリッジへ渡す """
+    def __init__(self,host,port):
+        self.sock=socket.create_connection((host,port))
+        self.reader=self.sock.makefile("r",encoding="utf-8")
+        self.meta=json.loads(self.reader.readline())            # 機器・項目名・単位
+
+    def receive(self,bridge):                                   # 受信スレッド
+        for line in self.reader:
+            sample=json.loads(line)
+            bridge.push(time=[sample["time"]],**sample["devices"])
+        bridge.push(time=["切断"])
+
+    def start(self,bridge):
+        threading.Thread(target=self.receive,args=(bridge,),daemon=True).start()
+
+def create_gui(client):                                         # GUI作成
+    root=tk.Tk()
+    root.title("Modbus ロガー モニター")
+    frame=tk.Frame(root)
+    frame.grid(row=0,column=0,sticky=tk.NSEW,padx=5,pady=10)
+    col1='#0000ff'                                              # データ文字色
+    col2='#cccccc'                                              # データ背景色
+    label0=tk.Label(frame,width=19,text="",anchor=tk.W)
+    label0.grid(column=0,row=0,columnspan=2)
+    bridge=DisplayBridge(root,period_ms=500)
+    bridge.bind("time",[label0])
+    for d,dev in enumerate(client.meta["devices"]):
+        tk.Label(frame,text=dev["name"],font=("Atari",9,"bold"),anchor=tk.W).grid(column=d*3,row=1,sticky=tk.W)
+        labels=[]
+        for i,(name,unit) in enumerate(zip(dev["fields"],dev["units"])):
+            tk.Label(frame,width=19,text=name,anchor=tk.W).grid(column=d*3,row=i+2)
+            label=tk.Label(frame,width=13,text="",anchor=tk.E,relief=tk.SOLID,borderwidth=1,
+                           foreground=col1,background=col2)
+            label.grid(column=d*3+1,row=i+2)
+            tk.Label(frame,width=6,text=unit,anchor=tk.W).grid(column=d*3+2,row=i+2)
+            labels.append(label)
+        bridge.bind(dev["name"],labels)
+    client.start(bridge)
+    root.mainloop()
+
+if __name__=="__main__":
+    host=sys.argv[1] if len(sys.argv)>1 else "127.0.0.1"
+    port=int(sys.argv[2]) if len(sys.argv)>2 else 50200
+    create_gui(ViewerClient(host,port))
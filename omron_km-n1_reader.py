@@ -3,7 +3,8 @@ import minimalmodbus    # Modbusモジュール組込
 import serial           # シリアル通信モジュール組込
 import csv              # CSVファイルモジュール組込
 import datetime         # 時計モジュール組込
-from time import sleep  # タイマー組込
+from sampling_scheduler import IntervalScheduler,TIMING_HEADER # 計測周期スケジューラー組込
+from csv_log_writer import DailyCsvWriter # 日毎CSVライター組込
 
 # 通信設定
 modbus=minimalmodbus.Instrument('COM5',1)
@@ -118,13 +119,17 @@ with open(file_name, 'w', newline='') as file: # CSVファイルを作成
     writer.writerow(unit_data) # ヘッダー２を書込
 
     sel_timer="m" # ループタイマー:m=1分,h=1時間,d=1日
-    interval1=8.7 # 計測間隔（秒）+1.3秒:8.7->10秒
+    interval1=10 # 計測周期（秒）:時刻基準なので読出時間の補正は不要
     interval2=1
     set_timer1,set_timer2=timer_sub(sel_timer)
     loop_timer1=set_timer1
     loop_timer2=set_timer2
     
+    timing_log=DailyCsvWriter('omron_running_timing',[TIMING_HEADER]) # 計測タイミングログ（遅れ・スキップ）
+    sampler=IntervalScheduler(interval1,log=timing_log) # 絶対時刻基準の周期タイマー
     while loop_timer1<=set_timer1: # ループ設定
+        tick=sampler.wait() # 次の計測時刻まで待機
+        if tick.overrun:print("周期超過:",tick.skipped,"回スキップ",tick.date_time)
         dt_now = datetime.datetime.now() # 日時を取得
         date_time=dt_now.strftime('%y/%m/%d %H:%M:%S')
         read_list=read_data(date_time,3,ctrl_cnt,ctrl_add,ctrl_type)
@@ -139,6 +144,4 @@ with open(file_name, 'w', newline='') as file: # CSVファイルを作成
                 break
             if set_timer1-loop_timer1>interval2:
                 break
-        sleep(interval1)
-        
-
+    timing_log.close()
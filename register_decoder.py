@@ -0,0 +1,92 @@
+# レジスターデコーダー
+# ----------概要
+# レジスターテーブルと一括読出プラン（modbus_planner）から、ブロック毎の struct 書式と
+# 項目毎の変換（符号・倍率・列挙・時刻）を一度だけ作成し、読出ブロックを1回の
+# unpack で全項目に変換する。32bit値は文字列連結ではなくワードのシフトで組み立てる。
+# ----------データタイプ
+# 0:整数 1:1/10 2:1/100 3:1/1000 4:電圧(1/10,24V=x2,48V=x4) 5:文字 6:ON/OFF 7:時刻(HH:MM) 8:列挙
+import struct                                                   # バイナリ変換組込
+
+SCALE_TYPES=(1,10,100,1000)                                     # タイプ0～3の除数
+VOLT_FACTOR={24:2,48:4}                                         # システム電圧倍率
+
+def _word_codes(words,signed,word_order):                       # 1項目分のstruct書式
+    if words==1:return "h" if signed else "H"
+    if words==2 and word_order=="big":return "i" if signed else "I"
+    return "H"*words                                            # 下位ワード先頭・48bitはワード毎に取得
+
+def _join_words(raw,signed,word_order):                         # ワード結合（シフト）
+    if word_order=="little":raw=raw[::-1]
+    v=0
+    for w in raw:v=(v<<16)|w
+    bits=16*len(raw)
+    if signed and v>=1<<(bits-1):v-=1<<bits
+    return v
+
+def _converter(d_type,enum):                                    # タイプ毎の値変換
+    if d_type==0:return lambda v,volt:v
+    if d_type<4:
+        div=SCALE_TYPES[d_type]
+        return lambda v,volt:v/div
+    if d_type==4:return lambda v,volt:v/10*VOLT_FACTOR.get(volt,1)
+    if d_type==5:return lambda v,volt:chr(v)
+    if d_type==6:return lambda v,volt:("OFF","ON")[v]
+    if d_type==7:return lambda v,volt:f"{v>>8:02d}:{v&0xff:02d}"
+    if d_type==8:
+        return lambda v,volt:enum[v] if 0<=v<len(enum) else v
+    return lambda v,volt:v
+
+class RegisterDecoder:
+    """ コンパイル済みデコーダー。decode_raw/decode はブロック読出結果を受け取る """
+    def __init__(self,n_fields,blocks):
+        self.n_fields=n_fields
+        self.blocks=blocks                                      # [(pack,unpack,fields), ...]
+
+    def decode_raw(self,block_regs):
+        """ 符号処理・ワード結合済みの整数値をテーブル順で返す """
+        raw=[None]*self.n_fields
+        for (pack,unpack,fields),regs in zip(self.blocks,block_regs):
+            values=unpack.unpack(pack.pack(*regs))
+            for i,pos,n,signed,join,conv in fields:
+                raw[i]=join(values[pos:pos+n],signed) if join else values[pos]
+        return raw
+
+    def decode(self,block_regs,sys_volt=0):
+        """ 倍率・列挙・時刻変換後の値をテーブル順で返す """
+        data=[None]*self.n_fields
+        for (pack,unpack,fields),regs in zip(self.blocks,block_regs):
+            values=unpack.unpack(pack.pack(*regs))
+            for i,pos,n,signed,join,conv in fields:
+                v=join(values[pos:pos+n],signed) if join else values[pos]
+                data[i]=conv(v,sys_volt)
+        return data
+
+def compile_decoder(table,plan,type_col,enum_col=None,words_col=1,word_order="big"):
+    """
+    レジスターテーブルと読出プランからデコーダーを作成する。
+    type_col: データタイプ列  enum_col: 列挙文字列の開始列（タイプ8）
+    word_order: 32bit以上のワード順 "big"=上位ワード先頭（KM-N1） "little"=下位ワード先頭（HYP）
+    """
+    blocks=[]
+    for start,count,fields in plan:
+        fmt=[">"]
+        pos=0                                                   # unpack結果の位置
+        offset=0                                                # ブロック内ワード位置
+        compiled=[]
+        for i,f_offset,words in sorted(fields,key=lambda f:f[1]):
+            row=table[i]
+            d_type=row[type_col]
+            signed=d_type<4                                     # タイプ0～3は符号付き
+            if f_offset>offset:fmt.append(f"{(f_offset-offset)*2}x")
+            code=_word_codes(words,signed,word_order)
+            fmt.append(code)
+            join=None
+            if len(code)>1:
+                join=lambda raw,signed,o=word_order:_join_words(raw,signed,o)
+            enum=row[enum_col:] if enum_col is not None else ()
+            compiled.append((i,pos,len(code),signed,join,_converter(d_type,enum)))
+            pos+=len(code)
+            offset=f_offset+words
+        if count>offset:fmt.append(f"{(count-offset)*2}x")
+        blocks.append((struct.Struct(f">{count}H"),struct.Struct("".join(fmt)),compiled))
+    return RegisterDecoder(len(table),blocks)
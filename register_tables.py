@@ -0,0 +1,81 @@
+# HYP4850U100-H / OMRON KM-N1 レジスターテーブル
+# ----------概要
+# hyp_kmn1_logger とヘッドレスロガー（modbus_logger_daemon）で共用するレジスター定義と読出グループ。
+RATE_CLASS={"fast":1,"medium":30,"slow":300}                   # 読出周期クラス（秒）
+
+# ----------ログパラメーター [0address,1byte,2x,3y,4type,5name,6unit,7len,8min,9max,10set,11data...]
+p_data=[[0x0213,1,0,2,1,"系統電圧","V(AC)"],
+        [0x0214,1,0,3,1,"系統電流","A(AC)"],
+        [0x0215,1,0,4,2,"系統周波数","Hz"],
+        [0x021e,1,0,5,1,"系統充電電流","A(AC)"],
+        [0x0210,1,0,7,8,"機器状態","",0,0,0,"起動","待機","初期化","省電力","商用出力",
+        "インバーター出力","系統出力","混合出力","-","-","停止","故障"],
+        [0x0216,1,0,8,1,"出力電圧","V(AC)"],
+        [0x0219,1,0,9,1,"出力電流","A(AC)"],
+        [0x0218,1,0,10,2,"出力周波数","Hz"],
+        [0x021b,1,0,11,0,"負荷有効電力","W"],
+        [0x021c,1,0,12,0,"負荷皮相電力","W"],
+        [0x021f,1,0,13,0,"負荷率","%"],
+        
+        [0x010b,1,0,15,8,"充電状態","",0,0,0,"未充電","定電流(CC)充電","定電圧(CV)充電","-",
+        "浮遊充電","-","充電中1","充電中2"],
+        [0x0100,1,0,16,0,"蓄電池SOC","%"],
+        [0x0101,1,0,17,1,"蓄電池電圧","V(DC)"],
+        [0x0102,1,0,18,1,"蓄電池電流","A(DC)"],
+        [0x010e,1,0,19,0,"充電電力","W"],
+        [0x0217,1,0,20,1,"INV電流 ","A(DC)"],
+        
+        [0x0107,1,0,22,1,"PV入力電圧","V(DC)"],
+        [0x0108,1,0,23,1,"PV入力電流","A(DC)"],
+        [0x0109,1,0,24,0,"PV入力電力","W"],
+        [0x0224,1,0,25,1,"PV降圧電流","A(DC)"],
+           
+        [0x0212,1,0,27,1,"DCバス電圧","V(DC)"],
+        [0x0225,1,0,28,1,"降圧電流","A(DC)"],
+        [0x0220,1,0,29,1,"PVHT温度","℃"],
+        [0x0221,1,0,30,1,"INVHT温度","℃"],
+        [0x0222,1,0,31,1,"Tr温度","℃"],
+        [0x0223,1,0,32,1,"内部温度","℃"],
+           
+        [0xf02d,1,5,2,0,"本日充電量","Ah"],
+        [0xf02e,1,5,3,0,"本日放電量","Ah"],
+        [0xf02f,1,5,4,1,"本日発電量","kWh"],
+        [0xf030,1,5,5,1,"本日消費量","kWh"],
+        [0xf03c,1,5,6,0,"本日商用充電量","Ah"],
+        [0xf03d,1,5,7,1,"本日商用電力消費量","kWh"],
+        [0xf03e,1,5,8,0,"本日インバーター稼働時間","時間"],
+        [0xf03f,1,5,9,0,"本日バイパス稼働時間","時間"],
+
+        [0xf034,2,5,11,0,"累積充電量","Ah"],
+        [0xf036,2,5,12,0,"累積放電量","Ah"],
+        [0xf038,2,5,13,0,"累積発電量","kWh"],
+        [0xf03a,2,5,14,0,"累積負荷積算電力量","kWh"],
+        [0xf046,2,5,15,0,"累積商用充電量","kWh"],
+        [0xf048,2,5,16,0,"累積商用負荷電力消費量","kWh"],
+        [0xf04a,1,5,17,0,"累積インバーター稼働時間","時間"],
+        [0xf04b,1,5,18,0,"累積バイパス稼働時間","時間"]]
+k_data=[[0x0000,2,0,36,1,"電圧1","V"],
+        [0x0002,2,0,37,1,"電圧2","V"],
+        [0x0004,2,0,38,1,"電圧3","V"],
+        [0x0006,2,0,39,3,"電流1","A"],
+        [0x0008,2,0,40,3,"電流2","A"],
+        [0x000a,2,0,41,3,"電流3","A"],
+        [0x000c,2,0,42,2,"力率",""],
+        [0x000e,2,0,43,1,"周波数","Hz"],
+        [0x0010,2,0,44,1,"有効電力","W"],
+        [0x0012,2,0,45,1,"無効電力","Var"],
+        [0x0200,2,5,36,0,"積算有効電力量","Wh"],
+        [0x0202,2,5,37,0,"積算回生電力量","Wh"],
+        [0x0204,2,5,38,0,"積算進み無効電力量","Varh"],
+        [0x0206,2,5,39,0,"積算遅れ無効電力量","Varh"],
+        [0x0208,2,5,40,0,"積算総合無効電力量","Varh"],
+        [0x0220,2,5,41,0,"積算有効電力量","kWh"],
+        [0x0222,2,5,42,0,"積算回生電力量","kWh"],
+        [0x0224,2,5,43,0,"積算進み無効電力量","kVarh"],
+        [0x0226,2,5,44,0,"積算遅れ無効電力量","kVarh"],
+        [0x0228,2,5,45,0,"積算総合無効電力量","kVarh"]]
+# ----------読出グループ [0開始address,1終了address,2周期クラス]
+p_group=[[0x0100,0x010e,"fast"],[0x0210,0x0225,"fast"],        # 瞬時値
+         [0xf02d,0xf030,"medium"],[0xf03c,0xf03f,"medium"],    # 当日積算値
+         [0xf034,0xf03b,"slow"],[0xf046,0xf04b,"slow"]]        # 累積積算値
+k_group=[[0x0000,0x0013,"fast"],[0x0200,0x0229,"medium"]]
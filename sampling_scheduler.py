@@ -0,0 +1,83 @@
+# 計測周期スケジューラー
+# ----------概要
+# sleep(interval) の累積ずれを無くすため、時計の絶対時刻（周期の倍数、秒単位で整列）で
+# 計測タイミングを決める。各計測の遅れ（lateness）とばらつき（jitter）を記録し、
+# 処理が周期を超えた場合は遅れを持ち越さず、次の整列時刻までスキップして記録する。
+# 記録先（log）を渡すと1計測1行の計測タイミングログ（TIMING_HEADER の列）を書込み、
+# 集計側で遅れた・スキップ直後の計測を予定時刻で判別できるようにする。
+import datetime                                                 # 時計モジュール組込
+import math
+import time                                                     # タイマー組込
+
+TIMING_HEADER=["予定時刻","遅れ(秒)","ジッター(秒)","スキップ回数"] # 計測タイミングログの見出し
+
+class SampleTick:
+    """ 1回分の計測タイミング記録 """
+    __slots__=("deadline","actual","lateness","jitter","skipped")
+    def __init__(self,deadline,actual,lateness,jitter,skipped):
+        self.deadline=deadline                                  # 予定時刻（エポック秒）
+        self.actual=actual                                      # 実際の起床時刻（エポック秒）
+        self.lateness=lateness                                  # 遅れ（秒）
+        self.jitter=jitter                                      # 前回遅れとの差（秒）
+        self.skipped=skipped                                    # 周期超過でスキップした回数
+
+    @property
+    def overrun(self):                                          # 周期超過判定
+        return self.skipped>0
+
+    @property
+    def date_time(self):                                        # 予定時刻の日時
+        return datetime.datetime.fromtimestamp(self.deadline)
+
+    def row(self):                                              # 計測タイミングログの1行
+        return [self.date_time.strftime('%y/%m/%d %H:%M:%S'),f"{round(self.lateness,3)+0.0:.3f}",
+                f"{round(self.jitter,3)+0.0:.3f}",self.skipped]   # -0.000 は 0.000
+
+class IntervalScheduler:
+    """ 絶対時刻基準の周期スケジューラー """
+    def __init__(self,interval,align=True,log=None):
+        self.interval=interval                                  # 計測周期（秒）
+        self.align=align                                        # 周期の倍数時刻に整列
+        self.log=log                                            # 計測タイミングの記録先（writerow(行,時刻)、例: DailyCsvWriter）
+        self.next_deadline=None
+        self.last_lateness=0.0
+
+    def _first_deadline(self,now):
+        if not self.align:return now
+        return math.ceil(now/self.interval)*self.interval
+
+    def wait(self):
+        """ 次の予定時刻まで待機して SampleTick を返す """
+        now=time.time()
+        if self.next_deadline is None:
+            self.next_deadline=self._first_deadline(now)
+        skipped=0
+        if now>=self.next_deadline+self.interval:               # 周期超過：過ぎた予定時刻はスキップ
+            skipped=int((now-self.next_deadline)//self.interval)
+            self.next_deadline+=skipped*self.interval
+        while True:                                             # 予定時刻まで待機
+            remain=self.next_deadline-time.time()
+            if remain<=0:break
+            time.sleep(remain)
+        actual=time.time()
+        lateness=actual-self.next_deadline
+        tick=SampleTick(self.next_deadline,actual,lateness,
+                        lateness-self.last_lateness,skipped)
+        self.last_lateness=lateness
+        if self.log is not None:self.log.writerow(tick.row(),tick.deadline) # 予定時刻の日付のファイルへ
+        self.next_deadline+=self.interval
+        return tick
+
+class TierTimer:
+    """ 周期クラス（秒）毎の読出タイミング判定。周期の倍数時刻で到来とする """
+    def __init__(self,rates):
+        self.next_due={rate:None for rate in rates}
+
+    def due(self,now):
+        """ now（エポック秒）で読出が必要な周期のリストを返す """
+        due=[]
+        for rate,next_due in self.next_due.items():
+            if next_due is None or now>=next_due:
+                due.append(rate)
+                self.next_due[rate]=(math.floor(now/rate)+1)*rate
+        return due
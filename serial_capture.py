@@ -0,0 +1,150 @@
+# シリアル通信キャプチャ（バイナリ形式）と再生
+# ----------概要
+# 中継・傍受したシリアルの受信データを、受信時刻（monotonic ns）・方向・ポート・生バイト列の
+# 固定ヘッダー付きレコードとしてバッファ経由で追記する。16進テキストの CSV と違い、
+# 受信単位の時刻と内容がそのまま残る。
+# 再生は記録時の間隔（実時間・倍速）または待ち時間なしで処理に渡し、dessheader と同じ
+# フレーム切出（FrameParser）・対応付け（TransactionCorrelator）の速度を実データ量で測れる。
+# ----------ファイル形式（リトルエンディアン）
+# 先頭: MAGIC(8) 記録開始のエポック秒<d 記録開始の monotonic ns<q
+# レコード: 時刻ns<q 方向<B ポート番号<B 長さ<H データ
+#   方向 0=リクエスト（Logger→Inverter） 1=レスポンス（Inverter→Logger） 255=ポート名定義（データ=名前）
+# 使い方: python serial_capture.py <キャプチャ> [--speed 1.0] [--dump]
+import argparse                                                 # 起動引数組込
+import struct                                                   # バイナリ変換組込
+import threading                                                # スレッド組込
+import time                                                     # タイマー組込
+from modbus_correlator import RegisterSnapshot,TransactionCorrelator # 送受信対応付け組込
+from modbus_rtu import FrameParser,frame_gap                    # RTUフレーム切出組込
+
+MAGIC=b"SERCAP01"
+FILE_HEADER=struct.Struct("<dq")
+RECORD=struct.Struct("<qBBH")
+DIR_REQUEST=0
+DIR_RESPONSE=1
+DIR_PORT=255
+DIR_NAMES={DIR_REQUEST:"Logger->Inverter",DIR_RESPONSE:"Inverter->Logger"}
+
+class CaptureWriter:
+    """ キャプチャファイルへのバッファ付き追記（複数スレッドから呼出可） """
+    def __init__(self,file_name,buffer_size=65536,flush_seconds=5):
+        self.file=open(file_name,"wb",buffering=buffer_size)   # buffer_size まで溜めてから書込
+        self.file_name=file_name
+        self.flush_seconds=flush_seconds                        # 少量でもこの間隔で書込（秒）
+        self.ports={}                                           # {ポート名: 番号}
+        self.lock=threading.Lock()
+        self.last_flush=time.monotonic()
+        self.file.write(MAGIC+FILE_HEADER.pack(time.time(),time.monotonic_ns()))
+
+    def write(self,port,direction,data,t_ns=None):
+        """ 受信データ1件を記録する  port: ポート名  direction: DIR_REQUEST / DIR_RESPONSE """
+        t_ns=time.monotonic_ns() if t_ns is None else t_ns
+        with self.lock:
+            if port not in self.ports:                          # 初出のポートは名前を定義
+                self.ports[port]=len(self.ports)
+                name=port.encode()
+                self.file.write(RECORD.pack(t_ns,DIR_PORT,self.ports[port],len(name))+name)
+            for i in range(0,len(data),0xFFFF):                 # 長さ欄（2バイト）を超える場合は分割
+                chunk=data[i:i+0xFFFF]
+                self.file.write(RECORD.pack(t_ns,direction,self.ports[port],len(chunk))+chunk)
+            if time.monotonic()-self.last_flush>=self.flush_seconds:
+                self.file.flush()
+                self.last_flush=time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_capture(file_name):
+    """
+    キャプチャを順に読む  戻り値: (記録開始のエポック秒, レコードのジェネレーター)
+    レコード: (時刻ns, ポート名, 方向, データ)  途中で切れた最後のレコードは無視する
+    """
+    file=open(file_name,"rb")
+    if file.read(len(MAGIC))!=MAGIC:
+        file.close()
+        raise ValueError(f"{file_name}: キャプチャファイルではありません")
+    start_time,start_ns=FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+    def records():
+        ports={}
+        with file:
+            while True:
+                head=file.read(RECORD.size)
+                if len(head)<RECORD.size:return
+                t_ns,direction,port,length=RECORD.unpack(head)
+                data=file.read(length)
+                if len(data)<length:return
+                if direction==DIR_PORT:
+                    ports[port]=data.decode()
+                    continue
+                yield t_ns-start_ns,ports.get(port,str(port)),direction,data
+    return start_time,records()
+
+def replay(file_name,handler,speed=None):
+    """
+    キャプチャを handler(ポート名,方向,データ,時刻ns) に渡す
+    speed: None=待ち時間なし  1.0=記録時と同じ間隔  2.0=2倍速  戻り値: 渡した件数
+    """
+    start_time,records=read_capture(file_name)
+    count=0
+    t0=None
+    for t_ns,port,direction,data in records:
+        if speed:
+            if t0 is None:t0=time.monotonic()-t_ns/1e9/speed
+            delay=t0+t_ns/1e9/speed-time.monotonic()
+            if delay>0:time.sleep(delay)
+        handler(port,direction,data,t_ns)
+        count+=1
+    return count
+
+# ----------dessheader と同じ解析で再生
+class ReplayParser:
+    """ ポート毎の FrameParser・TransactionCorrelator で再生データを解析する """
+    def __init__(self,baudrate=9600):
+        self.gap=frame_gap(baudrate)
+        self.snapshot=RegisterSnapshot()
+        self.buses={}
+        self.stats={"bytes":0,"frames":0,"transactions":0}
+
+    def __call__(self,port,direction,data,t_ns):
+        if port not in self.buses:
+            self.buses[port]=(FrameParser(False,self.gap),FrameParser(True,self.gap),
+                              TransactionCorrelator(port,self.snapshot))
+        request_parser,response_parser,correlator=self.buses[port]
+        t=t_ns/1e9                                              # 記録時の受信間隔でフレームを区切る
+        self.stats["bytes"]+=len(data)
+        if direction==DIR_REQUEST:
+            for frame in request_parser.feed(data,t):
+                self.stats["frames"]+=1
+                correlator.request(frame,t)
+        else:
+            for frame in response_parser.feed(data,t):
+                self.stats["frames"]+=1
+                if correlator.response(frame,t):self.stats["transactions"]+=1
+
+def dump(port,direction,data,t_ns):                             # 16進表示
+    print(f"{t_ns/1e9:12.6f} {port} {DIR_NAMES.get(direction,direction)} {data.hex()}")
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="シリアル通信キャプチャの再生")
+    parser.add_argument("capture")
+    parser.add_argument("--speed",type=float,default=None,help="再生速度（1.0=実時間、省略時は待ち時間なし）")
+    parser.add_argument("--dump",action="store_true",help="16進で表示する")
+    parser.add_argument("--baudrate",type=int,default=9600)
+    args=parser.parse_args()
+    if args.dump:
+        replay(args.capture,dump,args.speed)
+    else:
+        replay_parser=ReplayParser(args.baudrate)
+        start=time.perf_counter()
+        count=replay(args.capture,replay_parser,args.speed)
+        elapsed=time.perf_counter()-start
+        stats=replay_parser.stats
+        print(f"レコード {count} 件  {stats['bytes']} バイト  フレーム {stats['frames']}  取引 {stats['transactions']}")
+        print(f"処理時間 {elapsed:.3f} 秒  {stats['frames']/max(elapsed,1e-9):.0f} フレーム/秒")
+        for port,(request_parser,response_parser,correlator) in replay_parser.buses.items():
+            print(port,"リクエスト",request_parser.stats,"レスポンス",response_parser.stats,correlator.stats)
@@ -0,0 +1,104 @@
+# シリアル中継ループ（イベント駆動）
+# ----------概要
+# 複数のシリアルポートを1つのループで監視し、受信した時だけ登録した処理を呼ぶ。
+# in_waiting の定期確認（ビジーループ）をやめ、無通信時の CPU 使用率をほぼ 0 にする。
+# POSIX（Linux 等）は selectors でポートのファイル記述子を待つ。Windows の COM ポートは
+# select で待てないため、ポート毎の受信スレッドが読出し（受信まで OS 内で待機）、キュー経由で
+# 同じループに渡す。どちらも処理の呼出しはループのスレッド1本だけで行う。
+# 無通信時の処理（on_idle）は受信後に1回だけ呼び、その後は次の受信まで待ち続ける。
+import os
+import queue
+import selectors
+import threading                                                # スレッド組込
+
+class SerialProxy:
+    """ 複数ポートの受信待ちループ  add_port / add_pair で登録して run() """
+    def __init__(self,idle=0.02):
+        self.idle=idle                                          # 受信が途切れてから on_idle を呼ぶまでの時間（秒）
+        self.pending=False                                      # on_idle 未処理の受信あり
+        self.ports=[]                                           # [[ser,on_data], ...]
+        self.idle_handlers=[]
+        self.running=False
+        self.stats={"reads":0,"bytes":0,"wakeups":0}
+
+    def add_port(self,ser,on_data):
+        """ 受信処理を登録する  on_data(data): 受信バイト列 """
+        self.ports.append([ser,on_data])
+
+    def add_idle(self,on_idle):
+        """ 無通信時に呼ぶ処理を登録する（フレーム区切りの確認等） """
+        self.idle_handlers.append(on_idle)
+
+    def add_pair(self,ser_a,ser_b,on_a=None,on_b=None):
+        """ 2ポートを双方向に中継する  on_a/on_b: 転送後に呼ぶ処理（受信データ） """
+        def forward(dst,handler):
+            def on_data(data):
+                dst.write(data)                                 # 受信したら即転送
+                if handler:handler(data)
+            return on_data
+        self.add_port(ser_a,forward(ser_b,on_a))
+        self.add_port(ser_b,forward(ser_a,on_b))
+
+    def _dispatch(self,on_data,data):
+        self.pending=True
+        self.stats["reads"]+=1
+        self.stats["bytes"]+=len(data)
+        on_data(data)
+
+    def _timeout(self):                                         # 受信待ちの上限（停止確認を兼ねる）
+        return self.idle if self.pending else 1.0
+
+    def _on_idle(self):
+        if not self.pending:return
+        self.pending=False
+        for handler in self.idle_handlers:handler()
+
+    def run(self):
+        """ stop() まで受信待ちと処理を繰り返す """
+        self.running=True
+        if os.name=="posix":self._run_selector()
+        else:self._run_threads()
+
+    def stop(self):
+        self.running=False
+
+    def _run_selector(self):
+        selector=selectors.DefaultSelector()
+        for ser,on_data in self.ports:
+            selector.register(ser.fileno(),selectors.EVENT_READ,(ser,on_data))
+        try:
+            while self.running:
+                events=selector.select(self._timeout())         # 受信まで待機
+                self.stats["wakeups"]+=1
+                if not events:
+                    self._on_idle()
+                    continue
+                for key,_ in events:
+                    ser,on_data=key.data
+                    data=ser.read(ser.in_waiting or 1)
+                    if data:self._dispatch(on_data,data)
+        finally:
+            selector.close()
+
+    def _run_threads(self):
+        received=queue.Queue()
+        def reader(ser,on_data):                                # ポート毎の受信スレッド
+            while self.running:
+                try:
+                    data=ser.read(1)                            # 受信まで待機（タイムアウト付き）
+                    if data:received.put((on_data,data+ser.read(ser.in_waiting)))
+                except Exception as e:
+                    received.put((None,e))
+                    return
+        for ser,on_data in self.ports:
+            threading.Thread(target=reader,args=(ser,on_data),daemon=True).start()
+        while self.running:
+            try:
+                on_data,data=received.get(timeout=self._timeout())
+            except queue.Empty:
+                self.stats["wakeups"]+=1
+                self._on_idle()
+                continue
+            self.stats["wakeups"]+=1
+            if on_data is None:raise data                       # 受信スレッドの異常
+            self._dispatch(on_data,data)
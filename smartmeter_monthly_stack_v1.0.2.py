@@ -19,7 +19,7 @@ import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import filedialog
 from matplotlib import font_manager
-import jpholiday
+from holiday_calendar import non_working_days # 土日祝カレンダー
 import datetime
 import time
 
@@ -39,11 +39,8 @@ def is_holiday(date):
     """土日祝日判定"""
     if isinstance(date, str):
         date = pd.to_datetime(date)
-    # 土日判定
-    if date.weekday() >= 5:  # 5=土曜日, 6=日曜日
-        return True
-    # 祝日判定
-    return jpholiday.is_holiday(date)
+    # 土日祝カレンダー（期間毎に1回だけ作成・保存）を引く
+    return bool(non_working_days(np.datetime64(date, 'D')))
 
 
 # ---- 料金関連の定義とヘルパー ----
@@ -33,10 +33,14 @@ from tkinter import filedialog
 from tkinter import messagebox
 
 # 祝日判定用ライブラリ
-import jpholiday
 import datetime
 import time
 from collections import defaultdict
+from dessmonitor_cache import ParseCache # Dessmonitor解析結果のキャッシュ
+from dessmonitor_ingest import ingest, print_progress # Dessmonitor並列読込
+from dessmonitor_reader import read_hourly_energy # Dessmonitor時間毎集計
+from holiday_calendar import non_working_days # 土日祝カレンダー
+from tariff import BANDS, Tariff # 時間帯別料金（配列で一括計算）
 
 
 # 日本語フォントの設定
@@ -144,6 +148,9 @@ TIME_BANDS = {
     }
 }
 
+# 料金表（時間帯単価・再エネ賦課金・燃料費調整単価・時間帯を参照用の配列に変換したもの）
+TARIFF = Tariff(PRICE_PERIODS, RENEWABLE_BY_YEAR, FUEL_ADJ, {band: info['hours'] for band, info in TIME_BANDS.items()})
+
 # 凡例や軸の共通設定
 PLOT_SETTINGS = {
     'cost_color': 'red', # 電気料金プロット色
@@ -170,28 +177,16 @@ def hour_to_band(hour: int, is_holiday_flag: bool) -> str:
         h = int(hour) % 24
     except Exception:
         return 'night'
-    if is_holiday_flag:
-        # 休日は 'home' の時間帯が拡張される
-        if h in TIME_BANDS['home']['hours'] or h in TIME_BANDS['day']['hours']:
-            return 'home'
-        else:
-            return 'night'
-    # 平日
-    for band, info in TIME_BANDS.items():
-        if h in info['hours']:
-            return band
-    return 'night'
+    # 休日は 'home' の時間帯が拡張される（TARIFF.band_table[休日, 時]）
+    return BANDS[TARIFF.band_table[int(bool(is_holiday_flag)), h]]
 
 # 土日祝日判定関数
 def is_holiday(date):
     """土日祝日判定"""
     if isinstance(date, str):
         date = pd.to_datetime(date)
-    # 土日判定
-    if date.weekday() >= 5:  # 5=土曜日, 6=日曜日
-        return True
-    # 祝日判定
-    return jpholiday.is_holiday(date)
+    # 土日祝カレンダー（期間毎に1回だけ作成・保存）を引く
+    return bool(non_working_days(np.datetime64(date, 'D')))
 
 # 指定日の単価を返す関数
 def get_unit_prices_for_date(date):
@@ -202,10 +197,7 @@ def get_unit_prices_for_date(date):
         dt = pd.Timestamp(date)
     else:
         dt = pd.to_datetime(date)
-    for start, end, prices in PRICE_PERIODS:
-        if (start is None or dt >= start) and (end is None or dt <= end):
-            return prices
-    return PRICE_PERIODS[-1][2]
+    return TARIFF.periods[int(TARIFF.period_index(dt.to_datetime64()))]
 
 # 再エネ賦課金単価を返す関数
 def get_renewable_unit_for_date(date):
@@ -214,9 +206,7 @@ def get_renewable_unit_for_date(date):
         dt = pd.Timestamp(date)
     else:
         dt = pd.to_datetime(date)
-    year = dt.year
-    key_year = year if dt.month >= 5 else year - 1
-    return RENEWABLE_BY_YEAR.get(key_year, 0.0)
+    return float(TARIFF.renewable(dt.to_datetime64()))
 
 # 燃料費調整単価を返す関数
 def get_fuel_adj_for_date(date):
@@ -224,8 +214,7 @@ def get_fuel_adj_for_date(date):
         dt = pd.Timestamp(date)
     else:
         dt = pd.to_datetime(date)
-    key = f"{dt.year:04d}-{dt.month:02d}"
-    return FUEL_ADJ.get(key, 0.0)
+    return float(TARIFF.fuel_adjustment(dt.to_datetime64()))
 
 # 日単位の電気料金詳細計算関数
 def compute_cost_breakdown(date, day_kwh, home_kwh, night_kwh):
@@ -268,61 +257,23 @@ def compute_cost_breakdown(date, day_kwh, home_kwh, night_kwh):
 # --- Dessmonitorデータ一括キャッシュ関数 ---
 def build_dessmonitor_data_cache(dessmonitor_folder):
     """指定フォルダ配下の全energy-storage-container-*.xlsxを一括で読み込み、
-    {(date, hour): {'energy_sum': [値リスト], 'charge_sum': [値リスト]}} のdictを返す。"""
+    {(date, hour): {'energy_sum': [値リスト], 'charge_sum': [値リスト]}} のdictを返す。
+    ファイル毎の集計はプロセスプールで並列に行い (dessmonitor_ingest)、ここでは結果をまとめるだけ。
+    前回から変わっていないファイルの集計はキャッシュ (dessmonitor_cache) から取得する。"""
     
     cache = defaultdict(lambda: {'PV_sum': [], 'energy_sum': [], 'charge_sum': []}) # 全体キャッシュ
     pattern = os.path.join(dessmonitor_folder, '**/energy-storage-container-*.xlsx') # ファイルパターン
     files = glob.glob(pattern, recursive=True) # ファイル一覧取得
-    for f in files: # 各ファイルを処理
-        try:
-            df = pd.read_excel(f) # Excel読み込み
-            df_sorted = df.iloc[::-1].copy() # 日時降順にソートし、明示的にコピー
-            df_sorted['hour'] = df_sorted.iloc[:,0].apply(lambda x: int(str(x)[11:13]) if isinstance(x,str) and len(x)>=13 else None) # 時間抽出
-            df_sorted['date'] = df_sorted.iloc[:,0].apply(lambda x: str(x)[:10] if isinstance(x,str) and len(x)>=10 else None) # 日付抽出
-            for (date, hour), group in df_sorted.groupby(['date', 'hour']): # 日付・時間毎にグループ化
-                if date is None or hour is None:
-                    continue
-                # 発電量
-                vals_gen = group.iloc[:,29].values if group.shape[1]>29 else []
-                if len(vals_gen) >= 2:
-                    if vals_gen[0] > vals_gen[-1]:
-                        gen = 0.0
-                    else:
-                        gen = float(vals_gen[-1]) - float(vals_gen[0])
-                else:
-                    gen = 0.0
-                #gen_sum += gen
-                # 蓄電
-                vals = group.iloc[:,30].values if group.shape[1]>30 else [] # 31列目: 蓄電量
-                if len(vals) >= 2: # 蓄電量計算: 最初と最後の差分を合算
-                    if vals[0] > vals[-1]: # 値が減少している場合
-                        energy = 0.0 # 減少分は0扱い
-                    else:
-                        energy = float(vals[-1]) - float(vals[0]) # 差分を加算
-                else:
-                    energy = 0.0 # 蓄電量データ不足時は0扱い
-                # 商用充電量
-                vals_9 = group.iloc[:,8].values if group.shape[1]>8 else [] # 9列目: Grid電圧
-                vals_10 = group.iloc[:,9].values if group.shape[1]>9 else [] # 10列目: Grid電流
-                vals_22 = group.iloc[:,21].values if group.shape[1]>21 else [] # 22列目: Inverter出力電力
-                charge_sum = 0.0 # 商用充電量合計
-                if len(vals_9) >= 2 and len(vals_10) >= 2 and len(vals_22) >= 2: # 必要列が存在するか
-                    for i in range(len(group)-1, 0, -1): # 各行を処理
-                        try:
-                            v9 = float(vals_9[i]) # 9列目
-                            v10 = float(vals_10[i]) # 10列目
-                            v22 = float(vals_22[i]) # 22列目
-                            charge = (v9 * v10 -v22)* (1/12000) # kWh換算(5分毎)
-                            if charge < 0: # 負の値は0扱い
-                                charge = 0.0 # 負の差分は0扱い
-                            charge_sum += charge # 加算
-                        except Exception:
-                            continue
-                cache[(date, hour)]['PV_sum'].append(gen) # 蓄電量リスト初期化
-                cache[(date, hour)]['energy_sum'].append(energy) # 蓄電量追加
-                cache[(date, hour)]['charge_sum'].append(charge_sum) # 商用充電量追加
-        except Exception:
+    with ParseCache() as parse_cache: # 解析済みのファイルは読み直さない
+        results = ingest(files, read_hourly_energy, progress=print_progress, cache=parse_cache)
+    for f, hourly in results: # 各ファイルの日付・時毎の集計
+        if isinstance(hourly, Exception): # 読み込めないファイルは飛ばす
             continue
+        for date, hour, gen, energy, charge_sum in zip(hourly.date.tolist(), hourly.hour.tolist(),
+                                                       hourly.pv.tolist(), hourly.energy.tolist(), hourly.charge.tolist()):
+            cache[(date, hour)]['PV_sum'].append(gen) # 発電量追加
+            cache[(date, hour)]['energy_sum'].append(energy) # 蓄電量追加
+            cache[(date, hour)]['charge_sum'].append(charge_sum) # 商用充電量追加
     return cache
 
 # ---- 共通ユーティリティ関数 ----
@@ -330,22 +281,21 @@ def build_dessmonitor_data_cache(dessmonitor_folder):
 # 時間ごとの単価リスト作成関数
 def build_hourly_unit(prices: dict, renew: float, fuel: float, is_holiday_flag: bool) -> list:
     """単日 (24要素) の時間ごとの単価リストを返す (円/kWh)。"""
-    return [prices[hour_to_band(h, is_holiday_flag)] + renew + fuel for h in range(24)]
+    units = np.array([prices[band] for band in BANDS]) # 時間帯番号順の単価
+    return (units[TARIFF.bands(np.arange(24), bool(is_holiday_flag))] + renew + fuel).tolist()
 
 # 時間帯ごとの合計取得関数
 def band_sums_from_values(values, is_holiday_flag: bool):
     """values: iterable of 24 hourly kWh -> bandごとの合計辞書を返す."""
-    sums = {'day': 0.0, 'home': 0.0, 'night': 0.0}
-    for h, v in enumerate(values):
-        band = hour_to_band(h, is_holiday_flag)
+    kwh = []
+    for v in values:
         try:
-            sums[band] += float(v)
+            kwh.append(float(v))
         except Exception:
-            try:
-                sums[band] += 0.0
-            except Exception:
-                pass
-    return sums
+            kwh.append(0.0) # 数値でない値は0
+    bands = TARIFF.bands(np.arange(len(kwh)), bool(is_holiday_flag)) # 時毎の時間帯番号
+    sums = np.bincount(bands, weights=kwh, minlength=len(BANDS)) if kwh else np.zeros(len(BANDS))
+    return dict(zip(BANDS, sums.tolist()))
 
 # アノテーション追加関数
 def annotate_in_axes(ax, fig, x, y, msg, bgcolor=None, alpha=None):
@@ -399,25 +349,11 @@ def parse_and_aggregate(df: pd.DataFrame) -> pd.DataFrame:
     hourly_cols = df.columns[start_hour_col_idx:start_hour_col_idx+24]
     df_hourly = df[hourly_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
 
-    df['day'] = 0.0
-    df['home'] = 0.0
-    df['night'] = 0.0
-
-    for idx in df.index:
-        date_val = df.at[idx, 'date']
-        try:
-            is_hol = is_holiday(date_val)
-        except Exception:
-            is_hol = False
-
-        band_sums = {'day': 0.0, 'home': 0.0, 'night': 0.0}
-        for h in range(24):
-            band = hour_to_band(h, is_hol)
-            val = df_hourly.at[idx, hourly_cols[h]]
-            band_sums[band] += float(val)
-        df.at[idx, 'day'] = band_sums['day']
-        df.at[idx, 'home'] = band_sums['home']
-        df.at[idx, 'night'] = band_sums['night']
+    # 全行の時間帯別合計を一括計算（日付のない行は平日扱い）
+    is_hol = non_working_days(df['date'].to_numpy())
+    band_sums = TARIFF.band_sums(df_hourly.to_numpy(dtype=float), is_hol)
+    for i, band in enumerate(BANDS):
+        df[band] = band_sums[:, i]
 
     df['year_month'] = df['date'].dt.to_period('M')
     monthly = df.groupby('year_month')[['day', 'home', 'night']].sum()
@@ -1917,27 +1853,17 @@ def plot_monthly_interactive(monthly: pd.DataFrame, df: pd.DataFrame, file_path:
         # Dessmonitorデータ・商用充電データを月ごとに集計
         # --- キャッシュdictをDataFrame化して高速集計 ---
         # キャッシュdict: {(date, hour): {'energy_sum': [...], 'charge_sum': [...]}}
-        cache_rows = [] # キャッシュ行リスト初期化
-        for (date_str, hour), vals in dessmonitor_data_dict.items(): 
-            # 日付文字列をdatetime化
-            try:
-                date_dt = pd.to_datetime(date_str) # 日付文字列をdatetime化
-            except Exception:
-                continue
-            month_period = date_dt.to_period('M') # 月Period取得
-            is_hol = is_holiday(date_dt) # 休日判定
-            band = hour_to_band(hour, is_hol) # 時間帯取得
-            PV_sum = sum(vals['PV_sum']) # 太陽光発電量合計
-            energy_sum = sum(vals['energy_sum']) # 蓄電電力量合計
-            charge_sum = sum(vals['charge_sum']) # 商用充電電力量合計
-            cache_rows.append({ 
-                'month': month_period,
-                'band': band,
-                'PV_sum': PV_sum,
-                'energy_sum': energy_sum,
-                'charge_sum': charge_sum
-            })
-        cache_df = pd.DataFrame(cache_rows) # キャッシュDataFrame化
+        keys = list(dessmonitor_data_dict.keys()) # (日付文字列, 時) のリスト
+        vals = list(dessmonitor_data_dict.values())
+        date_dt = pd.to_datetime(pd.Series([date_str for date_str, _ in keys], dtype=object), errors='coerce') # 日付文字列を一括でdatetime化
+        hours = np.array([hour for _, hour in keys], dtype=np.int64)
+        cache_df = pd.DataFrame({ 
+            'month': date_dt.dt.to_period('M'), # 月Period
+            'band': np.array(BANDS)[TARIFF.bands(hours, non_working_days(date_dt.to_numpy()))], # 時間帯（休日判定込み）
+            'PV_sum': [sum(v['PV_sum']) for v in vals], # 太陽光発電量合計
+            'energy_sum': [sum(v['energy_sum']) for v in vals], # 蓄電電力量合計
+            'charge_sum': [sum(v['charge_sum']) for v in vals] # 商用充電電力量合計
+        })[date_dt.notna().to_numpy()] # 日付に変換できないキーは除く
         # 月・時間帯ごとに合算
         dess_month_total = {m: {'day':0.0, 'home':0.0, 'night':0.0} for m in months} # 蓄電月別合計初期化
         commercial_month_total = {m: {'day':0.0, 'home':0.0, 'night':0.0} for m in months} # 商用充電月別合計初期化
@@ -0,0 +1,122 @@
+# 時間帯別電気料金（NumPy 配列で一括計算）
+# ----------概要
+# 時間帯単価の適用期間・再エネ賦課金（毎年5月切替）・燃料費調整単価（月次）を、
+# 期間の境界と年・月番号で引く配列に変換しておき、日時と電力量の配列から時間帯・単価・
+# 金額を1回の計算で求める。行毎・時毎に関数を呼んで辞書を引くループの代わりに使う。
+# 時間帯番号は BANDS の順（0=day 1=home 2=night）。土日祝は day の時間も home とする。
+# 土日祝カレンダー（jpholiday が必要）は Tariff の日付計算で読込み、hour_table だけなら不要。
+import numpy as np
+
+BANDS=("day","home","night")                                    # 時間帯番号の順
+DAY,HOME,NIGHT=range(len(BANDS))
+HOUR=np.timedelta64(1,"h")
+
+def hour_table(ranges,default=-1):
+    """ {名前: (開始時,終了時)} から 時→番号（ranges の順）の24要素の配列を作る（該当なしは default） """
+    table=np.full(24,default,dtype=np.int8)
+    for i,(start,end) in enumerate(ranges.values()):table[start:end]=i
+    return table
+
+class Tariff:
+    """
+    時間帯別料金表
+    periods: [(開始日,終了日,{'day':単価,'home':単価,'night':単価}), ...]  None は期限なし、該当なしは最後の期間
+    renewable_by_year: {年度: 単価}（その年の5月～翌年4月）  fuel_adj: {"YYYY-MM": 単価}（ない年月は 0）
+    band_hours: {'day': [時,...], 'home': [...], 'night': [...]}（どれにも含まれない時は night）
+    """
+    def __init__(self,periods,renewable_by_year,fuel_adj,band_hours):
+        self.periods=[prices for _,_,prices in periods]+[periods[-1][2]] # 最後は該当なし用（最後の期間）
+        never=np.iinfo(np.int64)
+        self.starts=np.array([never.min if s is None else np.datetime64(s,"D").astype(np.int64) for s,_,_ in periods])
+        self.ends=np.array([never.max if e is None else np.datetime64(e,"D").astype(np.int64) for _,e,_ in periods])
+        self.prices=np.array([[prices.get(band,0.0) for band in BANDS] for prices in self.periods])
+        years=sorted(renewable_by_year)                         # 年度 → 単価（範囲外は 0）
+        self.renew_base=years[0] if years else 0
+        self.renew=np.zeros(years[-1]-years[0]+2 if years else 1)
+        for year in years:self.renew[year-self.renew_base]=renewable_by_year[year]
+        months=sorted(int(k[:4])*12+int(k[5:7])-1 for k in fuel_adj) # 年*12+月-1 → 単価（範囲外は 0）
+        self.fuel_base=months[0] if months else 0
+        self.fuel=np.zeros(months[-1]-months[0]+2 if months else 1)
+        for k,value in fuel_adj.items():self.fuel[int(k[:4])*12+int(k[5:7])-1-self.fuel_base]=value
+        self.band_table=np.full((2,24),NIGHT,dtype=np.int8)    # [土日祝, 時] → 時間帯番号
+        for band in BANDS[::-1]:
+            self.band_table[0,band_hours.get(band,[])]=BANDS.index(band)
+        self.band_table[1,self.band_table[0]!=NIGHT]=HOME
+
+    @staticmethod
+    def _lookup(table,index):                                   # 範囲外は最後の要素（0）
+        index=np.where((index>=0)&(index<len(table)-1),index,len(table)-1)
+        return table[index]
+
+    def period_index(self,days):
+        """ 日付毎の適用期間の番号（periods の順、該当なし・NaT は最後の期間の単価を指す番号） """
+        from holiday_calendar import to_days
+        days=to_days(days)
+        d=days.astype(np.int64)[...,None]
+        match=(d>=self.starts)&(d<=self.ends)
+        index=np.where(match.any(axis=-1),match.argmax(axis=-1),len(self.starts))
+        return np.where(np.isnat(days),len(self.starts),index)
+
+    def unit_prices(self,days):
+        """ 日付毎の時間帯単価  戻り値: 配列 (日付数, 3)（BANDS の順） """
+        return self.prices[self.period_index(days)]
+
+    def renewable(self,days):
+        """ 日付毎の再エネ賦課金単価（5月～翌年4月はその年度） """
+        from holiday_calendar import to_days
+        month=to_days(days).astype("datetime64[M]").astype(np.int64)+1970*12
+        year=month//12-(month%12<4)                             # 1～4月は前年度
+        return np.where(np.isnat(to_days(days)),0.0,self._lookup(self.renew,year-self.renew_base))
+
+    def fuel_adjustment(self,days):
+        """ 日付毎の燃料費調整単価 """
+        from holiday_calendar import to_days
+        month=to_days(days).astype("datetime64[M]").astype(np.int64)+1970*12
+        return np.where(np.isnat(to_days(days)),0.0,self._lookup(self.fuel,month-self.fuel_base))
+
+    def bands(self,hours,holiday):
+        """ 時（0～23）と土日祝フラグの配列 → 時間帯番号の配列 """
+        return self.band_table[np.asarray(holiday,dtype=np.int8),np.asarray(hours,dtype=np.int64)%24]
+
+    def band_sums(self,hourly,holiday):
+        """ 日毎の24時間分の電力量 (日数, 24) → 時間帯毎の合計 (日数, 3)（NaN は 0） """
+        hourly=np.nan_to_num(np.asarray(hourly,dtype=np.float64))
+        codes=self.bands(np.arange(24),np.asarray(holiday,dtype=bool)[:,None])
+        return np.stack([np.where(codes==b,hourly,0.0).sum(axis=1) for b in range(len(BANDS))],axis=1)
+
+    def cost(self,days,kwh):
+        """
+        日付毎の時間帯別電力量 kwh (日数, 3) の金額
+        戻り値: dict  prices (日数,3)  renew  fuel  base_costs (日数,3)  base_total  renew_amount  fuel_amount  total_kwh  total_cost
+        """
+        prices=self.unit_prices(days)
+        renew,fuel=self.renewable(days),self.fuel_adjustment(days)
+        kwh=np.nan_to_num(np.asarray(kwh,dtype=np.float64))
+        base_costs=kwh*prices
+        total_kwh=kwh.sum(axis=-1)
+        result={"prices":prices,"renew":renew,"fuel":fuel,"base_costs":base_costs,"base_total":base_costs.sum(axis=-1),
+                "renew_amount":total_kwh*renew,"fuel_amount":total_kwh*fuel,"total_kwh":total_kwh}
+        result["total_cost"]=result["base_total"]+result["renew_amount"]+result["fuel_amount"]
+        return result
+
+    def price(self,times,kwh,holiday=None):
+        """
+        日時と電力量の配列を一括で料金計算する  holiday: 土日祝フラグ（省略時はカレンダーで判定）
+        戻り値: dict  band（時間帯番号） unit（時間帯単価） renew  fuel  base_cost  renew_amount  fuel_amount  total_cost
+        """
+        times=np.asarray(times)
+        if times.dtype.kind!="M":times=times.astype("datetime64[s]")
+        days=times.astype("datetime64[D]")
+        with np.errstate(invalid="ignore"):                     # NaT の行は0時とする
+            hours=np.nan_to_num((times-days)/HOUR).astype(np.int64)
+        if holiday is None:                                     # 土日祝カレンダーで判定
+            from holiday_calendar import non_working_days
+            holiday=non_working_days(days)
+        band=self.bands(hours,holiday)
+        unit=np.take_along_axis(self.unit_prices(days),band[...,None].astype(np.int64),axis=-1)[...,0]
+        renew,fuel=self.renewable(days),self.fuel_adjustment(days)
+        kwh=np.nan_to_num(np.asarray(kwh,dtype=np.float64))
+        result={"band":band,"unit":unit,"renew":renew,"fuel":fuel,"base_cost":kwh*unit,
+                "renew_amount":kwh*renew,"fuel_amount":kwh*fuel}
+        result["total_cost"]=result["base_cost"]+result["renew_amount"]+result["fuel_amount"]
+        return result
@@ -1,10 +1,11 @@
 import serial
-import csv
 import time
 import struct
 import tkinter as tk
 from tkinter import ttk
 import serial.tools.list_ports
+from serial_proxy import SerialProxy
+from serial_capture import CaptureWriter, DIR_REQUEST, DIR_RESPONSE
 
 def select_com_ports():
     """
@@ -81,8 +82,9 @@ if not LOGGER_PORT:
 
 BAUD_RATE = 9600  # ボーレートは必要に応じて変更
 
-# CSVファイルの設定
-LOG_FILE = 'serial_log.csv'
+# キャプチャファイルの設定（再生・16進表示は python serial_capture.py <ファイル> [--dump]）
+CAPTURE_FILE = time.strftime('serial_log_%Y%m%d_%H%M%S.scap')
+capture = CaptureWriter(CAPTURE_FILE)
 
 # シリアルポートの初期化
 ser_logger = serial.Serial(LOGGER_PORT, BAUD_RATE, timeout=1)
@@ -177,50 +179,53 @@ def generate_modbus_response(request_frame):
         print(f"Error generating Modbus response: {e}")
         return b''
 
-try:
-    print("Listening on Logger and Inverter...")
-    while True:
-        # Loggerからデータを受信
-        if ser_logger.in_waiting > 0:
-            data_from_logger = ser_logger.read(ser_logger.in_waiting)
-            print(f"Received from Logger: {data_from_logger.hex()}")
-
-            # レジスタアドレスを抽出して16進数で表示
-            if len(data_from_logger) >= 4:  # レジスタアドレスを抽出するには最低4バイト必要
-                register_address = int.from_bytes(data_from_logger[2:4], byteorder='big')
-                print(f"Extracted Register Address: 0x{register_address:04X}")
-
-            # データをCSVにログ
-            with open(LOG_FILE, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([time.strftime('%Y-%m-%d %H:%M:%S'), 'Logger->Inverter', data_from_logger.hex()])
-
-            # Inverterへ送信またはModbusレスポンスを返す
-            if inverter_connected:
-                ser_inverter.write(data_from_logger)
-            else:
-                # Modbusレスポンスを生成してLoggerに返す
-                modbus_response = generate_modbus_response(data_from_logger)
-                if modbus_response:
-                    print(f"Sending Modbus response to Logger: {modbus_response.hex()}")
-                    ser_logger.write(modbus_response)
+def on_logger_data(data_from_logger):
+    """ Loggerからデータを受信した時の処理 """
+    print(f"Received from Logger: {data_from_logger.hex()}")
+
+    # レジスタアドレスを抽出して16進数で表示
+    if len(data_from_logger) >= 4:  # レジスタアドレスを抽出するには最低4バイト必要
+        register_address = int.from_bytes(data_from_logger[2:4], byteorder='big')
+        print(f"Extracted Register Address: 0x{register_address:04X}")
+
+    # データをキャプチャに記録
+    capture.write(LOGGER_PORT, DIR_REQUEST, data_from_logger)
+
+    # Inverterへ送信またはModbusレスポンスを返す
+    if inverter_connected:
+        ser_inverter.write(data_from_logger)
+    else:
+        # Modbusレスポンスを生成してLoggerに返す
+        modbus_response = generate_modbus_response(data_from_logger)
+        if modbus_response:
+            print(f"Sending Modbus response to Logger: {modbus_response.hex()}")
+            ser_logger.write(modbus_response)
+            capture.write(LOGGER_PORT, DIR_RESPONSE, modbus_response)
+
+def on_inverter_data(data_from_inverter):
+    """ Inverterからデータを受信した時の処理 """
+    print(f"Received from Inverter: {data_from_inverter.hex()}")
 
-        # Inverterからデータを受信
-        if inverter_connected and ser_inverter.in_waiting > 0:
-            data_from_inverter = ser_inverter.read(ser_inverter.in_waiting)
-            print(f"Received from Inverter: {data_from_inverter.hex()}")
+    # データをキャプチャに記録
+    capture.write(LOGGER_PORT, DIR_RESPONSE, data_from_inverter)
 
-            # データをCSVにログ
-            with open(LOG_FILE, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([time.strftime('%Y-%m-%d %H:%M:%S'), 'Inverter->Logger', data_from_inverter.hex()])
+    # Loggerへ送信
+    ser_logger.write(data_from_inverter)
 
-            # Loggerへ送信
-            ser_logger.write(data_from_inverter)
+# 受信した時だけ処理する（in_waiting の定期確認はしない）
+proxy = SerialProxy()
+proxy.add_port(ser_logger, on_logger_data)
+if inverter_connected:
+    proxy.add_port(ser_inverter, on_inverter_data)
+
+try:
+    print("Listening on Logger and Inverter...")
+    proxy.run()
 
 except KeyboardInterrupt:
     print("Terminating...")
 finally:
+    capture.close()
     # シリアルポートを閉じる
     ser_logger.close()
     if inverter_connected:
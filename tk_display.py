@@ -0,0 +1,52 @@
+# Tk 表示ブリッジ
+# ----------概要
+# Tkinter はスレッドセーフではないため、計測スレッドからラベルを直接更新せず、
+# 表示データをキューに入れるだけにする。Tk スレッドのタイマー（after）でキューをまとめて取り出し、
+# 表示文字列が変わったラベルのみ更新する。画面の更新が遅れた場合は最新値のみ反映し（間引き）、
+# キューは上限で古いものから捨てるので、計測スレッドが画面を待つことはない。
+from collections import deque                                   # 表示キュー組込
+
+class DisplayBridge:
+    """ 計測スレッドの表示データを Tk スレッドで差分更新する """
+    def __init__(self,root,period_ms=200,maxlen=8):
+        self.root=root
+        self.period_ms=period_ms                                # 画面更新周期（ミリ秒）
+        self.pending=deque(maxlen=maxlen)                       # 表示キュー（append/popleftはスレッドセーフ）
+        self.groups={}                                          # グループ名: (ラベル,表示中の文字列)
+        self.pushed=0                                           # 受付サンプル数
+        self.applied=0                                          # 画面反映回数
+        self.coalesced=0                                        # 間引いたサンプル数
+        self.repainted=0                                        # 更新したラベル数
+        root.after(period_ms,self._tick)
+
+    def bind(self,name,labels):
+        """ ラベルのリストをグループ名で登録する（Tk スレッドから） """
+        self.groups[name]=(labels,[None]*len(labels))
+
+    def push(self,**values):
+        """ 表示データを登録する（計測スレッドから） 例: push(time=[date_time],id1=data1) """
+        self.pending.append(values)
+        self.pushed+=1
+
+    def _tick(self):                                            # 画面更新（Tk スレッド）
+        merged={}
+        count=0
+        while self.pending:
+            merged.update(self.pending.popleft())               # 同じグループは最新値のみ
+            count+=1
+        if count:
+            self.coalesced+=count-1
+            self.apply(merged)
+        self.root.after(self.period_ms,self._tick)
+
+    def apply(self,values):
+        """ 表示文字列が変わったラベルのみ更新する """
+        for name,data in values.items():
+            labels,shown=self.groups[name]
+            for i,(label,v) in enumerate(zip(labels,data)):
+                text=f"{v}"
+                if text!=shown[i]:
+                    label.config(text=text)
+                    shown[i]=text
+                    self.repainted+=1
+        self.applied+=1